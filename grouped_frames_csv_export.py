@@ -9,6 +9,10 @@ column headers in the exported spreadsheet.
 The frame data in the spe file must be spectral -- i.e. 1 row only.
 
 Uses numpy, openpyxl, and pandas external libraries.
+
+Spreadsheets do not scale beyond a few thousand spectra; for larger files,
+`read_spe.columnar.export_parquet` streams the spectra (with their frame
+metadata) into a Parquet file instead.
 """
 
 import numpy as np
@@ -23,15 +27,9 @@ if __name__ == '__main__':
         / spe_ref.roi_list[0].ybin)
     if data_height != 1:
         raise ValueError('Must have 1-D frame data in spe file.')
-    # initialize new array of shape [Frames, Cols]
-    data_width = int(spe_ref.roi_list[0].width
-        / spe_ref.roi_list[0].xbin)
-    new_np_array = np.zeros([spe_ref.num_frames, data_width])
-    # loop through frames
-    for i in range(0, spe_ref.num_frames):
-        # get spe data of ith frame, 1st ROI, 1st row
-        # (there should only be one row)
-        new_np_array[i,:] = spe_ref.get_data(frames=[i])[0][0]
+    # read all frames of the 1st ROI in one call and take the 1st row
+    # (there should only be one row) -> array of shape [Frames, Cols]
+    new_np_array = spe_ref.get_data(rois=[0], dtype=np.float64)[0][:, 0, :]
     # construct a pandas dataframe and write it to excel
     if not spe_ref.get_wavelengths():
         df(new_np_array).to_excel(f'{spe_ref.file_name}.xlsx')
@@ -2,8 +2,8 @@
 -----
 
 Spe file reader that works on v3.0 (LightField) versions.
-Spe v2.x (WinSpec/32) files will work (only first ROI is parsed
-for legacy files).
+Spe v2.x (WinSpec/32) files will work (all ROIs and the wavelength
+calibration are read from the binary header).
 
 To use the spe reader, import the package, construct the SpeReference object
 and call the methods -- it's that simple! The data will be returned as a list
@@ -21,12 +21,47 @@ Example usage to read spe file content from 'file.spe':
 - this will get data (list of numpy array) for frames 1 and 3
 in roi 3 for file
 
+Per-pixel and per-frame statistics (sum, mean, min, max, variance) over
+all frames can be computed without loading the whole file:
+>>> from read_spe import reduce_frames
+>>> stats = reduce_frames(spe, workers=4)
+>>> noise_map = stats[0].pixel.std
+
+Directories of spe files from one experiment (e.g. LightField
+auto-incremented file names) can be read as one data set:
+>>> from read_spe import SpeCollection
+>>> collection = SpeCollection('data/experiment*.spe')
+>>> data = collection.get_data(frames=[0, 250, 999])
+
+Processed frames can be written back to a new spe v3 file:
+>>> from read_spe import SpeWriter
+>>> with SpeWriter.from_reference('processed.spe', spe) as writer:
+...     writer.write_frames(data)
+
+Spe files can be archived as chunked, compressed HDF5 and read back
+lazily with the core data API (by ROI, frame and dtype):
+>>> from read_spe import Hdf5Reference, export_hdf5
+>>> archive = Hdf5Reference(export_hdf5(spe, compression='gzip'))
+>>> data = archive.get_data(frames=[0, 2])
+
+Spectral (single-row) ROIs can be exported to Parquet for columnar
+queries:
+>>> from read_spe import export_parquet
+>>> export_parquet(spe, layout='long')
+
 Notes
 ----
 The astropy (`pip install astropy`) library is required for using the fits
-writing module.
+writing module, h5py (`pip install h5py`) for the HDF5 module and pyarrow
+(`pip install pyarrow`) for the Parquet export.
 """
 
-from .read_spe import (ExperimentSetting, FrameTrackingNumber, GateTracking,
-    ImageNdArray, SpeReference, TimeStamp)
+from .read_spe import (ExperimentSetting, FrameCache, FrameTrackingNumber,
+    GateTracking, ImageNdArray, SpeReference, TimeStamp)
 from .fits import Fits
+from .reductions import FrameReduction, PixelStatistics, reduce_frames
+from .collection import SpeCollection
+from .follow import SpeFollower
+from .writer import SpeWriter
+from .hdf5 import Hdf5Reference, export_hdf5
+from .columnar import export_parquet, iter_record_batches
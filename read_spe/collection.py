@@ -0,0 +1,251 @@
+"""Module for treating many spe files (e.g. the auto-incremented files
+LightField produces for one experiment) as a single, virtually
+concatenated data set.
+
+Example usage to read frames across all files matching a pattern:
+>>> from read_spe import SpeCollection
+>>> collection = SpeCollection('data/experiment*.spe')
+>>> collection.num_frames
+>>> data = collection.get_data(frames=[0, 250, 999])
+- frames are indexed globally, in file order; each file is only read for
+the frames that fall inside it, and files are read concurrently.
+-----
+"""
+
+#pylint: disable=consider-using-f-string
+
+import functools
+import glob
+import re
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+from .read_spe import (Metadata, SpeNdArray, SpeReference,
+    WavelengthNdArray, _ROI, _check_frames, _frame_batches, _iter_batches)
+
+def _natural_sort_key(path: str) -> list:
+    """Sort key that orders embedded numbers numerically, so that
+    'file-2.spe' comes before 'file-10.spe'.
+    """
+    return [int(part) if part.isdigit() else part.casefold()
+            for part in re.split(r'(\d+)', path)]
+
+class SpeCollection():
+    """Presents a set of spe files with the same geometry and pixel format
+    as one data set with a global frame index spanning all files.
+
+    Members are opened lazily (`SpeReference(..., lazy=True)`), so only
+    their headers and data formats are read until data or metadata is
+    requested.
+
+    --------------------------------------------------------------------------
+    Inputs (for constructor):
+    --------------------------------------------------------------------------
+    - `files`: glob pattern (str) or sequence of spe file paths. Files
+    matched by a pattern are sorted naturally (numbers in the names are
+    compared numerically); a sequence is kept in the given order.
+    - `workers`: Optional named argument for the number of threads used to
+    open and read the member files concurrently.
+    --------------------------------------------------------------------------
+    Exceptions:
+    --------------------------------------------------------------------------
+    - `ValueError` raised if no files are found, or if the files do not
+    share the same ROI geometry and pixel format.
+    """
+    def __init__(self, files: str | Sequence[str], *, workers: int = 4):
+        if isinstance(files, str):
+            self._files = tuple(sorted(glob.glob(files),
+                                       key=_natural_sort_key))
+        else:
+            self._files = tuple(str(file) for file in files)
+        if not self._files:
+            raise ValueError('No spe files found for the collection.')
+        if workers < 1:
+            raise ValueError('workers must be at least 1.')
+        self._workers = workers
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            self._references = tuple(executor.map(
+                lambda file: SpeReference(file, lazy=True), self._files))
+        self._check_compatible()
+        self._frame_offsets = np.concatenate(([0], np.cumsum(
+            [int(ref.num_frames) for ref in self._references],
+            dtype=np.int64)))
+
+    def _check_compatible(self):
+        """Raises ValueError if any member differs from the first in spe
+        version, pixel format, readout stride, ROI geometry (count, shapes,
+        positions and binning) or metadata layout.
+        """
+        first = self._references[0]
+        for ref in self._references[1:]:
+            if (ref.spe_version >= 3) != (first.spe_version >= 3) or\
+                ref.pixel_format_key != first.pixel_format_key or\
+                ref.readout_stride != first.readout_stride:
+                raise ValueError('%s does not have the same spe version /'
+                    ' pixel format / readout stride as %s.'
+                    %(ref.filepath, first.filepath))
+            if len(ref.roi_list) != len(first.roi_list) or any(
+                (roi.width, roi.height, roi.x, roi.y, roi.xbin, roi.ybin) !=
+                (first_roi.width, first_roi.height, first_roi.x, first_roi.y,
+                 first_roi.xbin, first_roi.ybin) for roi, first_roi in
+                zip(ref.roi_list, first.roi_list)):
+                raise ValueError('%s does not have the same ROI geometry as'
+                    ' %s.'%(ref.filepath, first.filepath))
+            if len(ref.meta_list) != len(first.meta_list) or any(
+                type(meta) is not type(first_meta) or
+                meta.meta_event != first_meta.meta_event or
+                meta.datatype != first_meta.datatype or
+                meta.bit_depth != first_meta.bit_depth for meta, first_meta
+                in zip(ref.meta_list, first.meta_list)):
+                raise ValueError('%s does not have the same metadata layout'
+                    ' as %s.'%(ref.filepath, first.filepath))
+
+    def locate_frames(self, frames: Sequence[int]) ->\
+        tuple[np.ndarray, np.ndarray]:
+        """Maps global frame indices to `(file_index, local_frame)` arrays,
+        where `file_index` indexes `references`.
+        """
+        frame_array = np.asarray(frames, dtype=np.int64)
+        file_index = np.searchsorted(self._frame_offsets, frame_array,
+                                     side='right') - 1
+        return file_index, frame_array - self._frame_offsets[file_index]
+
+    def get_data(self,*,rois:Optional[Sequence[int]] = None,
+                 frames:Optional[Sequence[int]] = None,
+                 dtype: Optional[npt.DTypeLike] = None,
+                 workers: Optional[int] = None) -> Sequence[SpeNdArray]:
+        """Extracts the requested ROI(s) and globally indexed frame(s) from
+        the collection. Same inputs and output as
+        `read_spe.SpeReference.get_data`; the frames of each member file are
+        read in one `get_data` call, with member files read concurrently on
+        `workers` threads (defaults to the collection's `workers`).
+        """
+        #pylint: disable=protected-access
+        rois = self._references[0]._check_rois(rois)
+        frames = _check_frames(frames, self.num_frames)
+        output = self._references[0]._allocate_output(rois, len(frames),
+                                                       dtype, None)
+        if len(frames) == 0:
+            return output
+        file_index, local_frames = self.locate_frames(frames)
+        order = np.argsort(file_index, kind='stable')
+        members = np.unique(file_index)
+        bounds = np.searchsorted(file_index[order], members, side='left')
+        bounds = np.append(bounds, len(order))
+
+        def read_member(idx: int):
+            out_idx = order[bounds[idx]:bounds[idx+1]]
+            member_data = self._references[members[idx]].get_data(
+                rois=rois, frames=local_frames[out_idx], dtype=dtype)
+            for idx_roi, region_data in enumerate(member_data):
+                output[idx_roi][out_idx] = region_data
+
+        with ThreadPoolExecutor(max_workers=workers or self._workers)\
+            as executor:
+            list(executor.map(read_member, range(len(members))))
+        return output
+
+    def iter_frames(self,*,rois:Optional[Sequence[int]] = None,
+                    batch_size: Optional[int] = None, start: int = 0,
+                    stop: Optional[int] = None, step: int = 1,
+                    read_ahead: bool = False,
+                    dtype: Optional[npt.DTypeLike] = None) ->\
+                    Iterator[tuple[range, Sequence[SpeNdArray]]]:
+        """Walks through the globally indexed frames of the collection in
+        batches. Same inputs and output as
+        `read_spe.SpeReference.iter_frames`.
+        """
+        #pylint: disable=protected-access
+        rois = self._references[0]._check_rois(rois)
+        if stop is None:
+            stop = self.num_frames
+        frames = range(start, stop, step)
+        if len(frames) == 0:
+            return
+        _check_frames(frames, self.num_frames)
+        bpp = self._references[0]._pixel_dtype().itemsize
+        batches = _frame_batches(frames, batch_size, sum(
+            int(self.roi_list[roi].width) * int(self.roi_list[roi].height) *
+            bpp for roi in rois), SpeReference.max_read_bytes)
+        yield from _iter_batches(functools.partial(self.get_data, rois=rois,
+            dtype=dtype), batches, read_ahead)
+
+    def get_frame_metadata_value(self, frames: Sequence[int]) -> np.ndarray:
+        """Retrieves per-frame metadata for globally indexed frames, as a
+        structured array (see `read_spe.SpeReference.get_frame_metadata_value`).
+
+        ----------------------------------------------------------------------
+        Exceptions:
+        ----------------------------------------------------------------------
+        - `ValueError` raised if the member files do not share the same
+        metadata layout.
+        """
+        frames = _check_frames(frames, self.num_frames)
+        file_index, local_frames = self.locate_frames(frames)
+        output = None
+        for member in np.unique(file_index):
+            out_idx = np.flatnonzero(file_index == member)
+            member_metadata = self._references[member]\
+                .get_frame_metadata_value(local_frames[out_idx])
+            if output is None:
+                output = np.empty(len(frames), dtype=member_metadata.dtype)
+            elif member_metadata.dtype != output.dtype:
+                raise ValueError('%s does not have the same metadata as %s.'
+                    %(self._files[member], self._files[0]))
+            output[out_idx] = member_metadata
+        if output is None:
+            return self._references[0].get_frame_metadata_value([])
+        return output
+
+    def get_wavelengths(self,*, rois: Optional[Sequence[int]] = None) ->\
+        Sequence[WavelengthNdArray]:
+        """Wavelength calibration of the first member file (see
+        `read_spe.SpeReference.get_wavelengths`).
+        """
+        return self._references[0].get_wavelengths(rois=rois)
+
+    def close(self) -> None:
+        """Closes the file handles of all member files."""
+        for ref in self._references:
+            ref.close()
+
+    def __enter__(self) -> 'SpeCollection':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def files(self) -> Sequence[str]:
+        """Paths of the member files, in global frame order"""
+        return self._files
+    @property
+    def references(self) -> Sequence[SpeReference]:
+        """`SpeReference` objects of the member files"""
+        return self._references
+    @property
+    def frame_offsets(self) -> np.ndarray:
+        """Global index of the first frame of each member file (the last
+        element is the total number of frames).
+        """
+        return self._frame_offsets
+    @property
+    def num_frames(self) -> int:
+        """Total number of frames in the collection"""
+        return int(self._frame_offsets[-1])
+    @property
+    def roi_list(self) -> Sequence[_ROI]:
+        """tuple of ROIs (from the first member file)"""
+        return self._references[0].roi_list
+    @property
+    def meta_list(self) -> Sequence[Metadata]:
+        """Tuple of metadata types (from the first member file)"""
+        return self._references[0].meta_list
+    @property
+    def frame_metadata_values(self) -> np.ndarray:
+        """Structured array of the metadata of all frames in the collection
+        (see `read_spe.SpeReference.frame_metadata_values`).
+        """
+        return self.get_frame_metadata_value(range(0, self.num_frames))
@@ -0,0 +1,164 @@
+"""Module for exporting spectral (single-row) spe data as columnar Arrow
+record batches or Parquet files, e.g. for querying millions of spectra
+with predicate pushdown instead of loading spreadsheets.
+
+Frames are streamed in batches with `SpeReference.iter_frames`, so
+memory stays bounded for files of any size. Two table layouts are
+supported:
+- `'wide'`: one row per frame, with the frame index, the per-frame
+metadata (time stamps in ms) and one column per wavelength (or per pixel
+column, if the file is not calibrated).
+- `'long'`: one row per frame and column, with the frame index, the
+per-frame metadata, `wavelength` (or `column`) and `intensity`.
+
+Example usage:
+>>> from read_spe import SpeReference
+>>> from read_spe.columnar import export_parquet
+>>> export_parquet(SpeReference('spectra.spe'), layout='long')
+
+**REQUIRES PYARROW: pip install pyarrow**
+-----
+"""
+
+#pylint: disable=consider-using-f-string
+
+import json
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, Optional
+import numpy as np
+from .read_spe import SpeReference, TimeStamp
+
+_LAYOUTS = ('wide', 'long')
+
+def _schema_metadata(spe_ref: SpeReference, roi: int,
+                     axis: np.ndarray) -> dict[bytes, bytes]:
+    """Key / value metadata stored with the schema: source file, ROI, the
+    column axis and the time stamp origin.
+    """
+    metadata = {b'source_file': str(spe_ref.filepath).encode(),
+                b'roi': str(roi).encode(),
+                b'axis': json.dumps(axis.tolist()).encode()}
+    for meta in spe_ref.meta_list:
+        if isinstance(meta, TimeStamp):
+            metadata[b'acquisition_origin'] = meta.absolute_time.encode()
+            break
+    return metadata
+
+def iter_record_batches(spe_ref: SpeReference, *, roi: int = 0,
+                        layout: str = 'wide', full_vertical: bool = False,
+                        batch_size: Optional[int] = None) -> Iterator[Any]:
+    """**REQUIRES PYARROW LIBRARY**
+
+    Walks through the frames of a spectral ROI in batches, yielding one
+    `pyarrow.RecordBatch` per batch of frames (see the module docstring for
+    the layouts). All batches share the same schema.
+    --------------------------------------------------------------------------
+    Inputs:
+    --------------------------------------------------------------------------
+    - `spe_ref`: `SpeReference` of the spe file to export.
+    - `roi`: Optional named argument for the index of the ROI to export.
+    - `layout`: Optional named argument, 'wide' or 'long'.
+    - `full_vertical`: Optional named argument. If True, multi-row ROIs are
+    binned to one row in software as they are read (see
+    `SpeReference.get_data`).
+    - `batch_size`: Optional named argument for the number of frames per
+    record batch (see `SpeReference.iter_frames`).
+    --------------------------------------------------------------------------
+    Exceptions:
+    --------------------------------------------------------------------------
+    - `ImportError`: The Python runtime will raise this if pyarrow cannot be
+    imported.
+    - `ValueError` raised if the ROI does not hold single-row data (and
+    `full_vertical` is not set), if `layout` is not recognized, or if
+    wavelengths of the 'wide' layout are not unique to 4 decimals (use
+    the 'long' layout for such calibrations).
+    """
+    if layout not in _LAYOUTS:
+        raise ValueError('layout must be one of %s.'%(', '.join(_LAYOUTS)))
+    #pylint: disable=protected-access
+    region = spe_ref.roi_list[spe_ref._check_rois([roi])[0]]
+    if int(region.height) != 1 and not full_vertical:
+        raise ValueError('ROI %d does not hold spectral (1 row) data; use'
+                         ' full_vertical=True to bin it.'%(roi))
+    import pyarrow as pa
+    wavelengths = spe_ref.get_wavelengths(rois=[roi])
+    if wavelengths:
+        axis_name, axis = 'wavelength', np.asarray(wavelengths[0])
+        axis_labels = ['%.4f'%(value) for value in axis]
+        if layout == 'wide' and len(set(axis_labels)) < len(axis_labels):
+            raise ValueError('Wavelengths of ROI %d are not unique to 4'
+                ' decimals, so they cannot name the columns of the wide'
+                ' layout; use layout=\'long\'.'%(roi))
+    else:
+        axis_name, axis = 'column', np.arange(int(region.width),
+                                              dtype=np.int64)
+        axis_labels = ['%d'%(value) for value in axis]
+    schema_metadata = _schema_metadata(spe_ref, roi, axis)
+    for frames, data in spe_ref.iter_frames(rois=[roi], batch_size=batch_size,
+                                            full_vertical=full_vertical):
+        spectra = data[0][:, 0, :]
+        frame_metadata = spe_ref.get_frame_metadata_value(frames)
+        names = ['frame']
+        arrays = [pa.array(np.arange(frames.start, frames.stop, frames.step,
+                                     dtype=np.int64))]
+        for name in frame_metadata.dtype.names or ():# type: ignore
+            names.append(name)
+            arrays.append(pa.array(frame_metadata[name]))# type: ignore
+        if layout == 'wide':
+            columns = np.ascontiguousarray(spectra.T)
+            names.extend(axis_labels)
+            arrays.extend(pa.array(column) for column in columns)
+        else:
+            width = spectra.shape[1]
+            arrays = [array.take(pa.array(np.repeat(
+                np.arange(len(frames)), width))) for array in arrays]
+            names.extend((axis_name, 'intensity'))
+            arrays.extend((pa.array(np.tile(axis, len(frames))),
+                           pa.array(spectra.reshape(-1))))
+        batch = pa.RecordBatch.from_arrays(arrays, names=names)
+        yield batch.replace_schema_metadata(schema_metadata)
+
+def export_parquet(spe_ref: SpeReference,
+                   destination: Optional[str | os.PathLike] = None, *,
+                   roi: int = 0, layout: str = 'wide',
+                   full_vertical: bool = False,
+                   batch_size: Optional[int] = None,
+                   compression: str = 'snappy') -> Path:
+    """**REQUIRES PYARROW LIBRARY**
+
+    Streams a spectral ROI into a Parquet file, writing one row group per
+    batch of frames (see `iter_record_batches` for the layouts and the
+    other inputs).
+    --------------------------------------------------------------------------
+    Inputs:
+    --------------------------------------------------------------------------
+    - `destination`: Optional path of the Parquet file. Defaults to
+    `<name>.parquet` next to the spe file.
+    - `compression`: Optional named argument for the Parquet compression
+    codec (e.g. 'snappy', 'zstd', 'gzip' or 'none').
+    --------------------------------------------------------------------------
+    Output:
+    --------------------------------------------------------------------------
+    - path of the Parquet file written.
+    """
+    import pyarrow.parquet as pq
+    if destination is None:
+        destination = Path(spe_ref.file_directory) /\
+            ('%s.parquet'%(spe_ref.file_name))
+    destination = Path(destination)
+    writer = None
+    try:
+        for batch in iter_record_batches(spe_ref, roi=roi, layout=layout,
+                full_vertical=full_vertical, batch_size=batch_size):
+            if writer is None:
+                writer = pq.ParquetWriter(destination, batch.schema,
+                                          compression=compression)
+            writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError('%s has no frames to export.'%(spe_ref.filepath))
+    return destination
@@ -5,21 +5,107 @@ and select header information from a given `SpeReference` object.
 -----
 """
 
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
 from pathlib import Path
+from typing import Optional
 import numpy as np
-from .read_spe import (ExperimentSetting, SpeReference, TimeStamp, _Unit)
+from .read_spe import (ExperimentSetting, SpeReference, TimeStamp, _ROI,
+    _Unit)
+
+#unsigned pixel formats are stored as signed fits integers with BZERO set
+_fits_unsigned = {np.dtype(np.uint16): (np.int16, 0x8000),
+                  np.dtype(np.uint32): (np.int32, 0x80000000)}
+
+def _fits_storage(data: np.ndarray) -> np.ndarray:
+    """Converts unsigned 16/32 bit data to the signed representation fits
+    stores (value - BZERO), as `StreamingHDU` writes data unscaled.
+    """
+    if data.dtype in _fits_unsigned:
+        signed, offset = _fits_unsigned[data.dtype]
+        return (data ^ data.dtype.type(offset)).view(signed)
+    return data
+
+#per-process state of the `Fits.generate_fits_files` worker pool, set by
+#`_init_frame_file_worker`
+_worker_ref: Optional[SpeReference] = None
+_worker_headers: Sequence = ()
+
+def _init_frame_file_worker(filepath: str, headers: Sequence) -> None:
+    """Pool initializer of `Fits.generate_fits_files`: opens the spe file
+    (lazily) once per worker process and keeps the header template of each
+    ROI for the tasks that process runs. The reference (file handle and
+    memory map) is closed when the worker process exits.
+    """
+    global _worker_ref, _worker_headers# pylint: disable=global-statement
+    _worker_ref = SpeReference(filepath, lazy=True)
+    _worker_headers = headers
+    #forked workers leave through os._exit, which skips atexit handlers;
+    #multiprocessing runs its finalizers for every start method
+    Finalize(None, _worker_ref.close, exitpriority=0)
+
+def _write_frame_files(spe_ref: SpeReference, header, idx_roi: int,
+                       frames: range, exposure_started: Optional[np.ndarray],
+                       paths: Sequence[Path]) -> int:
+    """Writes one fits file per frame of `frames` in ROI `idx_roi`, reading
+    the frames in one bulk read. Returns the number of files written.
+    """
+    from astropy.io import fits
+    data = spe_ref.get_data(rois=[idx_roi], frames=frames)[0]
+    for idx, (frame_data, output_filepath) in enumerate(zip(data, paths)):
+        hdu = fits.PrimaryHDU(frame_data, header=header)
+        if exposure_started is not None:
+            hdu.header['HIERARCH FRAME_EXPOSURE_STARTED_OFFSET_MS']\
+                = exposure_started[idx]
+        hdu.writeto(output_filepath, overwrite=True)
+    return len(paths)
+
+def _write_frame_files_in_worker(idx_roi: int, frames: range,
+                                 exposure_started: Optional[np.ndarray],
+                                 paths: Sequence[Path]) -> int:
+    """`_write_frame_files` for a task of the worker pool, using the
+    reference and header template set up by `_init_frame_file_worker`.
+    """
+    assert _worker_ref is not None
+    return _write_frame_files(_worker_ref, _worker_headers[idx_roi],
+                              idx_roi, frames, exposure_started, paths)
+
+def _settings_header(spe_ref: SpeReference):
+    """Builds the fits header cards for the experiment settings of the spe
+    file (see `read_spe.SpeReference.retrieve_all_experiment_settings`).
+    """
+    from astropy.io import fits
+    hdr = fits.Header()
+    for setting in spe_ref.retrieve_all_experiment_settings():
+        hdr['HIERARCH %s'%(setting.setting_name)] = setting.setting_value
+    return hdr
+
+def _bin_header(roi: _ROI):
+    """Builds the fits header cards for the binning of a ROI."""
+    from astropy.io import fits
+    hdr = fits.Header()
+    for setting in (ExperimentSetting('X_BIN', np.int64(roi.xbin), np.int64,
+                                      _Unit.NONE),
+                    ExperimentSetting('Y_BIN', np.int64(roi.ybin), np.int64,
+                                      _Unit.NONE)):
+        hdr['HIERARCH %s'%(setting.setting_name)] = setting.setting_value
+    return hdr
 
 class Fits():
-    """Container for static methods `generate_fits_file` and
-    `generate_fits_files`.
+    """Container for static methods `generate_fits_file`,
+    `generate_fits_files` and `generate_mef_file`.
 
     - `generate_fits_file` creates a fits file using the astropy library.
     One file (multi-frame) is generated per ROI. Select experiment
     information is passed in, but per-frame metadata is NOT. If per-frame
     metadata is needed, please use `generate_fits_files`.
+    - `generate_mef_file` creates one multi-extension fits file holding
+    all ROIs, the per-frame metadata and the wavelength axes.
     """
     @staticmethod
-    def generate_fits_file(spe_ref: SpeReference) -> None:
+    def generate_fits_file(spe_ref: SpeReference, *,
+                           batch_size: Optional[int] = None) -> list[Path]:
         """**REQUIRES ASTROPY LIBRARY**
         
         Generate a fits file (per ROI) using astropy library.
@@ -32,11 +118,23 @@ class Fits():
         As such, per-frame metadata not included -- please use
         GenerateFitsFiles if per-frame metadata needs to be exported.
 
+        The header cards are built once per spe file, and each ROI cube is
+        streamed into its fits data unit in batches of frames (see
+        `read_spe.SpeReference.iter_frames`), so cubes larger than the
+        available memory can be exported.
+
         ----------------------------------------------------------------------
         Input:
         ----------------------------------------------------------------------
         - `spe_ref`: `SpeReference` object containing the information from the
         spe file that will be used to generate fits.
+        - `batch_size`: Optional named argument for the number of frames
+        read and written at a time. If None, batches are sized by
+        `SpeReference.max_read_bytes`.
+        ----------------------------------------------------------------------
+        Output:
+        ----------------------------------------------------------------------
+        - paths of the fits files written (one per ROI), next to the spe file.
         ----------------------------------------------------------------------
         Exceptions:
         ----------------------------------------------------------------------
@@ -53,38 +151,38 @@ class Fits():
                 raise ValueError(
                     'One or more region(s) of the spe file do not have'
                     ' valid data.')
-        if spe_ref.spe_version >= 3:
-            datatype: np.dtype = spe_ref.dataTypes[
-                spe_ref.pixel_format_key]# type: ignore
-        else:
-            datatype: np.dtype = spe_ref.dataTypes_old_spe[
-                spe_ref.pixel_format_key]# type: ignore
+        datatype = spe_ref._pixel_dtype()# pylint: disable=protected-access
         from astropy.io import fits
+        settings_header = _settings_header(spe_ref)
+        output_filepaths = []
         for idx_roi, roi in enumerate(spe_ref.roi_list):
-            output_filepath = '%s\\%s-ROI%03d.fits'%(
-                spe_ref.file_directory, spe_ref.file_name, idx_roi+1)
-            region_data = np.zeros(
-                [spe_ref.num_frames, roi.height, roi.width], dtype=datatype)
-            for j in range(0, spe_ref.num_frames):
-                region_data[j] = spe_ref.get_data(rois=[idx_roi],
-                    frames=[j])[0]
-            hdu = fits.PrimaryHDU(region_data)
-            hdr = hdu.header
-            #append experiment settings list to header
-            experiment_settings_seq =\
-                spe_ref.retrieve_all_experiment_settings()
-            bin_settings_seq = (ExperimentSetting('X_BIN',
-                np.int64(roi.xbin), np.int64, _Unit.NONE),
-                ExperimentSetting('Y_BIN', np.int64(roi.ybin),
-                                  np.int64, _Unit.NONE))
-            assert isinstance(experiment_settings_seq, tuple)
-            for setting in experiment_settings_seq + bin_settings_seq:
-                hdr['HIERARCH %s'%(setting.setting_name)] =\
-                    setting.setting_value
-            hdu.writeto(output_filepath, overwrite=True)
+            output_filepath = Path(spe_ref.file_directory) /\
+                ('%s-ROI%03d.fits'%(spe_ref.file_name, idx_roi+1))
+            hdr = fits.PrimaryHDU(data=np.zeros((1, 1, 1),
+                                                dtype=datatype)).header
+            hdr['NAXIS1'] = int(roi.width)
+            hdr['NAXIS2'] = int(roi.height)
+            hdr['NAXIS3'] = int(spe_ref.num_frames)
+            hdr.extend(settings_header)
+            hdr.extend(_bin_header(roi))
+            #StreamingHDU appends to existing files, and only resolves str
+            #paths (a Path is taken relative to the cwd)
+            output_filepath.unlink(missing_ok=True)
+            stream = fits.StreamingHDU(str(output_filepath), hdr)
+            try:
+                for _, data in spe_ref.iter_frames(rois=[idx_roi],
+                                                   batch_size=batch_size):
+                    stream.write(_fits_storage(data[0]))
+            finally:
+                stream.close()
+            output_filepaths.append(output_filepath)
+        return output_filepaths
 
     @staticmethod
-    def generate_fits_files(spe_ref:SpeReference) -> None:
+    def generate_fits_files(spe_ref: SpeReference, *, workers: int = 1,
+                            frames_per_task: Optional[int] = None,
+                            progress: Optional[Callable[[int, int], None]]
+                            = None) -> list[Path]:
         """**REQUIRES ASTROPY LIBRARY**
         
         Generates fits file(s) per frame per ROI in a subdirectory created
@@ -96,16 +194,37 @@ class Fits():
         Frame metadata for exposure started timestamp will be present in the
         header of each file (if exists in the spe file).
 
+        The header template is built once per ROI and the frame metadata is
+        read for all frames in one pass. Frames are written in tasks of
+        consecutive frames, each reading its frames in one bulk read; with
+        `workers` > 1 the tasks are distributed across a process pool. Each
+        worker process opens the spe file once with
+        `SpeReference(..., lazy=True)` and receives the header templates
+        once, when it starts; tasks only carry their frames and paths.
         ----------------------------------------------------------------------
         Input:
         ----------------------------------------------------------------------
         - `spe_ref`: `SpeReference` object containing the information from the
         spe file that will be used to generate fits.
+        - `workers`: Optional named argument for the number of processes
+        writing files. The default (1) writes in the calling process.
+        - `frames_per_task`: Optional named argument for the number of
+        frames read and written per task. If None, tasks are sized to spread
+        the frames over the workers within `SpeReference.max_read_bytes`.
+        - `progress`: Optional named argument for a callable that is called
+        with `(files_written, total_files)` after each task completes.
+        ----------------------------------------------------------------------
+        Output:
+        ----------------------------------------------------------------------
+        - paths of the fits files written, ordered by ROI then frame and
+        named `<name>-fits/<name>-ROI###-Frame####.fits`.
         ----------------------------------------------------------------------
         Exceptions:
         ----------------------------------------------------------------------
         - `ImportError`: The Python runtime will raise this if astropy cannot
         be imported.
+        - `ValueError` raised if `workers` or `frames_per_task` is not
+        positive.
         ----------------------------------------------------------------------
         See Also:
         ----------------------------------------------------------------------
@@ -116,40 +235,189 @@ class Fits():
             if region.height < 1 or region.width < 1:
                 raise ValueError('One or more region(s) of the'
                     ' spe file do not have valid data.')
+        if workers < 1:
+            raise ValueError('workers must be at least 1.')
+        if frames_per_task is not None and frames_per_task < 1:
+            raise ValueError('frames_per_task must be at least 1.')
+        from astropy.io import fits
+        new_folder_path = Path(spe_ref.file_directory) /\
+            ('%s-fits'%(spe_ref.file_name))
+        new_folder_path.mkdir(exist_ok=True)
+        num_frames = int(spe_ref.num_frames)
+        #time stamps are added to the header if they exist
+        settings_header = fits.Header()
+        exposure_started = None
+        for meta in spe_ref.meta_list:
+            if isinstance(meta, TimeStamp) and\
+                meta.meta_event == 'ExposureStarted':
+                settings_header['HIERARCH ACQUISITION_ORIGIN']\
+                    = meta.absolute_time
+                exposure_started = np.asarray(spe_ref.get_frame_metadata_value(
+                    range(0, num_frames))['ExposureStarted'])
+                break
+        settings_header.extend(_settings_header(spe_ref))
+        frame_bytes = max(region.width * region.height
+                          for region in spe_ref.roi_list) *\
+            spe_ref._pixel_dtype().itemsize# pylint: disable=protected-access
+        if frames_per_task is None:
+            frames_per_task = max(1, min(-(-num_frames//(workers*4)),
+                SpeReference.max_read_bytes // max(1, frame_bytes)))
+        tasks = []
+        headers = []
+        output_filepaths = []
+        for idx_roi, roi in enumerate(spe_ref.roi_list):
+            header = settings_header.copy()
+            header.extend(_bin_header(roi))
+            headers.append(header)
+            paths = [new_folder_path / ('%s-ROI%03d-Frame%04d.fits'%(
+                spe_ref.file_name, idx_roi+1, j+1))
+                for j in range(0, num_frames)]
+            output_filepaths.extend(paths)
+            for first in range(0, num_frames, frames_per_task):
+                frames = range(first, min(first+frames_per_task, num_frames))
+                tasks.append((idx_roi, frames,
+                    None if exposure_started is None
+                    else exposure_started[frames.start:frames.stop],
+                    paths[frames.start:frames.stop]))
+        files_written = 0
+        if workers == 1:
+            for task in tasks:
+                files_written += _write_frame_files(spe_ref,
+                    headers[task[0]], *task)
+                if progress is not None:
+                    progress(files_written, len(output_filepaths))
+        else:
+            with ProcessPoolExecutor(max_workers=workers,
+                initializer=_init_frame_file_worker,
+                initargs=(spe_ref.filepath, headers)) as executor:
+                for future in as_completed([executor.submit(
+                    _write_frame_files_in_worker, *task)
+                    for task in tasks]):
+                    files_written += future.result()
+                    if progress is not None:
+                        progress(files_written, len(output_filepaths))
+        return output_filepaths
+
+    @staticmethod
+    def generate_mef_file(spe_ref: SpeReference, *,
+                          compression: Optional[str] = None,
+                          batch_size: Optional[int] = None) -> Path:
+        """**REQUIRES ASTROPY LIBRARY**
+
+        Generates a single multi-extension fits file next to the spe file
+        (`<name>.fits`), holding everything `generate_fits_files` spreads
+        over per-frame files:
+        - primary HDU (no data): select experiment settings from the spe
+        file's xml footer, and the acquisition origin of the time stamps.
+        - one image extension per ROI (`ROI001`, ...), holding the
+        `[frames, height, width]` cube and the ROI's binning.
+        - a `FRAMES` binary table with one row per frame and one column per
+        metadata type (time stamps in ms, frame tracking numbers, gate
+        delays / widths), named as in `SpeReference.get_frame_metadata_value`.
+        - a `WAVELENGTHS` binary table with one row and one array column per
+        ROI holding its wavelength axis (if the spe file is calibrated). The
+        columns have unit nm: the spe format stores wavelength calibrations
+        in nm and the footer has no unit attribute.
+
+        Uncompressed cubes are streamed into their data unit in batches of
+        frames (see `read_spe.SpeReference.iter_frames`); compressed cubes
+        are compressed tile by tile (one frame per tile) from a memory-mapped
+        view of the data (see `read_spe.SpeReference.as_memmap`).
+        ----------------------------------------------------------------------
+        Input:
+        ----------------------------------------------------------------------
+        - `spe_ref`: `SpeReference` object containing the information from the
+        spe file that will be used to generate fits.
+        - `compression`: Optional named argument for the tile compression of
+        the image extensions (e.g. 'RICE_1' for integer data, 'GZIP_1',
+        'GZIP_2' or 'HCOMPRESS_1'). If None, images are not compressed.
+        Note that astropy quantizes floating point data before compressing
+        it (lossy) by default.
+        - `batch_size`: Optional named argument for the number of frames
+        read and written at a time for uncompressed cubes. If None, batches
+        are sized by `SpeReference.max_read_bytes`.
+        ----------------------------------------------------------------------
+        Output:
+        ----------------------------------------------------------------------
+        - path of the fits file written.
+        ----------------------------------------------------------------------
+        Exceptions:
+        ----------------------------------------------------------------------
+        - `ImportError`: The Python runtime will raise this if astropy cannot
+        be imported.
+        ----------------------------------------------------------------------
+        See Also:
+        ----------------------------------------------------------------------
+        - `read_spe.Fits.generate_fits_file`
+        - `read_spe.SpeReference.get_frame_metadata_value`
+        """
+        for region in spe_ref.roi_list:
+            if region.height < 1 or region.width < 1:
+                raise ValueError('One or more region(s) of the'
+                    ' spe file do not have valid data.')
+        datatype = spe_ref._pixel_dtype()# pylint: disable=protected-access
         from astropy.io import fits
-        new_folder_path = Path('%s\\%s-fits\\'%(spe_ref.file_directory,
-            spe_ref.file_name))
-        if not new_folder_path.exists():
-            new_folder_path.mkdir()
+        output_filepath = Path(spe_ref.file_directory) /\
+            ('%s.fits'%(spe_ref.file_name))
+        num_frames = int(spe_ref.num_frames)
+        primary = fits.PrimaryHDU()
+        for meta in spe_ref.meta_list:
+            if isinstance(meta, TimeStamp):
+                primary.header['HIERARCH ACQUISITION_ORIGIN']\
+                    = meta.absolute_time
+                break
+        primary.header.extend(_settings_header(spe_ref))
+        primary.writeto(output_filepath, overwrite=True)
         for idx_roi, roi in enumerate(spe_ref.roi_list):
-            for j in range(0, spe_ref.num_frames):
-                output_filepath = '%s\\%s-ROI%03d-Frame%04d.fits'%(
-                    new_folder_path, spe_ref.file_name, idx_roi+1, j+1)
-                file_data = spe_ref.get_data(rois=[idx_roi], frames=[j])[0]
-                frame_metadata = spe_ref.get_frame_metadata_value([j])[0]
-                hdu = fits.PrimaryHDU(file_data)
-                hdr = hdu.header
-                #add time stamps to header if they exist
-                if spe_ref.meta_list:
-                    count = 0
-                    for meta in spe_ref.meta_list:
-                        if isinstance(meta, TimeStamp):
-                            if meta.meta_event == 'ExposureStarted':
-                                hdr['HIERARCH ACQUISITION_ORIGIN']\
-                                    = meta.absolute_time
-                                hdr[
-                                'HIERARCH FRAME_EXPOSURE_STARTED_OFFSET_MS']\
-                                    = frame_metadata[count]
-                        count += 1
-                #append experiment settings list to header
-                experiment_settings_seq\
-                    = spe_ref.retrieve_all_experiment_settings()
-                bin_settings_seq = (ExperimentSetting('X_BIN',
-                np.int64(roi.xbin), np.int64, _Unit.NONE),
-                ExperimentSetting('Y_BIN', np.int64(roi.ybin),
-                                  np.int64, _Unit.NONE))
-                assert isinstance(experiment_settings_seq, tuple)
-                for setting in experiment_settings_seq + bin_settings_seq:
-                    hdr['HIERARCH %s'%(setting.setting_name)]\
-                        = setting.setting_value
-                hdu.writeto(output_filepath, overwrite=True)
+            name = 'ROI%03d'%(idx_roi+1)
+            if compression is not None:
+                hdu = fits.CompImageHDU(
+                    spe_ref.as_memmap(rois=[idx_roi])[0], name=name,
+                    compression_type=compression,
+                    tile_shape=(1, int(roi.height), int(roi.width)))
+                hdu.header.extend(_bin_header(roi))
+                #append the HDU itself: fits.append(data, header) would
+                #write a plain (uncompressed) ImageHDU
+                with fits.open(output_filepath, mode='append') as hdul:
+                    hdul.append(hdu)
+                continue
+            hdr = fits.ImageHDU(data=np.zeros((1, 1, 1), dtype=datatype),
+                                name=name).header
+            hdr['NAXIS1'] = int(roi.width)
+            hdr['NAXIS2'] = int(roi.height)
+            hdr['NAXIS3'] = num_frames
+            hdr.extend(_bin_header(roi))
+            #appended as an extension, as the file exists (StreamingHDU
+            #only resolves str paths, a Path is taken relative to the cwd)
+            stream = fits.StreamingHDU(str(output_filepath), hdr)
+            try:
+                for _, data in spe_ref.iter_frames(rois=[idx_roi],
+                                                   batch_size=batch_size):
+                    stream.write(_fits_storage(data[0]))
+            finally:
+                stream.close()
+        tables = []
+        frame_metadata = np.asarray(spe_ref.get_frame_metadata_value(
+            range(0, num_frames)))
+        columns = [fits.Column(name='FRAME', format='K',
+                               array=np.arange(num_frames, dtype=np.int64))]
+        for name, meta in zip(frame_metadata.dtype.names or (),
+                              spe_ref.meta_list):
+            values = frame_metadata[name]
+            columns.append(fits.Column(name=name.replace(' ', '_'),
+                format='D' if values.dtype.kind == 'f' else 'K',
+                unit='ms' if isinstance(meta, TimeStamp) else None,
+                array=values))
+        tables.append(fits.BinTableHDU.from_columns(columns, name='FRAMES'))
+        wavelengths = spe_ref.get_wavelengths()
+        if wavelengths:
+            #spe wavelength calibrations are always in nm
+            tables.append(fits.BinTableHDU.from_columns([fits.Column(
+                name='ROI%03d'%(idx_roi+1), format='%dD'%(len(axis)),
+                unit='nm', array=np.asarray(axis)[np.newaxis])
+                for idx_roi, axis in enumerate(wavelengths)],
+                name='WAVELENGTHS'))
+        with fits.open(output_filepath, mode='append') as hdul:
+            for table in tables:
+                hdul.append(table)
+        return output_filepath
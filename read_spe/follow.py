@@ -0,0 +1,172 @@
+"""Module for reading spe files that are still being written (e.g. while
+LightField is acquiring), so analysis can start before the acquisition
+finishes.
+
+An in-progress spe v3 file has no xml footer yet, so its layout is taken
+from a template (a finished file of the same experiment, or explicit ROI
+shapes). Complete readouts are inferred from the current file size. Once
+LightField writes the footer, the follower switches to a regular,
+footer-backed `SpeReference`.
+
+Example usage to process frames as they are acquired:
+>>> from read_spe import SpeFollower, SpeReference
+>>> follower = SpeFollower('run_002.spe',
+...     template=SpeReference('run_001.spe'))
+>>> for frames, data in follower.follow(idle_timeout=60):
+...     process(frames, data)
+-----
+"""
+
+#pylint: disable=consider-using-f-string
+
+import os
+import time
+import xml.etree.ElementTree as ET
+from collections.abc import Iterator, Sequence
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+from .read_spe import SpeNdArray, SpeReference
+
+class SpeFollower():
+    """Follows a spe v3 file that is being written and serves its frames
+    as they complete.
+
+    --------------------------------------------------------------------------
+    Inputs (for constructor):
+    --------------------------------------------------------------------------
+    - `filepath`: path of the spe file being written.
+    - `template`: Optional `SpeReference` of a file with the same layout.
+    - `roi_shapes`, `pixel_format`, `readout_stride`: Optional named
+    arguments describing the layout when there is no template (see
+    `read_spe.SpeReference.from_template`).
+    - `poll_interval`: Optional named argument for the time between file
+    size checks in `follow`, in seconds.
+
+    If the file already has its xml footer, no template is needed.
+    --------------------------------------------------------------------------
+    Exceptions:
+    --------------------------------------------------------------------------
+    - `ValueError` raised if the file has no footer and neither a template
+    nor `roi_shapes` is given.
+    """
+    def __init__(self, filepath: str,
+                 template: Optional[SpeReference] = None, *,
+                 roi_shapes: Optional[Sequence[tuple[int, int]]] = None,
+                 pixel_format: str = 'MonochromeUnsigned16',
+                 readout_stride: Optional[int] = None,
+                 poll_interval: float = 1.0):
+        self._filepath = filepath
+        self._poll_interval = poll_interval
+        self._complete = False
+        self._reference = self._open_complete()
+        if self._reference is None:
+            self._reference = SpeReference.from_template(filepath, template,
+                roi_shapes=roi_shapes, pixel_format=pixel_format,
+                readout_stride=readout_stride)
+
+    def _open_complete(self) -> Optional[SpeReference]:
+        """Returns a footer-backed `SpeReference` if the footer has been
+        written completely, None otherwise.
+        """
+        with open(self._filepath, 'rb') as f:
+            f.seek(678)
+            raw_loc = f.read(8)
+        if len(raw_loc) < 8:
+            return None
+        xml_loc = int(np.frombuffer(raw_loc, dtype=np.uint64)[0])
+        if xml_loc == 0 or os.stat(self._filepath).st_size <= xml_loc:
+            return None
+        try:
+            reference = SpeReference(self._filepath, lazy=True)
+            #parses the whole footer, so a partly written one is rejected
+            reference.xml_footer#pylint: disable=pointless-statement
+        except (ET.ParseError, ValueError):
+            return None
+        self._complete = True
+        return reference
+
+    def refresh(self) -> int:
+        """Checks the file for newly completed frames (switching to the
+        footer-backed reference if the footer has landed) and returns the
+        number of frames available.
+        """
+        if not self._complete:
+            reference = self._open_complete()
+            if reference is not None:
+                self._reference.close()
+                self._reference = reference
+            else:
+                self._reference.refresh_frame_count()
+        return int(self._reference.num_frames)
+
+    def follow(self,*,rois:Optional[Sequence[int]] = None, start: int = 0,
+               batch_size: Optional[int] = None,
+               dtype: Optional[npt.DTypeLike] = None,
+               idle_timeout: Optional[float] = None) ->\
+               Iterator[tuple[range, Sequence[SpeNdArray]]]:
+        """Yields frames from `start` onward as they are completed, in
+        batches of `(frames, data)` as from
+        `read_spe.SpeReference.iter_frames`. Returns once the footer has
+        been written and all frames were yielded, or after no new frames
+        arrived for `idle_timeout` seconds (if given).
+
+        ----------------------------------------------------------------------
+        Inputs:
+        ----------------------------------------------------------------------
+        - `rois`: Optional named argument for a sequence of desired ROIs. If
+        None, then all ROIs are read.
+        - `start`: Optional named argument for the first frame to yield.
+        - `batch_size`: Optional named argument for the maximum number of
+        frames per batch.
+        - `dtype`: Optional named argument for the dtype of the returned
+        arrays (see `read_spe.SpeReference.get_data`).
+        - `idle_timeout`: Optional named argument, in seconds.
+        """
+        next_frame = start
+        last_frame_time = time.monotonic()
+        while True:
+            num_frames = self.refresh()
+            if num_frames > next_frame:
+                for batch, data in self._reference.iter_frames(rois=rois,
+                    batch_size=batch_size, start=next_frame, stop=num_frames,
+                    dtype=dtype):
+                    yield batch, data
+                next_frame = num_frames
+                last_frame_time = time.monotonic()
+            elif self._complete:
+                return
+            elif idle_timeout is not None and\
+                time.monotonic() - last_frame_time > idle_timeout:
+                return
+            else:
+                time.sleep(self._poll_interval)
+
+    def close(self) -> None:
+        """Closes the file handle of the current reference."""
+        self._reference.close()
+
+    def __enter__(self) -> 'SpeFollower':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def reference(self) -> SpeReference:
+        """`SpeReference` currently used to read the file (template-backed
+        until the footer is written, footer-backed afterwards).
+        """
+        return self._reference
+    @property
+    def complete(self) -> bool:
+        """True once the xml footer has been written"""
+        return self._complete
+    @property
+    def num_frames(self) -> int:
+        """Number of frames available as of the last `refresh`"""
+        return int(self._reference.num_frames)
+    @property
+    def filepath(self) -> str:
+        """Full file path"""
+        return self._filepath
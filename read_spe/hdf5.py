@@ -0,0 +1,398 @@
+"""Module for archiving spe files as chunked, optionally compressed HDF5
+files, and for reading them back with the core `SpeReference` data API.
+
+Example usage:
+>>> from read_spe import SpeReference
+>>> from read_spe.hdf5 import Hdf5Reference, export_hdf5
+>>> path = export_hdf5(SpeReference('file.spe'), compression='gzip')
+>>> with Hdf5Reference(path) as archive:
+...     data = archive.get_data(rois=[0], frames=[10, 20])
+- only the chunks holding the requested frames are read.
+
+File layout:
+- `data/ROI001`, ...: `[frames, height, width]` dataset per ROI, chunked
+along frames. ROI position and binning are stored as attributes.
+- `wavelengths/ROI001`, ...: wavelength axis per ROI (if calibrated).
+- `frame_metadata/<event>`: one dataset per metadata column (as returned
+by `SpeReference.get_frame_metadata_value`), with the metadata type
+described in its attributes.
+- `settings/paths`, `settings/values`: the settings index of the xml
+footer (see `SpeReference.settings_index`), and `xml_footer` (spe v3).
+
+**REQUIRES H5PY: pip install h5py**
+-----
+"""
+
+#pylint: disable=consider-using-f-string
+
+import functools
+import os
+import xml.etree.ElementTree as ET
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+from types import MappingProxyType
+from typing import Optional
+import numpy as np
+import numpy.typing as npt
+from .read_spe import (FrameTrackingNumber, GateTracking, Metadata,
+    SpeNdArray, SpeReference, TimeStamp, WavelengthNdArray, meta_type_dict,
+    _ROI, _bin_wavelengths, _check_frames, _check_rois, _frame_batches,
+    _iter_batches, _parse_settings, _settings_lookup_table)
+
+def _roi_name(idx_roi: int) -> str:
+    return 'ROI%03d'%(idx_roi+1)
+
+def _metadata_attrs(meta: Metadata) -> dict:
+    """Attributes describing a metadata type, to rebuild it on readback."""
+    attrs = {'kind': type(meta).__name__, 'event': meta.meta_event,
+        'datatype': next(key for key, value in meta_type_dict.items()
+                         if value == meta.datatype),
+        'bit_depth': int(meta.bit_depth)}
+    if isinstance(meta, TimeStamp):
+        attrs['resolution'] = int(meta.resolution)
+        attrs['absolute_time'] = meta.absolute_time
+    elif isinstance(meta, GateTracking):
+        attrs['monotonic'] = bool(meta.monotonic)
+    return attrs
+
+def _metadata_from_attrs(attrs: Mapping) -> Metadata:
+    """Inverse of `_metadata_attrs`."""
+    bit_depth = np.uint64(attrs['bit_depth'])
+    match attrs['kind']:
+        case 'TimeStamp':
+            return TimeStamp(attrs['event'], attrs['datatype'], bit_depth,
+                np.uint64(attrs['resolution']), attrs['absolute_time'])
+        case 'FrameTrackingNumber':
+            return FrameTrackingNumber(attrs['datatype'], bit_depth)
+        case 'GateTracking':
+            return GateTracking(attrs['event'], attrs['datatype'], bit_depth,
+                                bool(attrs['monotonic']))
+        case _:
+            return Metadata(attrs['event'], attrs['datatype'], bit_depth)
+
+def export_hdf5(spe_ref: SpeReference,
+                destination: Optional[str | os.PathLike] = None, *,
+                compression: Optional[str] = None,
+                compression_opts: Optional[int] = None,
+                shuffle: bool = False, frames_per_chunk: int = 1,
+                batch_size: Optional[int] = None) -> Path:
+    """**REQUIRES H5PY LIBRARY**
+
+    Streams the data, wavelengths, per-frame metadata and settings of a spe
+    file into an HDF5 file (see the module docstring for the layout). Frames
+    are read in batches with `SpeReference.iter_frames`, so memory stays
+    bounded for files of any size.
+    --------------------------------------------------------------------------
+    Inputs:
+    --------------------------------------------------------------------------
+    - `spe_ref`: `SpeReference` of the spe file to export.
+    - `destination`: Optional path of the HDF5 file. Defaults to
+    `<name>.h5` next to the spe file.
+    - `compression`, `compression_opts`, `shuffle`: Optional named arguments
+    for the HDF5 filters of the ROI datasets (e.g. 'gzip' with level 0-9,
+    or 'lzf'), as in `h5py.Group.create_dataset`.
+    - `frames_per_chunk`: Optional named argument for the number of frames
+    per chunk of the ROI datasets. The default (1) makes every frame
+    individually readable.
+    - `batch_size`: Optional named argument for the number of frames read
+    and written at a time (see `SpeReference.iter_frames`).
+    --------------------------------------------------------------------------
+    Output:
+    --------------------------------------------------------------------------
+    - path of the HDF5 file written.
+    --------------------------------------------------------------------------
+    Exceptions:
+    --------------------------------------------------------------------------
+    - `ImportError`: The Python runtime will raise this if h5py cannot be
+    imported.
+    - `ValueError` raised if `frames_per_chunk` is not positive.
+    """
+    if frames_per_chunk < 1:
+        raise ValueError('frames_per_chunk must be at least 1.')
+    import h5py
+    if destination is None:
+        destination = Path(spe_ref.file_directory) /\
+            ('%s.h5'%(spe_ref.file_name))
+    destination = Path(destination)
+    num_frames = int(spe_ref.num_frames)
+    dtype = spe_ref._pixel_dtype()# pylint: disable=protected-access
+    string_dtype = h5py.string_dtype()
+    with h5py.File(destination, 'w') as h5file:
+        h5file.attrs['source_file'] = str(spe_ref.filepath)
+        h5file.attrs['spe_version'] = float(spe_ref.spe_version)
+        h5file.attrs['pixel_format'] = str(spe_ref.pixel_format_key)
+        h5file.attrs['num_frames'] = num_frames
+        data_group = h5file.create_group('data')
+        datasets = []
+        for idx_roi, roi in enumerate(spe_ref.roi_list):
+            dataset = data_group.create_dataset(_roi_name(idx_roi),
+                shape=(num_frames, int(roi.height), int(roi.width)),
+                dtype=dtype, chunks=(min(frames_per_chunk, max(1, num_frames)),
+                max(1, int(roi.height)), max(1, int(roi.width))),
+                compression=compression, compression_opts=compression_opts,
+                shuffle=shuffle)
+            for name in ('x', 'y', 'xbin', 'ybin', 'stride'):
+                dataset.attrs[name] = int(getattr(roi, name))
+            datasets.append(dataset)
+        if num_frames > 0:
+            for frames, data in spe_ref.iter_frames(batch_size=batch_size):
+                for dataset, region_data in zip(datasets, data):
+                    dataset[frames.start:frames.stop] = region_data
+        wavelength_group = h5file.create_group('wavelengths')
+        for idx_roi, wavelengths in enumerate(spe_ref.get_wavelengths()):
+            wavelength_group.create_dataset(_roi_name(idx_roi),
+                                            data=wavelengths)
+        metadata_group = h5file.create_group('frame_metadata')
+        frame_metadata = spe_ref.get_frame_metadata_value(
+            range(0, num_frames))
+        names = frame_metadata.dtype.names or ()# type: ignore
+        metadata_group.attrs['names'] = np.array(names, dtype=string_dtype)
+        for name, meta in zip(names, spe_ref.meta_list):
+            dataset = metadata_group.create_dataset(name,
+                data=frame_metadata[name])# type: ignore
+            dataset.attrs.update(_metadata_attrs(meta))
+        settings = spe_ref.settings_index if spe_ref.spe_version >= 3 else {}
+        settings_group = h5file.create_group('settings')
+        settings_group.create_dataset('paths', data=np.array(
+            list(settings.keys()), dtype=string_dtype))
+        settings_group.create_dataset('values', data=np.array(
+            list(settings.values()), dtype=string_dtype))
+        if spe_ref.spe_version >= 3:
+            h5file.create_dataset('xml_footer', data=spe_ref.xml_footer,
+                                  dtype=string_dtype)
+    return destination
+
+def _check_options(method: str, options: Mapping[str, object]) -> None:
+    """Raises ValueError for inputs of the `SpeReference` method that
+    `Hdf5Reference` does not support.
+    """
+    if options:
+        raise ValueError('Hdf5Reference.%s does not support %s; select and'
+            ' bin the returned arrays instead.'%(method,
+            ', '.join(sorted(options))))
+
+class Hdf5Reference():
+    """**REQUIRES H5PY LIBRARY**
+
+    Reads an HDF5 file written by `export_hdf5` with the core data API of
+    `SpeReference` (`get_data` and `iter_frames` by ROI, frame and dtype,
+    `get_wavelengths`, `get_frame_metadata_value`, `get_setting` and the
+    matching properties), so code can switch between spe files and archives
+    transparently. Hyperslab, wavelength and binning options of `get_data`
+    are not supported. Data is read lazily: only the chunks holding
+    requested frames are read.
+
+    --------------------------------------------------------------------------
+    Inputs (for constructor):
+    --------------------------------------------------------------------------
+    - `filepath`: path of the HDF5 file.
+    --------------------------------------------------------------------------
+    Exceptions:
+    --------------------------------------------------------------------------
+    - `ImportError`: The Python runtime will raise this if h5py cannot be
+    imported.
+    - `ValueError` raised if the file was not written by `export_hdf5`.
+    """
+    def __init__(self, filepath: str | os.PathLike):
+        import h5py
+        self._filepath = str(filepath)
+        self._file = h5py.File(self._filepath, 'r')
+        try:
+            data_group = self._file['data']
+            self._num_frames = int(self._file.attrs['num_frames'])
+        except KeyError as exc:
+            self._file.close()
+            raise ValueError('%s is not an exported spe file.'
+                             %(self._filepath)) from exc
+        self._datasets = []
+        self._roi_list = []
+        for idx_roi in range(0, len(data_group)):
+            dataset = data_group[_roi_name(idx_roi)]
+            roi = _ROI(np.int64(dataset.shape[2]), np.int64(dataset.shape[1]),
+                       np.int64(dataset.attrs['stride']))
+            roi.x = int(dataset.attrs['x'])
+            roi.y = int(dataset.attrs['y'])
+            roi.xbin = int(dataset.attrs['xbin'])
+            roi.ybin = int(dataset.attrs['ybin'])
+            self._datasets.append(dataset)
+            self._roi_list.append(roi)
+        wavelength_group = self._file['wavelengths']
+        self._wavelengths = []
+        for idx_roi in range(0, len(wavelength_group)):
+            wavelengths = wavelength_group[_roi_name(idx_roi)][()]
+            wavelengths.flags.writeable = False
+            self._wavelengths.append(wavelengths)
+        metadata_group = self._file['frame_metadata']
+        names = [name.decode() if isinstance(name, bytes) else name
+                 for name in metadata_group.attrs['names']]
+        self._meta_list = tuple(_metadata_from_attrs(metadata_group[name].attrs)
+                                for name in names)
+        self._frame_metadata_values = np.zeros(self._num_frames,
+            dtype=np.dtype([(name, metadata_group[name].dtype)
+                            for name in names]))
+        for name in names:
+            self._frame_metadata_values[name] = metadata_group[name][()]
+        self._frame_metadata_values.flags.writeable = False
+        settings_group = self._file['settings']
+        self._settings_index = dict(zip(
+            settings_group['paths'].asstr()[()],
+            settings_group['values'].asstr()[()]))
+        key_settings = ()
+        if 'xml_footer' in self._file:
+            #key settings (e.g. EXPOSURE_TIME) come from the stored footer
+            key_settings = _parse_settings(ET.fromstring(
+                self._file['xml_footer'].asstr()[()]))[1]
+        self._settings_lookup = _settings_lookup_table(self._settings_index,
+                                                       key_settings)
+
+    def get_data(self,*,rois:Optional[Sequence[int]] = None,
+                 frames:Optional[Sequence[int]] = None,
+                 dtype: Optional[npt.DTypeLike] = None,
+                 **options) -> Sequence[SpeNdArray]:
+        """Extracts the requested ROI(s) and frame(s). Same `rois`, `frames`
+        and `dtype` inputs and output as `read_spe.SpeReference.get_data`
+        (frames may be in any order and repeat). Runs of consecutive frames
+        are read as slices; other selections are read once per distinct
+        frame, in increasing order.
+
+        The other inputs of `SpeReference.get_data` (hyperslabs, wavelength
+        selection, binning, `mmap`, `out`, ...) are not supported and raise
+        `ValueError`.
+        """
+        _check_options('get_data', options)
+        rois = _check_rois(rois, len(self._roi_list))
+        frames = _check_frames(frames, self._num_frames)
+        if isinstance(frames, range) and frames.step == 1:
+            selection, inverse = slice(frames.start, frames.stop), None
+        else:
+            unique, inverse = np.unique(np.asarray(frames, dtype=np.int64),
+                                        return_inverse=True)
+            if len(unique) > 0 and unique[-1] - unique[0] + 1 == len(unique):
+                selection = slice(int(unique[0]), int(unique[-1])+1)
+            else:
+                selection = unique
+        output = []
+        for roi in rois:
+            dataset = self._datasets[roi]
+            if isinstance(selection, slice) or len(selection) > 0:
+                region_data = dataset[selection]
+            else:
+                region_data = np.zeros((0,) + dataset.shape[1:],
+                                       dtype=dataset.dtype)
+            if inverse is not None:
+                region_data = region_data[inverse]
+            if dtype is not None:
+                region_data = region_data.astype(dtype, copy=False)
+            output.append(region_data)
+        return output
+
+    def iter_frames(self,*,rois:Optional[Sequence[int]] = None,
+                    batch_size: Optional[int] = None, start: int = 0,
+                    stop: Optional[int] = None, step: int = 1,
+                    dtype: Optional[npt.DTypeLike] = None,
+                    **options) -> Iterator[tuple[range, Sequence[SpeNdArray]]]:
+        """Walks through the frames in batches. Same inputs (except those
+        not supported by `get_data`) and output as
+        `read_spe.SpeReference.iter_frames`.
+        """
+        _check_options('iter_frames', options)
+        rois = _check_rois(rois, len(self._roi_list))
+        if stop is None:
+            stop = self._num_frames
+        frames = range(start, stop, step)
+        if len(frames) == 0:
+            return
+        _check_frames(frames, self._num_frames)
+        batches = _frame_batches(frames, batch_size, sum(
+            int(np.prod(self._datasets[roi].shape[1:])) *
+            self._datasets[roi].dtype.itemsize for roi in rois),
+            SpeReference.max_read_bytes)
+        yield from _iter_batches(functools.partial(self.get_data, rois=rois,
+            dtype=dtype), batches)
+
+    def get_wavelengths(self,*, rois: Optional[Sequence[int]] = None,
+                        xbin: int = 1) -> Sequence[WavelengthNdArray]:
+        """Wavelength axis of the ROI(s), as stored on export. Same inputs
+        and output as `read_spe.SpeReference.get_wavelengths`.
+        """
+        if not self._wavelengths:
+            return []
+        rois = _check_rois(rois, len(self._roi_list))
+        if xbin < 1:
+            raise ValueError('xbin must be at least 1.')
+        wavelength_list = [self._wavelengths[roi] for roi in rois]
+        if xbin > 1:
+            wavelength_list = [_bin_wavelengths(wavelengths, xbin)
+                               for wavelengths in wavelength_list]
+        return wavelength_list
+
+    def get_frame_metadata_value(self, frames: Sequence[int]) -> np.ndarray:
+        """Retrieves per-frame metadata values as a structured array (see
+        `read_spe.SpeReference.get_frame_metadata_value`).
+        """
+        frames = _check_frames(frames, self._num_frames)
+        return self._frame_metadata_values[np.asarray(frames, dtype=np.int64)]
+
+    def get_setting(self, path: str) -> Optional[str]:
+        """Looks up a device setting by its element path or key setting name
+        (see `read_spe.SpeReference.get_setting`); case-insensitive. Returns
+        None if the setting does not exist.
+        """
+        return self._settings_lookup.get(path.strip('/').casefold())
+
+    def close(self) -> None:
+        """Closes the HDF5 file."""
+        self._file.close()
+
+    def __enter__(self) -> 'Hdf5Reference':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def filepath(self) -> str:
+        """Full path of the HDF5 file"""
+        return self._filepath
+    @property
+    def source_filepath(self) -> str:
+        """Path of the spe file that was exported"""
+        return str(self._file.attrs['source_file'])
+    @property
+    def spe_version(self) -> float:
+        """spe version of the exported file"""
+        return float(self._file.attrs['spe_version'])
+    @property
+    def pixel_format_key(self) -> str:
+        """pixel format key of the exported file (as a string)"""
+        return str(self._file.attrs['pixel_format'])
+    @property
+    def num_frames(self) -> int:
+        """Number of frames"""
+        return self._num_frames
+    @property
+    def roi_list(self) -> Sequence[_ROI]:
+        """tuple of ROIs"""
+        return tuple(self._roi_list)
+    @property
+    def meta_list(self) -> Sequence[Metadata]:
+        """Tuple of metadata types of each frame"""
+        return self._meta_list
+    @property
+    def frame_metadata_values(self) -> np.ndarray:
+        """Read-only structured array of the metadata of all frames (see
+        `read_spe.SpeReference.frame_metadata_values`).
+        """
+        return self._frame_metadata_values
+    @property
+    def settings_index(self) -> Mapping[str, str]:
+        """Read-only mapping of the device settings of the xml footer (see
+        `read_spe.SpeReference.settings_index`).
+        """
+        return MappingProxyType(self._settings_index)
+    @property
+    def xml_footer(self) -> Optional[str]:
+        """xml footer of the exported spe v3 file, None for spe v2.x"""
+        if 'xml_footer' not in self._file:
+            return None
+        return self._file['xml_footer'].asstr()[()]
@@ -8,7 +8,8 @@ Class and methods that facilitate reading of data, metadata, and
 experiment settings from spe files.
 
 Full functionality with spe version 3.0+; for older versions
-(i.e. spe2.x), data from single ROIs can be extracted.
+(i.e. spe2.x), data (all ROIs), the binary header and the wavelength
+calibration polynomial are decoded; there is no per-frame metadata or xml.
 
 Example usage of SpeReference class:
 - import: `from read_spe import SpeReference`
@@ -25,18 +26,31 @@ Example usage of SpeReference class:
 
 #pylint: disable=consider-using-f-string
 
+import functools
+import hashlib
+import json
+import os
+import threading
+import warnings
+import zipfile
 import xml.etree.ElementTree as ET
 import xml.dom.minidom as md
-from collections.abc import Sequence
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator, Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path, PurePath
-from typing import TypeAlias, NewType, Optional, cast
+from typing import BinaryIO, TypeAlias, NewType, Optional, cast
 from enum import Enum, auto
+from types import MappingProxyType
 import numpy as np
+import numpy.typing as npt
 
 SettingValueType: TypeAlias = np.uint64 | np.int64 | np.float64 | str
 PixelFormatKeyType: TypeAlias = str | int
 MetaType: TypeAlias = np.int64 | np.float64
 meta_type_dict = {'Int64': np.int64, 'Double': np.float64}
+#bump when the layout of the SpeReference index cache changes
+_CACHE_VERSION = 3
 
 ###
 #typing
@@ -55,6 +69,224 @@ LineNdArray: TypeAlias = np.ndarray[LineShape, PixelDtype]
 SpeNdArray: TypeAlias = ImageNdArray
 WavelengthShape: TypeAlias = tuple[Wavelengths]
 WavelengthNdArray: TypeAlias = np.ndarray[WavelengthShape, WavelengthDtype]
+#rows / cols selection: one slice for all ROIs, or one slice per ROI
+HyperslabType: TypeAlias = Optional[slice | Sequence[Optional[slice]]]
+
+###
+#spe 2.x (WinSpec/32) binary header layout
+_old_spe_calibration_dtype = np.dtype({
+    'names': ['offset', 'factor', 'current_unit', 'string', 'calib_valid',
+              'input_unit', 'polynom_unit', 'polynom_order', 'calib_count',
+              'pixel_position', 'calib_value', 'polynom_coeff',
+              'laser_position', 'new_calib_flag', 'calib_label'],
+    'formats': ['<f8', '<f8', 'u1', 'S40', 'u1', 'u1', 'u1', 'u1', 'u1',
+                ('<f8', 10), ('<f8', 10), ('<f8', 6), '<f8', 'u1', 'S81'],
+    'offsets': [0, 8, 16, 18, 98, 99, 100, 101, 102, 103, 183, 263, 311,
+                320, 321],
+    'itemsize': 489})
+_old_spe_roi_dtype = np.dtype([('startx', '<u2'), ('endx', '<u2'),
+    ('groupx', '<u2'), ('starty', '<u2'), ('endy', '<u2'), ('groupy', '<u2')])
+_old_spe_header_fields = (
+    ('ControllerVersion', '<i2', 0), ('LogicOutput', '<i2', 2),
+    ('AmpHiCapLowNoise', '<u2', 4), ('xDimDet', '<u2', 6), ('mode', '<i2', 8),
+    ('exp_sec', '<f4', 10), ('VChipXdim', '<i2', 14),
+    ('VChipYdim', '<i2', 16), ('yDimDet', '<u2', 18), ('date', 'S10', 20),
+    ('VirtualChipFlag', '<i2', 30), ('noscan', '<i2', 34),
+    ('DetTemperature', '<f4', 36), ('DetType', '<i2', 40), ('xdim', '<u2', 42),
+    ('stdiode', '<i2', 44), ('DelayTime', '<f4', 46),
+    ('ShutterControl', '<u2', 50), ('AbsorbLive', '<i2', 52),
+    ('AbsorbMode', '<u2', 54), ('CanDoVirtualChipFlag', '<i2', 56),
+    ('ThresholdMinLive', '<i2', 58), ('ThresholdMinVal', '<f4', 60),
+    ('ThresholdMaxLive', '<i2', 64), ('ThresholdMaxVal', '<f4', 66),
+    ('SpecAutoSpectroMode', '<i2', 70), ('SpecCenterWlNm', '<f4', 72),
+    ('SpecGlueFlag', '<i2', 76), ('SpecGlueStartWlNm', '<f4', 78),
+    ('SpecGlueEndWlNm', '<f4', 82), ('SpecGlueMinOvrlpNm', '<f4', 86),
+    ('SpecGlueFinalResNm', '<f4', 90), ('PulserType', '<i2', 94),
+    ('CustomChipFlag', '<i2', 96), ('XPrePixels', '<i2', 98),
+    ('XPostPixels', '<i2', 100), ('YPrePixels', '<i2', 102),
+    ('YPostPixels', '<i2', 104), ('asynen', '<i2', 106),
+    ('datatype', '<i2', 108), ('PulserMode', '<i2', 110),
+    ('PulserOnChipAccums', '<u2', 112), ('PulserRepeatExp', '<u4', 114),
+    ('PulseRepWidth', '<f4', 118), ('PulseRepDelay', '<f4', 122),
+    ('PulseSeqStartWidth', '<f4', 126), ('PulseSeqEndWidth', '<f4', 130),
+    ('PulseSeqStartDelay', '<f4', 134), ('PulseSeqEndDelay', '<f4', 138),
+    ('PulseSeqIncMode', '<i2', 142), ('PImaxUsed', '<i2', 144),
+    ('PImaxMode', '<i2', 146), ('PImaxGain', '<i2', 148),
+    ('BackGrndApplied', '<i2', 150), ('PImax2nsBrdUsed', '<i2', 152),
+    ('minblk', '<u2', 154), ('numminblk', '<u2', 156),
+    ('SpecMirrorLocation', ('<i2', 2), 158),
+    ('SpecSlitLocation', ('<i2', 4), 162), ('CustomTimingFlag', '<i2', 170),
+    ('ExperimentTimeLocal', 'S7', 172), ('ExperimentTimeUTC', 'S7', 179),
+    ('ExposUnits', '<i2', 186), ('ADCoffset', '<u2', 188),
+    ('ADCrate', '<u2', 190), ('ADCtype', '<u2', 192),
+    ('ADCresolution', '<u2', 194), ('ADCbitAdjust', '<u2', 196),
+    ('gain', '<u2', 198), ('Comments', ('S80', 5), 200),
+    ('geometric', '<u2', 600), ('xlabel', 'S16', 602), ('cleans', '<u2', 618),
+    ('NumSkpPerCln', '<u2', 620), ('SpecMirrorPos', ('<i2', 2), 622),
+    ('SpecSlitPos', ('<f4', 4), 626), ('AutoCleansActive', '<i2', 642),
+    ('UseContCleansInst', '<i2', 644), ('AbsorbStripNum', '<i2', 646),
+    ('SpecSlitPosUnits', '<i2', 648), ('SpecGrooves', '<f4', 650),
+    ('srccmp', '<i2', 654), ('ydim', '<u2', 656), ('scramble', '<i2', 658),
+    ('ContinuousCleansFlag', '<i2', 660),
+    ('ExternalTriggerFlag', '<i2', 662), ('lnoscan', '<i4', 664),
+    ('lavgexp', '<i4', 668), ('ReadoutTime', '<f4', 672),
+    ('TriggeredModeFlag', '<i2', 676), ('XML_Offset', '<u8', 678),
+    ('sw_version', 'S16', 688), ('type', '<i2', 704),
+    ('flatFieldApplied', '<i2', 706), ('kin_trig_mode', '<i2', 724),
+    ('dlabel', 'S16', 726), ('PulseFileName', 'S120', 1178),
+    ('AbsorbFileName', 'S120', 1298), ('NumExpRepeats', '<u4', 1418),
+    ('NumExpAccums', '<u4', 1422), ('YT_Flag', '<i2', 1426),
+    ('clkspd_us', '<f4', 1428), ('HWaccumFlag', '<i2', 1432),
+    ('StoreSync', '<i2', 1434), ('BlemishApplied', '<i2', 1436),
+    ('CosmicApplied', '<i2', 1438), ('CosmicType', '<i2', 1440),
+    ('CosmicThreshold', '<f4', 1442), ('NumFrames', '<i4', 1446),
+    ('MaxIntensity', '<f4', 1450), ('MinIntensity', '<f4', 1454),
+    ('ylabel', 'S16', 1458), ('ShutterType', '<u2', 1474),
+    ('shutterComp', '<f4', 1476), ('readoutMode', '<u2', 1480),
+    ('WindowSize', '<u2', 1482), ('clkspd', '<u2', 1484),
+    ('interface_type', '<u2', 1486), ('NumROIsInExperiment', '<i2', 1488),
+    ('controllerNum', '<u2', 1506), ('SWmade', '<u2', 1508),
+    ('NumROI', '<i2', 1510), ('ROIinfblk', (_old_spe_roi_dtype, 10), 1512),
+    ('FlatField', 'S120', 1632), ('background', 'S120', 1752),
+    ('blemish', 'S120', 1872), ('file_header_ver', '<f4', 1992),
+    ('YT_Info', 'S1000', 1996), ('WinView_id', '<i4', 2996),
+    ('xcalibration', _old_spe_calibration_dtype, 3000),
+    ('ycalibration', _old_spe_calibration_dtype, 3489),
+    ('Istring', 'S40', 3978), ('SpecType', 'u1', 4043),
+    ('SpecModel', 'u1', 4044), ('PulseBurstUsed', 'u1', 4045),
+    ('PulseBurstCount', '<u4', 4046), ('PulseBurstPeriod', '<f8', 4050),
+    ('PulseBracketUsed', 'u1', 4058), ('PulseBracketType', 'u1', 4059),
+    ('PulseTimeConstFast', '<f8', 4060), ('PulseAmplitudeFast', '<f8', 4068),
+    ('PulseTimeConstSlow', '<f8', 4076), ('PulseAmplitudeSlow', '<f8', 4084),
+    ('AnalogGain', '<i2', 4092), ('AvGainUsed', '<i2', 4094),
+    ('AvGain', '<i2', 4096), ('lastvalue', '<i2', 4098))
+#structured dtype of the full 4100 byte spe 2.x header (field names as in
+#the WinSpec/32 documentation; spare fields are left out)
+old_spe_header_dtype = np.dtype({
+    'names': [name for name, _, _ in _old_spe_header_fields],
+    'formats': [fmt for _, fmt, _ in _old_spe_header_fields],
+    'offsets': [offset for _, _, offset in _old_spe_header_fields],
+    'itemsize': 4100})
+
+def _plan_reads(frames: Sequence[int], readout_stride: int, gap_bytes: int,
+                max_bytes: int) -> list[tuple[int, int, np.ndarray,
+                                              np.ndarray]]:
+    """Coalesces requested frames into as few large reads as possible.
+
+    The frames are sorted and grouped so that requested readouts separated
+    by no more than `gap_bytes` of unrequested data share a read, and no read
+    spans more than `max_bytes` (a single readout is always allowed).
+
+    Each planned read is a tuple of `(first_frame, frame_count, out_idx,
+    block_idx)`: read `frame_count` readouts starting at `first_frame`, then
+    readout `block_idx[i]` of that block goes to output position
+    `out_idx[i]` (the position in the caller's original order).
+    """
+    frame_array = np.asarray(frames, dtype=np.int64)
+    if frame_array.size == 0:
+        return []
+    order = np.argsort(frame_array, kind='stable')
+    sorted_frames = frame_array[order]
+    gap_frames = max(0, gap_bytes) // readout_stride
+    max_frames = max(1, max_bytes // readout_stride)
+    breaks = np.flatnonzero(np.diff(sorted_frames) > gap_frames + 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [sorted_frames.size]))
+    read_plan = []
+    for pos, end in zip(starts.tolist(), ends.tolist()):
+        while pos < end:
+            first_frame = int(sorted_frames[pos])
+            stop = pos + int(np.searchsorted(sorted_frames[pos:end],
+                                             first_frame + max_frames))
+            read_plan.append((first_frame,
+                int(sorted_frames[stop-1]) - first_frame + 1,
+                order[pos:stop], sorted_frames[pos:stop] - first_frame))
+            pos = stop
+    return read_plan
+
+def _check_rois(rois: Optional[Sequence[int]], num_rois: int) ->\
+    Sequence[int]:
+    """Defaults `rois` to all `num_rois` regions and validates range."""
+    if not rois:
+        rois = range(0, num_rois)
+    try:
+        for item in rois:
+            if item < 0 or item >= num_rois:
+                raise ValueError(
+                'ROI value outside of allowed ranged (%d through %d)'
+                %(0, num_rois-1))
+    except TypeError as exc:
+        raise TypeError('ROI input needs to be iterable') from exc
+    return rois
+
+def _check_frames(frames: Optional[Sequence[int]], num_frames: int) ->\
+    Sequence[int]:
+    """Defaults `frames` to all `num_frames` frames and validates range."""
+    try:
+        if frames is None or len(frames) == 0:
+            frames = range(0, num_frames)
+    except TypeError as exc:
+        raise TypeError('Frame input needs to be iterable') from exc
+    if len(frames) == 0:
+        #no frames written yet (empty or in-progress file)
+        return frames
+    if isinstance(frames, range):
+        low, high = min(frames), max(frames)
+    else:
+        frame_array = np.asarray(frames)
+        if frame_array.ndim != 1 or\
+            not np.issubdtype(frame_array.dtype, np.integer):
+            raise TypeError('Frame input needs to be a sequence of ints')
+        low, high = frame_array.min(), frame_array.max()
+    if low < 0 or high >= num_frames:
+        raise ValueError(
+        'Frame value outside of allowed ranged (%d through %d)'
+        %(0, num_frames-1))
+    return frames
+
+def _bin_wavelengths(wavelengths: np.ndarray, xbin: int) -> np.ndarray:
+    """Averages a wavelength axis over bins of `xbin` columns (trailing
+    columns that do not fill a bin are dropped).
+    """
+    return wavelengths[:len(wavelengths)//xbin*xbin].reshape(-1, xbin)\
+        .mean(axis=1)
+
+def _frame_batches(frames: range, batch_size: Optional[int],
+                   frame_bytes: int, max_bytes: int) -> list[range]:
+    """Splits `frames` into batches of `batch_size` frames. If
+    `batch_size` is None, batches are sized so that `frame_bytes` per frame
+    fit in `max_bytes`.
+    """
+    if batch_size is None:
+        batch_size = max(1, max_bytes // max(1, frame_bytes))
+    if batch_size < 1:
+        raise ValueError('batch_size must be at least 1.')
+    return [frames[idx:idx+batch_size]
+            for idx in range(0, len(frames), batch_size)]
+
+def _iter_batches(read: Callable[..., Sequence[SpeNdArray]],
+                  batches: Sequence[range], read_ahead: bool = False) ->\
+                  Iterator[tuple[range, Sequence[SpeNdArray]]]:
+    """Yields `(batch, read(frames=batch))` for each batch. With
+    `read_ahead`, the next batch is read on a background thread while the
+    current one is processed.
+    """
+    if not read_ahead:
+        for batch in batches:
+            yield batch, read(frames=batch)
+        return
+    if len(batches) == 0:
+        return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        pending = executor.submit(read, frames=batches[0])
+        try:
+            for idx, batch in enumerate(batches):
+                data = pending.result()
+                if idx + 1 < len(batches):
+                    pending = executor.submit(read, frames=batches[idx+1])
+                yield batch, data
+        finally:
+            pending.cancel()
 
 class _Unit(Enum):
     NONE = auto()
@@ -76,6 +308,13 @@ class _ROI():
         self._y = 0
         self._xbin = 1
         self._ybin = 1
+        #loads x / y / binning on first access, for regions of a lazy
+        #SpeReference whose calibrations have not been parsed yet
+        self._load_details: Optional[Callable[[], None]] = None
+    def _details(self):
+        if self._load_details is not None:
+            load_details, self._load_details = self._load_details, None
+            load_details()
     @property
     def width(self) -> int:
         """width of region"""
@@ -100,6 +339,7 @@ class _ROI():
     @property
     def x(self) -> int:
         """x position of upper-left pixel in region"""
+        self._details()
         return self._x
     @x.setter
     def x(self, val: int):
@@ -107,6 +347,7 @@ class _ROI():
     @property
     def y(self) -> int:
         """y position of upper-left pixel in region"""
+        self._details()
         return self._y
     @y.setter
     def y(self, val: int):
@@ -114,6 +355,7 @@ class _ROI():
     @property
     def xbin(self) -> int:
         """number of binned columns in region"""
+        self._details()
         return self._xbin
     @xbin.setter
     def xbin(self, val: int):
@@ -121,6 +363,7 @@ class _ROI():
     @property
     def ybin(self) -> int:
         """number of binned rows in region"""
+        self._details()
         return self._ybin
     @ybin.setter
     def ybin(self, val: int):
@@ -214,13 +457,19 @@ class ExperimentSetting():
     - `setting_value`: value of the named setting
     - `setting_type`: reference to setting's datatype
     - `unit`: uint64, int64, float64, or str
+    - `setting_text`: Optional: text of the setting as stored in the xml
+    footer. Defaults to `str(setting_value)`.
     """
     def __init__(self, setting_name: str, setting_value: SettingValueType,
-                 setting_type: type, setting_unit: _Unit) -> None:
+                 setting_type: type, setting_unit: _Unit,
+                 setting_text: Optional[str] = None) -> None:
         self._setting_name = setting_name
         self._setting_value = setting_value
         self._setting_type = setting_type
         self._setting_unit = setting_unit
+        if setting_text is None:
+            setting_text = str(setting_value)
+        self._setting_text = setting_text
     @property
     def setting_name(self) -> str:
         """Name of experiment setting. """
@@ -237,13 +486,257 @@ class ExperimentSetting():
     def setting_unit(self) -> _Unit:
         """Unit of setting."""
         return self._setting_unit
+    @property
+    def setting_text(self) -> str:
+        """Text of setting as stored in the xml footer."""
+        return self._setting_text
+
+#key experiment settings: name -> (element path below `Devices`, type,
+#unit, whether the element may be flagged relevance="False")
+_KEY_SETTINGS: dict[str, tuple[str, type, _Unit, bool]] = {
+    'EXPOSURE_TIME': ('Cameras/Camera/ShutterTiming/ExposureTime',
+                      np.float64, _Unit.MS, False),
+    'ADC_SPEED': ('Cameras/Camera/Adc/Speed', np.float64, _Unit.MHZ, True),
+    'ADC_ANALOG_GAIN': ('Cameras/Camera/Adc/AnalogGain', str, _Unit.NONE,
+                        True),
+    'BIT_DEPTH': ('Cameras/Camera/Adc/BitDepth', np.int64, _Unit.BITS, False),
+    'READOUT_TIME': ('Cameras/Camera/ReadoutControl/Time', np.float64,
+                     _Unit.MS, False),
+    'VERTICAL_SHIFT_RATE': ('Cameras/Camera/ReadoutControl/VerticalShiftRate',
+                            np.float64, _Unit.US, True),
+    'PORTS_USED': ('Cameras/Camera/ReadoutControl/PortsUsed', np.int64,
+                   _Unit.NONE, False),
+    'SENSOR_TEMPERATURE': ('Cameras/Camera/Sensor/Temperature/Reading',
+                           np.float64, _Unit.DEGREES_CELSIUS, False),
+    'SENSOR_INFORMATION': ('Cameras/Camera/Sensor/Information/SensorName',
+                           str, _Unit.NONE, False),
+    'PIXEL_PITCH': ('Cameras/Camera/Sensor/Information/Pixel/Width',
+                    np.float64, _Unit.UM, False)}
+#key experiment settings held as attributes of `System/Cameras/Camera`
+_CAMERA_SETTINGS = {'CAMERA_MODEL': 'model', 'SERIAL_NUMBER': 'serialNumber'}
+
+def _index_settings(element: ET.Element, path: str, index: dict[str, str],
+                    attributes: dict[str, dict[str, str]]) -> None:
+    """Recursively adds the leaf elements below `element` to the settings
+    `index`, keyed by their tag path (namespace removed), and their xml
+    attributes to `attributes`. The first occurrence of a path is kept.
+    """
+    for child in element:
+        child_path = child.tag.rsplit('}',maxsplit=1)[-1]
+        if path:
+            child_path = '%s/%s'%(path, child_path)
+        if len(child) > 0:
+            _index_settings(child, child_path, index, attributes)
+        elif child_path not in index:
+            index[child_path] = (child.text or '').strip()
+            attributes[child_path] = dict(child.attrib)
+
+def _children(element: ET.Element, tag: str) -> Iterator[ET.Element]:
+    """Child elements of `element` with the given tag (namespace removed)."""
+    return (child for child in element
+            if child.tag.rsplit('}',maxsplit=1)[-1] == tag)
+
+def _parse_settings(xml_root: ET.Element) ->\
+    tuple[dict[str, str], tuple[ExperimentSetting, ...]]:
+    """Indexes the device settings of the experiments in the data histories
+    of a parsed xml footer (see `SpeReference.settings_index`; the first
+    occurrence of a path is kept), and builds the key `ExperimentSetting`
+    objects of every camera (see
+    `SpeReference.retrieve_all_experiment_settings`).
+    """
+    index: dict[str, str] = {}
+    settings = []
+    experiments = [experiment
+        for histories in _children(xml_root, 'DataHistories')
+        for history in _children(histories, 'DataHistory')
+        for origin in _children(history, 'Origin')
+        for experiment in _children(origin, 'Experiment')]
+    for experiment in experiments:
+        for devices in _children(experiment, 'Devices'):
+            _index_settings(devices, '', index, {})
+            for camera in (camera for cameras in _children(devices, 'Cameras')
+                           for camera in _children(cameras, 'Camera')):
+                camera_index: dict[str, str] = {}
+                attributes: dict[str, dict[str, str]] = {}
+                _index_settings(camera, 'Cameras/Camera', camera_index,
+                                attributes)
+                for name, (path, setting_type, unit, relevant) in\
+                    _KEY_SETTINGS.items():
+                    if not camera_index.get(path) or relevant and\
+                        attributes[path].get('relevance') == 'False':
+                        continue
+                    settings.append(ExperimentSetting(name,
+                        setting_type(camera_index[path]), setting_type, unit,
+                        camera_index[path]))
+        for system in _children(experiment, 'System'):
+            for camera in (camera for cameras in _children(system, 'Cameras')
+                           for camera in _children(cameras, 'Camera')):
+                for name, attribute in _CAMERA_SETTINGS.items():
+                    settings.append(ExperimentSetting(name,
+                        str(camera.get(attribute)), str, _Unit.NONE))
+    return index, tuple(settings)
+
+def _settings_lookup_table(index: Mapping[str, str],
+                           settings: Sequence[ExperimentSetting]) ->\
+    dict[str, str]:
+    """Case-insensitive lookup of setting text by element path or by key
+    setting name (e.g. 'EXPOSURE_TIME', resolved to the first of `settings`,
+    so settings flagged relevance="False" are skipped as in
+    `SpeReference.retrieve_experiment_settings`); element paths take
+    precedence.
+    """
+    lookup = {path.casefold(): value for path, value
+              in reversed(index.items())}
+    for setting in settings:
+        lookup.setdefault(setting.setting_name.casefold(),
+                          setting.setting_text)
+    return lookup
+
+def _metadata_dtypes(meta_list: Sequence[Metadata]) ->\
+    tuple[np.dtype, np.dtype]:
+    """Builds the structured dtype of the metadata block that trails each
+    readout (as stored in the file), and the dtype of the columnar output
+    (timestamps converted to ms as `float64`).
+
+    Fields are named for the metadata event (a numeric suffix is added if
+    an event name repeats) and are ordered as in `meta_list`.
+    """
+    names: list[str] = []
+    raw_formats = []
+    out_formats = []
+    offsets = []
+    offset = 0
+    for meta in meta_list:
+        name = meta.meta_event
+        suffix = 2
+        while name in names:
+            name = '%s %d'%(meta.meta_event, suffix)
+            suffix += 1
+        names.append(name)
+        meta_bytes = int(meta.bit_depth) // 8
+        if np.dtype(meta.datatype).itemsize == meta_bytes:
+            raw_formats.append(np.dtype(meta.datatype).newbyteorder('<'))
+        else:
+            raw_formats.append(np.dtype('<%s%d'%(
+                np.dtype(meta.datatype).kind, meta_bytes)))
+        if isinstance(meta, TimeStamp):
+            out_formats.append(np.float64)
+        else:
+            out_formats.append(meta.datatype)
+        offsets.append(offset)
+        offset += meta_bytes
+    raw_dtype = np.dtype({'names': names, 'formats': raw_formats,
+                          'offsets': offsets, 'itemsize': offset})
+    out_dtype = np.dtype({'names': names, 'formats': out_formats})
+    return raw_dtype, out_dtype
+
+class FrameCache():
+    """Least-recently-used cache of frames with a byte budget, used by
+    `SpeReference.get_data` when constructed with `frame_cache_bytes`.
+    Entries are keyed by `(roi, frame)` and hold read-only arrays in the
+    file's pixel format. Safe to use from several threads.
+
+    --------------------------------------------------------------------------
+    Inputs (for constructor):
+    --------------------------------------------------------------------------
+    - `max_bytes`: byte budget. The least recently used frames are evicted
+    once the cached frames exceed it. A `get_data` request larger than the
+    budget bypasses the cache lookup, and only its last frames (as many as
+    fit in the budget) are added to the cache.
+    """
+    def __init__(self, max_bytes: int) -> None:
+        if max_bytes < 0:
+            raise ValueError('max_bytes cannot be negative.')
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._current_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        """Returns the cached frame for `key` (marking it as most recently
+        used), or None.
+        """
+        with self._lock:
+            frame = self._entries.get(key)
+            if frame is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return frame
+
+    def put(self, key: Hashable, frame: np.ndarray) -> None:
+        """Caches a copy of `frame` under `key`, evicting least recently used
+        frames as needed. Frames larger than the budget are not cached.
+        """
+        if frame.nbytes > self._max_bytes:
+            return
+        frame = np.array(frame)
+        frame.flags.writeable = False
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._current_bytes -= previous.nbytes
+            self._entries[key] = frame
+            self._current_bytes += frame.nbytes
+            self._evict()
+
+    def peek(self, key: Hashable) -> bool:
+        """True if `key` is cached (without counting a hit or miss)."""
+        with self._lock:
+            return key in self._entries
+
+    def clear(self) -> None:
+        """Drops all cached frames and resets the hit / miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+            self._hits = 0
+            self._misses = 0
+
+    def _evict(self) -> None:
+        """Drops least recently used frames until within budget."""
+        while self._current_bytes > self._max_bytes:
+            _, frame = self._entries.popitem(last=False)
+            self._current_bytes -= frame.nbytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def max_bytes(self) -> int:
+        """Byte budget of the cache"""
+        return self._max_bytes
+    @max_bytes.setter
+    def max_bytes(self, val: int):
+        if val < 0:
+            raise ValueError('max_bytes cannot be negative.')
+        with self._lock:
+            self._max_bytes = val
+            self._evict()
+    @property
+    def current_bytes(self) -> int:
+        """Bytes currently held by cached frames"""
+        return self._current_bytes
+    @property
+    def hits(self) -> int:
+        """Number of lookups served from the cache"""
+        return self._hits
+    @property
+    def misses(self) -> int:
+        """Number of lookups not found in the cache"""
+        return self._misses
 
 class SpeReference():
     """Facilitates reading of data, metadata, and experiment settings
     from spe files.
 
     Full functionality with spe version 3.0+; for older versions
-    (i.e. spe2.x), data from single ROIs can be extracted.
+    (i.e. spe2.x), data (all ROIs), the binary header and the wavelength
+    calibration polynomial are decoded; there is no per-frame metadata or
+    xml.
 
     --------------------------------------------------------------------------
 
@@ -262,6 +755,36 @@ class SpeReference():
 
     `exposure_time_ms = img_reference.retrieve_experiment_settings(
     ['EXPOSURE_TIME'])[0].setting_value`
+    - to only read the file header and data format up front (e.g. when
+    scanning many files for their geometry), construct with `lazy=True`:
+
+    `img_reference = SpeReference(spe_file, lazy=True)`
+    ----- calibration, metadata and the rest of the xml footer are then
+    parsed on first access.
+    - to keep an index of the parsed footer and metadata on disk (next to
+    the file, or in `cache_dir`) so the file reopens with a single small
+    read, construct with `cache=True`:
+
+    `img_reference = SpeReference(spe_file, cache=True)`
+    ----- the index is rebuilt whenever the spe file's size, modification
+    time or footer location change. The xml footer text itself is not
+    cached; `xml_footer` reads it from the spe file on first access.
+    `cache=True` takes precedence over `lazy`: without a valid index the
+    whole footer is parsed to build one.
+    - to keep recently read frames in memory (e.g. for a frame slider),
+    construct with a byte budget for the frame cache:
+
+    `img_reference = SpeReference(spe_file, frame_cache_bytes=512<<20)`
+    ----- repeated `get_data` calls for cached frames are then served from
+    RAM; see `frame_cache` for hit / miss counters. Requests larger than
+    the budget skip the cache lookup and only cache their last frames.
+    - to read ahead while stepping through frames (playback, sliders), also
+    pass the number of frames to prefetch:
+
+    `img_reference = SpeReference(spe_file, frame_cache_bytes=512<<20,
+    prefetch_frames=16)`
+    ----- once `get_data` requests move through the file in one direction,
+    the next frames are read into the frame cache on a background thread.
     ----------------------------------------------------------------------
     See Also:
     ----------------------------------------------------------------------
@@ -279,6 +802,10 @@ class SpeReference():
                   'MonochromeFloating32':np.float32}
     dataTypes_old_spe = {0:np.float32, 1:np.int32, 2:np.int16, 3:np.uint16,
                           5:np.float64, 6:np.uint8, 8:np.uint32}
+    #read planning for get_data: frames closer than read_gap_bytes are read
+    #together, and no single read is larger than max_read_bytes
+    read_gap_bytes: int = 1 << 20
+    max_read_bytes: int = 64 << 20
     ###to be populated by the self._initialize_spe
     _filepath: str
     _file_directory: str
@@ -293,9 +820,29 @@ class SpeReference():
     _full_wavelength_coverage: WavelengthNdArray
     _sensor_dims: _ROI
     _meta_list: list[Metadata]
-    _frame_metadata_values: Sequence[Sequence[MetaType]]
-    _xml_footer: str
-    def __init__(self, filepath: str):
+    _frame_metadata_values: Optional[np.ndarray]
+    _xml_footer: Optional[str]
+    _footer_parsed: bool
+    _layout_parsed: bool
+    _experiment_settings: Optional[tuple[ExperimentSetting, ...]]
+    _experiment_settings_lookup: dict[str, list[ExperimentSetting]]
+    _settings_index: Optional[dict[str, str]]
+    _settings_lookup: dict[str, str]
+    _cache_path: Optional[Path]
+    _memmap: Optional[np.memmap]
+    _file: Optional[BinaryIO]
+    _file_lock: threading.Lock
+    _frame_cache: Optional[FrameCache]
+    _prefetch_frames: int
+    _prefetch_executor: Optional[ThreadPoolExecutor]
+    _prefetch_lock: threading.Lock
+    _prefetch_generation: int
+    _last_access: Optional[tuple[tuple[int, ...], int]]
+    _roi_wavelengths: Optional[list[WavelengthNdArray]]
+    _old_spe_header: Optional[np.void]
+    def __init__(self, filepath: str, *, lazy: bool = False,
+                 cache: bool = False, cache_dir: Optional[str] = None,
+                 frame_cache_bytes: int = 0, prefetch_frames: int = 0):
         self._filepath = filepath
         (self._file_directory, self._file_name, self._file_extension)\
             = SpeReference._split_file_path(self._filepath)
@@ -303,116 +850,749 @@ class SpeReference():
             raise ValueError('Input filepath does not have a .spe extension.')
         self._roi_list = []
         self._full_wavelength_coverage = np.array([])
+        self._roi_wavelengths = None
+        self._old_spe_header = None
         self._meta_list = []
-        self._frame_metadata_values = []
-        self._initialize_spe()
+        self._frame_metadata_values = None
+        self._memmap = None
+        self._file = None
+        self._file_lock = threading.Lock()
+        self._frame_cache = FrameCache(frame_cache_bytes)\
+            if frame_cache_bytes > 0 else None
+        if prefetch_frames > 0 and self._frame_cache is None:
+            raise ValueError('prefetch_frames needs a frame cache'
+                ' (frame_cache_bytes).')
+        self._init_prefetch(prefetch_frames)
+        self._xml_footer = None
+        self._footer_parsed = False
+        self._layout_parsed = False
+        self._experiment_settings = None
+        self._settings_index = None
+        self._cache_path = None
+        if cache:
+            self._cache_path = self._sidecar_path(cache_dir)
+            if self._load_cache():
+                return
+            self._initialize_spe(False)
+            self._save_cache()
+        else:
+            self._initialize_spe(lazy)
+
+    @classmethod
+    def from_template(cls, filepath: str,
+                      template: Optional['SpeReference'] = None, *,
+                      roi_shapes: Optional[Sequence[tuple[int, int]]] = None,
+                      pixel_format: str = 'MonochromeUnsigned16',
+                      readout_stride: Optional[int] = None) ->\
+                      'SpeReference':
+        """Creates a reference to a spe v3 file that does not (yet) have an
+        xml footer -- e.g. one LightField is still acquiring -- using the
+        data layout of another file or an explicitly given layout. The
+        number of frames is the number of complete readouts currently in the
+        file (see `refresh_frame_count`).
+
+        ----------------------------------------------------------------------
+        Inputs:
+        ----------------------------------------------------------------------
+        - `filepath`: path of the spe file to reference.
+        - `template`: Optional `SpeReference` of a file with the same layout
+        (e.g. a previous file of the same experiment). ROIs, strides, pixel
+        format, metadata layout and wavelength calibration are copied.
+        - `roi_shapes`: Optional named argument, used when there is no
+        template: sequence of (width, height) of each ROI.
+        - `pixel_format`: Optional named argument, used with `roi_shapes`:
+        key of `dataTypes` (defaults to `MonochromeUnsigned16`).
+        - `readout_stride`: Optional named argument, used with `roi_shapes`:
+        bytes per readout, if readouts contain more than the ROI data (e.g.
+        metadata). Defaults to the size of the ROI data.
+        ----------------------------------------------------------------------
+        Exceptions:
+        ----------------------------------------------------------------------
+        - `ValueError` raised if neither (or both of) `template` and
+        `roi_shapes` are given, if the template is not spe v3, or if
+        `readout_stride` is smaller than the ROI data.
+        """
+        if (template is None) == (roi_shapes is None):
+            raise ValueError('Either a template or roi_shapes is needed.')
+        reference = cls.__new__(cls)
+        reference._filepath = filepath
+        (reference._file_directory, reference._file_name,
+            reference._file_extension) = cls._split_file_path(filepath)
+        reference.xml_loc = np.uint64(0)
+        reference._spe_version = np.float32(3)
+        reference._memmap = None
+        reference._file = None
+        reference._file_lock = threading.Lock()
+        reference._frame_cache = None
+        reference._init_prefetch(0)
+        reference._xml_footer = ''
+        reference._footer_parsed = True
+        reference._layout_parsed = True
+        reference._frame_metadata_values = None
+        reference._experiment_settings = None
+        reference._settings_index = None
+        reference._cache_path = None
+        reference._roi_wavelengths = None
+        reference._old_spe_header = None
+        reference._roi_list = []
+        if template is not None:
+            if template.spe_version < 3:
+                raise ValueError('Template must be a spe v3 file.')
+            for roi in template.roi_list:
+                roi_copy = _ROI(roi.width, roi.height, roi.stride)
+                roi_copy.x, roi_copy.y = roi.x, roi.y
+                roi_copy.xbin, roi_copy.ybin = roi.xbin, roi.ybin
+                reference._roi_list.append(roi_copy)
+            reference._readout_stride = template.readout_stride
+            reference._frame_stride = template.frame_stride
+            reference._pixel_format_key = template.pixel_format_key
+            reference._meta_list = list(template.meta_list)
+            reference._full_wavelength_coverage =\
+                template._full_wavelength_coverage
+            if hasattr(template, '_sensor_dims'):
+                reference._sensor_dims = template.sensor_dims
+        else:
+            bpp = np.dtype(cls.dataTypes[pixel_format]).itemsize
+            for width, height in roi_shapes:# type: ignore
+                reference._roi_list.append(_ROI(np.int64(width),
+                    np.int64(height), np.int64(width*height*bpp)))
+            frame_stride = sum(int(roi.stride) for roi in reference._roi_list)
+            if readout_stride is None:
+                readout_stride = frame_stride
+            if readout_stride < frame_stride:
+                raise ValueError('readout_stride is smaller than the ROI data'
+                    ' (%d bytes).'%(frame_stride))
+            reference._readout_stride = np.uint64(readout_stride)
+            reference._frame_stride = np.uint64(frame_stride)
+            reference._pixel_format_key = pixel_format
+            reference._meta_list = []
+            reference._full_wavelength_coverage = np.array([])
+        reference._num_frames = np.uint64(0)
+        reference.refresh_frame_count()
+        return reference
+
+    def _init_prefetch(self, prefetch_frames: int):
+        """Sets up the (idle) state of the sequential read-ahead."""
+        self._prefetch_frames = max(0, prefetch_frames)
+        self._prefetch_executor = None
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_generation = 0
+        self._last_access = None
 
-    def _initialize_spe(self):
+    def refresh_frame_count(self) -> NumpyInteger:
+        """For references created with `from_template`: updates `num_frames`
+        to the number of complete readouts currently in the (growing) file
+        and returns it. Has no effect on files with an xml footer.
+        """
+        if self.xml_loc == 0:
+            data_bytes = max(0, os.stat(self._filepath).st_size - 4100)
+            num_frames = np.uint64(data_bytes // int(self._readout_stride))
+            if num_frames != self._num_frames:
+                self._num_frames = num_frames
+                self._memmap = None
+                self._frame_metadata_values = None
+        return self._num_frames
+
+    def _sidecar_path(self, cache_dir: Optional[str]) -> Path:
+        """Location of the index cache for this file: `<file>.spe.idx` next
+        to the spe file, or a name unique to the file's absolute path inside
+        `cache_dir`.
+        """
+        if cache_dir is None:
+            return Path('%s.idx'%(self._filepath))
+        abs_path = str(Path(self._filepath).resolve())
+        return Path(cache_dir) / ('%s-%s.idx'%(self._file_name,
+            hashlib.sha1(abs_path.encode('utf8')).hexdigest()[:16]))
+
+    def _cache_signature(self) -> dict:
+        """File size, modification time and footer offset used to validate
+        an index cache against the spe file it was built from.
+        """
+        stat = os.stat(self._filepath)
+        with open(self._filepath, 'rb') as f:
+            f.seek(678)
+            xml_loc = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        return {'version': _CACHE_VERSION, 'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns, 'xml_loc': xml_loc}
+
+    def _save_cache(self):
+        """Writes the parsed footer (ROIs, strides, calibration, metadata
+        layout and values, settings) to the index cache. Only spe v3 files
+        are cached. Failure to write is not fatal.
+        """
+        if self._spe_version < 3 or self._cache_path is None:
+            return
+        self._build_settings()
+        setting_types = {np.float64: 'float64', np.int64: 'int64', str: 'str'}
+        meta_datatypes = {value: key for key, value in meta_type_dict.items()}
+        meta_descriptions = []
+        for meta in self._meta_list:
+            description = {'type': type(meta).__name__,
+                'event': meta.meta_event,
+                'datatype': meta_datatypes[meta.datatype],
+                'bit_depth': int(meta.bit_depth)}
+            if isinstance(meta, TimeStamp):
+                description['resolution'] = int(meta.resolution)
+                description['absolute_time'] = meta.absolute_time
+            if isinstance(meta, GateTracking):
+                description['monotonic'] = meta.monotonic
+            meta_descriptions.append(description)
+        sensor_dims = None
+        if hasattr(self, '_sensor_dims'):
+            sensor_dims = [int(self._sensor_dims.width),
+                           int(self._sensor_dims.height)]
+        header = {'signature': self._cache_signature(),
+            'spe_version': float(self._spe_version),
+            'readout_stride': int(self._readout_stride),
+            'frame_stride': int(self._frame_stride),
+            'num_frames': int(self._num_frames),
+            'pixel_format_key': self._pixel_format_key,
+            'rois': [[int(roi.width), int(roi.height), int(roi.stride),
+                int(roi.x), int(roi.y), int(roi.xbin), int(roi.ybin)]
+                for roi in self._roi_list],
+            'sensor_dims': sensor_dims,
+            'meta_list': meta_descriptions,
+            'settings': [[setting.setting_name,
+                setting.setting_value.item() if isinstance(
+                    setting.setting_value, np.generic)
+                    else setting.setting_value,
+                setting_types[setting.setting_type],
+                setting.setting_unit.name, setting.setting_text]
+                for setting in self._experiment_settings], # type: ignore
+            'settings_index': self._settings_index}
+        try:
+            with open(self._cache_path, 'wb') as f:
+                np.savez(f, header=np.array(json.dumps(header)),
+                    wavelengths=self._full_wavelength_coverage,
+                    frame_metadata=self.frame_metadata_values)
+        except OSError as exc:
+            warnings.warn('Could not write spe index cache %s: %s'%(
+                self._cache_path, exc))
+
+    def _load_cache(self) -> bool:
+        """Fills in members from a valid index cache. Returns False (and
+        leaves the object untouched) if there is no cache, or if it is stale
+        or unreadable.
+        """
+        if self._cache_path is None or not self._cache_path.exists():
+            return False
+        try:
+            with np.load(self._cache_path, allow_pickle=False) as cached:
+                header = json.loads(str(cached['header']))
+                if header['signature'] != self._cache_signature():
+                    return False
+                wavelengths = cached['wavelengths']
+                frame_metadata = cached['frame_metadata']
+        except (OSError, ValueError, KeyError, EOFError,
+                zipfile.BadZipFile):
+            return False
+        setting_types = {'float64': np.float64, 'int64': np.int64, 'str': str}
+        self.xml_loc = np.uint64(header['signature']['xml_loc'])
+        self._spe_version = np.float32(header['spe_version'])
+        self._readout_stride = np.uint64(header['readout_stride'])
+        self._frame_stride = np.uint64(header['frame_stride'])
+        self._num_frames = np.uint64(header['num_frames'])
+        self._pixel_format_key = header['pixel_format_key']
+        for width, height, stride, x, y, xbin, ybin in header['rois']:
+            roi = _ROI(np.int64(width), np.int64(height), np.int64(stride))
+            roi.x, roi.y = np.uint64(x), np.uint64(y)
+            roi.xbin, roi.ybin = np.uint64(xbin), np.uint64(ybin)
+            self._roi_list.append(roi)
+        if header['sensor_dims'] is not None:
+            self._sensor_dims = _ROI(np.int32(header['sensor_dims'][0]),
+                np.uint32(header['sensor_dims'][1]), 0)
+        for description in header['meta_list']:
+            match description['type']:
+                case 'TimeStamp':
+                    self._meta_list.append(TimeStamp(description['event'],
+                        description['datatype'],
+                        np.uint64(description['bit_depth']),
+                        np.uint64(description['resolution']),
+                        description['absolute_time']))
+                case 'FrameTrackingNumber':
+                    self._meta_list.append(FrameTrackingNumber(
+                        description['datatype'],
+                        np.uint64(description['bit_depth'])))
+                case 'GateTracking':
+                    self._meta_list.append(GateTracking(description['event'],
+                        description['datatype'],
+                        np.uint64(description['bit_depth']),
+                        description['monotonic']))
+        self._full_wavelength_coverage = wavelengths
+        self._frame_metadata_values = frame_metadata
+        self._frame_metadata_values.flags.writeable = False
+        self._footer_parsed = True
+        self._layout_parsed = True
+        self._experiment_settings = tuple(ExperimentSetting(name,
+            setting_types[type_name](value), setting_types[type_name],
+            _Unit[unit_name], text)
+            for name, value, type_name, unit_name, text
+            in header['settings'])
+        self._experiment_settings_lookup = {}
+        for exp_setting in self._experiment_settings:
+            self._experiment_settings_lookup.setdefault(
+                exp_setting.setting_name.casefold(), []).append(exp_setting)
+        self._settings_index = header['settings_index']
+        self._settings_lookup = _settings_lookup_table(
+            self._settings_index, self._experiment_settings) # type: ignore
+        return True
+
+    def _initialize_spe(self, lazy: bool = False):
         """Fills in members with info from spe file (if that info exists).
         Should always be called internally.
+
+        With `lazy`, only the binary header and the DataFormat block of the
+        xml footer are read here; the rest of the footer is parsed on first
+        access (see `_load_footer`).
         """
-        with open(self._filepath, encoding="utf8") as f:
-            f.seek(678)
-            self.xml_loc = np.fromfile(f,dtype=np.uint64,count=1)[0]
-            f.seek(1992)
-            self._spe_version = np.fromfile(f,dtype=np.float32,count=1)[0]
-
-            #get ROIs and shapes
-            #pylint: disable=line-too-long
-            if self._spe_version==3:
-                f.seek(self.xml_loc)
-                self._xml_footer = f.read()
-                xml_root = ET.fromstring(self._xml_footer)
-                for child in xml_root:
-                    if 'DataFormat'.casefold() in child.tag.casefold():
-                        for child1 in child:
-                            if 'DataBlock'.casefold() in child1.tag.casefold():
-                                self._readout_stride=np.uint64(child1.get('stride')) # type: ignore
-                                self._frame_stride = np.uint64(child1.get('size')) # type: ignore
-                                self._num_frames=np.uint64(child1.get('count')) # type: ignore
-                                self._pixel_format_key=child1.get('pixelFormat')# type: ignore
-                                for child2 in child1:
-                                    if 'DataBlock'.casefold() in child1.tag.casefold():
-                                        reg_stride=np.int64(child2.get('stride')) # type: ignore
-                                        reg_width=np.int64(child2.get('width')) # type: ignore
-                                        reg_height=np.int64(child2.get('height')) # type: ignore
-                                        self._roi_list.append(_ROI(reg_width,reg_height,reg_stride))
-                    if 'MetaFormat'.casefold() in child.tag.casefold():
-                        for child1 in child:
-                            if 'MetaBlock'.casefold() in child1.tag.casefold():
-                                for child2 in child1:
-                                    meta_type: str = child2.tag.rsplit('}',maxsplit=1)[1]
-                                    meta_event: str = child2.get('event') # type: ignore
-                                    meta_datatype:str  = child2.get('type') # type: ignore
-                                    meta_bitdepth = np.uint64(child2.get('bitDepth')) # type: ignore
-                                    match meta_type:
-                                        case 'TimeStamp':
-                                            meta_resolution = np.uint64(child2.get('resolution')) # type: ignore
-                                            meta_absolute_time:str = child2.get('absoluteTime') # type: ignore
-                                            self._meta_list.append(TimeStamp(meta_event, meta_datatype, meta_bitdepth, meta_resolution, meta_absolute_time))
-                                        case 'FrameTrackingNumber':
-                                            self._meta_list.append(FrameTrackingNumber(meta_datatype, meta_bitdepth))
-                                        case 'GateTracking':
-                                            meta_event: str = child2.get('component') # type: ignore
-                                            meta_monotonic = bool(child2.get('monotonic'))
-                                            self._meta_list.append(GateTracking(meta_event, meta_datatype, meta_bitdepth, meta_monotonic))
-                                        case _:
-                                            raise RuntimeError('Metadata block was not recognized.')
-
-                    if 'Calibrations'.casefold() in child.tag.casefold():
-                        counter = 0
-                        for child1 in child:
-                            if 'WavelengthMapping'.casefold() in child1.tag.casefold():
-                                for child2 in child1:
-                                    if 'WavelengthError'.casefold() in child2.tag.casefold():
-                                        wavelengths = np.array([])
-                                        assert child2.text
-                                        wl_text = child2.text.rsplit()
-                                        for elem in wl_text:
-                                            wavelengths = np.append(wavelengths,np.fromstring(elem,sep=',')[0])
-                                        self._full_wavelength_coverage = wavelengths
-                                    else:
-                                        self._full_wavelength_coverage = np.fromstring(child2.text,sep=',') # type: ignore
-                            if 'SensorInformation'.casefold() in child1.tag.casefold():
-                                width = np.int32(child1.get('width')) # type: ignore
-                                height = np.uint32(child1.get('height')) # type: ignore
-                                self._sensor_dims= _ROI(width, height, 0)
-                            if 'SensorMapping'.casefold() in child1.tag.casefold():
-                                if counter < len(self._roi_list):
-                                    self._roi_list[counter].x = np.uint64(child1.get('x')) # type: ignore
-                                    self._roi_list[counter].y = np.uint64(child1.get('y')) # type: ignore
-                                    og_width = np.uint64(child1.get('width')) # type: ignore
-                                    og_height = np.uint64(child1.get('height')) # type: ignore
-                                    self._roi_list[counter].xbin = np.uint64(child1.get('xBinning')) # type: ignore
-                                    self._roi_list[counter].ybin = np.uint64(child1.get('yBinning')) # type: ignore
-                                    self._roi_list[counter].width = np.uint64(og_width / self._roi_list[counter].xbin) # type: ignore
-                                    self._roi_list[counter].height = np.uint64(og_height / self._roi_list[counter].ybin) # type: ignore
-                                    counter += 1
-                                else:
-                                    break
+        with open(self._filepath, 'rb') as f:
+            header = f.read(4100)
+        if len(header) < 4100:
+            raise ValueError('Unrecognized spe file.')
+        self.xml_loc = np.frombuffer(header, dtype='<u8', count=1,
+                                     offset=678)[0]
+        self._spe_version = np.frombuffer(header, dtype='<f4', count=1,
+                                          offset=1992)[0]
+
+        #get ROIs and shapes
+        #pylint: disable=line-too-long
+        if self._spe_version==3:
+            if lazy:
+                #stream the footer only until DataFormat is complete
+                with open(self._filepath, 'rb') as fb:
+                    fb.seek(self.xml_loc)
+                    for _, element in ET.iterparse(fb, events=('end',)):
+                        if 'DataFormat'.casefold() in element.tag.casefold():
+                            self._parse_data_format(element)
+                            break
+                #positions and binning are parsed on first access
+                for roi in self._roi_list:
+                    roi._load_details = self._load_layout
+            else:
+                self._load_footer()
                 #now that xml parsing is done, extract all the metadata (if present)
-                if len(self._meta_list) > 0:
-                    self._frame_metadata_values = self.get_frame_metadata_value(
-                        frames=range(0, self._num_frames))
-
-            elif self._spe_version >=2 and self._spe_version <3:
-                self._xml_footer = ''
-                f.seek(108)
-                self._pixel_format_key=np.fromfile(f,dtype=np.int16,count=1)[0]
-                f.seek(42)
-                frame_width=np.int32(np.fromfile(f,dtype=np.uint16,count=1)[0])
-                f.seek(656)
-                frame_height=np.int32(np.fromfile(f,dtype=np.uint16,count=1)[0])
-                f.seek(1446)
-                self._num_frames=np.fromfile(f,dtype=np.int32,count=1)[0]
-                stride = np.int32(frame_height*frame_width*np.dtype(self.dataTypes_old_spe[self._pixel_format_key]).itemsize)
-                self._roi_list.append(_ROI(frame_width,frame_height,stride))
+                _ = self.frame_metadata_values
+
+        elif self._spe_version >=2 and self._spe_version <3:
+            self._parse_old_spe_header(
+                np.frombuffer(header, dtype=old_spe_header_dtype)[0])
+        else:
+            raise ValueError('Unrecognized spe file.')
+
+    def _parse_old_spe_header(self, header: np.void):
+        """Fills in members from the binary header of a spe 2.x file: pixel
+        format, frame count, ROIs (from the ROI blocks, if they add up to
+        the frame size), sensor size and the wavelength calibration (x
+        calibration polynomial over 1-based sensor pixels).
+        """
+        self._old_spe_header = header
+        self._xml_footer = ''
+        self._footer_parsed = True
+        self._layout_parsed = True
+        self._pixel_format_key = int(header['datatype'])
+        if self._pixel_format_key not in self.dataTypes_old_spe:
+            raise ValueError('Unrecognized spe 2.x data type %d.'
+                             %(self._pixel_format_key))
+        bpp = np.dtype(self.dataTypes_old_spe[self._pixel_format_key]).itemsize
+        self._num_frames = np.uint64(max(0, int(header['NumFrames'])))
+        frame_width, frame_height = int(header['xdim']), int(header['ydim'])
+        roi_blocks = header['ROIinfblk'][:max(1, int(header['NumROI']))]
+        shapes = [((int(block['endx']) - int(block['startx']) + 1) //
+                   max(1, int(block['groupx'])),
+                   (int(block['endy']) - int(block['starty']) + 1) //
+                   max(1, int(block['groupy']))) for block in roi_blocks]
+        if len(shapes) == 1 or sum(width * height for width, height in
+                                   shapes) != frame_width * frame_height:
+            #single ROI (or ROI blocks that do not describe the data)
+            if shapes[0] != (frame_width, frame_height):
+                roi_blocks = np.zeros(1, dtype=_old_spe_roi_dtype)
+            roi_blocks, shapes = roi_blocks[:1], [(frame_width, frame_height)]
+        for block, (width, height) in zip(roi_blocks, shapes):
+            roi = _ROI(np.int32(width), np.int32(height),
+                       np.int32(width*height*bpp))
+            roi.x = np.uint64(max(0, int(block['startx']) - 1))
+            roi.y = np.uint64(max(0, int(block['starty']) - 1))
+            roi.xbin = np.uint64(max(1, int(block['groupx'])))
+            roi.ybin = np.uint64(max(1, int(block['groupy'])))
+            self._roi_list.append(roi)
+        self._frame_stride = np.uint64(sum(int(roi.stride)
+                                           for roi in self._roi_list))
+        self._readout_stride = self._frame_stride
+        sensor_width = int(header['xDimDet']) or max(int(roi.x) +
+            int(roi.width)*int(roi.xbin) for roi in self._roi_list)
+        self._sensor_dims = _ROI(np.int32(sensor_width),
+            np.uint32(int(header['yDimDet']) or frame_height), 0)
+        calibration = header['xcalibration']
+        order = int(calibration['polynom_order'])
+        coefficients = calibration['polynom_coeff'][:min(order, 5)+1]
+        if calibration['calib_valid'] and order >= 1 and\
+            np.any(coefficients[1:]):
+            self._full_wavelength_coverage = np.polynomial.polynomial.polyval(
+                np.arange(1, sensor_width+1, dtype=np.float64), coefficients)
+
+    def _read_footer_text(self) -> str:
+        """Reads the xml footer text from the file."""
+        with open(self._filepath, encoding="utf8") as f:
+            f.seek(self.xml_loc)
+            return f.read()
+
+    def _load_footer(self):
+        """Reads and parses the whole xml footer (see `xml_footer`), and
+        its layout (see `_load_layout`) if that has not been parsed yet.
+        Only does work the first time it is called.
+        """
+        if self._footer_parsed:
+            return
+        if self._xml_footer is None:
+            self._xml_footer = self._read_footer_text()
+        xml_root = ET.fromstring(self._xml_footer)
+        if not self._layout_parsed:
+            self._begin_layout()
+            for child in xml_root:
+                self._parse_layout_element(child)
+            self._layout_parsed = True
+        self._footer_parsed = True
+
+    def _load_layout(self):
+        """Parses the layout blocks of the xml footer (DataFormat if it has
+        not been parsed yet, MetaFormat and Calibrations), streaming the
+        footer only until Calibrations is complete (or the next block
+        starts), so the (large) DataHistories block is not parsed. Only does
+        work the first time it is called.
+        """
+        if self._layout_parsed:
+            return
+        if self._xml_footer is not None:
+            self._load_footer()
+            return
+        self._begin_layout()
+        depth, after_meta = 0, False
+        with open(self._filepath, 'rb') as fb:
+            fb.seek(self.xml_loc)
+            for event, element in ET.iterparse(fb, events=('start', 'end')):
+                tag = element.tag.rsplit('}', maxsplit=1)[-1]
+                if event == 'start':
+                    depth += 1
+                    #stop as soon as a block after the layout starts (e.g.
+                    #DataHistories in a footer without Calibrations)
+                    if depth == 2 and (tag == 'DataHistories' or
+                                       after_meta and tag != 'Calibrations'):
+                        break
+                    continue
+                depth -= 1
+                if depth != 1:
+                    continue
+                #only the blocks directly below the root are dispatched
+                match self._parse_layout_element(element):
+                    case 'MetaFormat':
+                        after_meta = True
+                    case 'Calibrations':
+                        break
+        self._layout_parsed = True
+
+    def _begin_layout(self):
+        """Detaches the lazy loaders of the ROIs before the layout is
+        parsed (parsing sets their positions and binning).
+        """
+        for roi in self._roi_list:
+            roi._load_details = None
+
+    def _parse_layout_element(self, element: ET.Element) -> str:
+        """Parses a DataFormat (if not parsed yet), MetaFormat or
+        Calibrations element of the xml footer, ignoring any other element.
+        Returns the element's tag without namespace.
+        """
+        tag = element.tag.rsplit('}', maxsplit=1)[-1]
+        match tag:
+            case 'DataFormat':
+                if len(self._roi_list) == 0:
+                    self._parse_data_format(element)
+            case 'MetaFormat':
+                self._parse_meta_format(element)
+            case 'Calibrations':
+                self._parse_calibrations(element)
+        return tag
+
+    def _parse_data_format(self, element: ET.Element):
+        """Fills in strides, frame count, pixel format and ROI shapes from the
+        DataFormat element of the xml footer.
+        """
+        #pylint: disable=line-too-long
+        for child1 in element:
+            if 'DataBlock'.casefold() in child1.tag.casefold():
+                self._readout_stride=np.uint64(child1.get('stride')) # type: ignore
+                self._frame_stride = np.uint64(child1.get('size')) # type: ignore
+                self._num_frames=np.uint64(child1.get('count')) # type: ignore
+                self._pixel_format_key=child1.get('pixelFormat')# type: ignore
+                for child2 in child1:
+                    if 'DataBlock'.casefold() in child1.tag.casefold():
+                        reg_stride=np.int64(child2.get('stride')) # type: ignore
+                        reg_width=np.int64(child2.get('width')) # type: ignore
+                        reg_height=np.int64(child2.get('height')) # type: ignore
+                        self._roi_list.append(_ROI(reg_width,reg_height,reg_stride))
+
+    def _parse_meta_format(self, element: ET.Element):
+        """Fills in `meta_list` from the MetaFormat element of the xml
+        footer.
+        """
+        #pylint: disable=line-too-long
+        for child1 in element:
+            if 'MetaBlock'.casefold() in child1.tag.casefold():
+                for child2 in child1:
+                    meta_type: str = child2.tag.rsplit('}',maxsplit=1)[1]
+                    meta_event: str = child2.get('event') # type: ignore
+                    meta_datatype:str  = child2.get('type') # type: ignore
+                    meta_bitdepth = np.uint64(child2.get('bitDepth')) # type: ignore
+                    match meta_type:
+                        case 'TimeStamp':
+                            meta_resolution = np.uint64(child2.get('resolution')) # type: ignore
+                            meta_absolute_time:str = child2.get('absoluteTime') # type: ignore
+                            self._meta_list.append(TimeStamp(meta_event, meta_datatype, meta_bitdepth, meta_resolution, meta_absolute_time))
+                        case 'FrameTrackingNumber':
+                            self._meta_list.append(FrameTrackingNumber(meta_datatype, meta_bitdepth))
+                        case 'GateTracking':
+                            meta_event: str = child2.get('component') # type: ignore
+                            meta_monotonic = (child2.get('monotonic') or '').casefold() == 'true'
+                            self._meta_list.append(GateTracking(meta_event, meta_datatype, meta_bitdepth, meta_monotonic))
+                        case _:
+                            raise RuntimeError('Metadata block was not recognized.')
+
+    def _parse_calibrations(self, element: ET.Element):
+        """Fills in wavelength calibration, sensor dimensions and ROI
+        positions / binning from the Calibrations element of the xml footer.
+        """
+        #pylint: disable=line-too-long
+        counter = 0
+        for child1 in element:
+            if 'WavelengthMapping'.casefold() in child1.tag.casefold():
+                for child2 in child1:
+                    if 'WavelengthError'.casefold() in child2.tag.casefold():
+                        #whitespace separated 'wavelength,error' pairs
+                        assert child2.text
+                        self._full_wavelength_coverage = np.array([elem.split(',', 1)[0] for elem in child2.text.split()], dtype=np.float64)
+                    else:
+                        self._full_wavelength_coverage = np.fromstring(child2.text,sep=',') # type: ignore
+            if 'SensorInformation'.casefold() in child1.tag.casefold():
+                width = np.int32(child1.get('width')) # type: ignore
+                height = np.uint32(child1.get('height')) # type: ignore
+                self._sensor_dims= _ROI(width, height, 0)
+            if 'SensorMapping'.casefold() in child1.tag.casefold():
+                if counter < len(self._roi_list):
+                    self._roi_list[counter].x = np.uint64(child1.get('x')) # type: ignore
+                    self._roi_list[counter].y = np.uint64(child1.get('y')) # type: ignore
+                    og_width = np.uint64(child1.get('width')) # type: ignore
+                    og_height = np.uint64(child1.get('height')) # type: ignore
+                    self._roi_list[counter].xbin = np.uint64(child1.get('xBinning')) # type: ignore
+                    self._roi_list[counter].ybin = np.uint64(child1.get('yBinning')) # type: ignore
+                    self._roi_list[counter].width = np.uint64(og_width / self._roi_list[counter].xbin) # type: ignore
+                    self._roi_list[counter].height = np.uint64(og_height / self._roi_list[counter].ybin) # type: ignore
+                    counter += 1
+                else:
+                    break
+
+    def _check_rois(self, rois: Optional[Sequence[int]]) -> Sequence[int]:
+        """Helper that defaults `rois` to all regions and validates range."""
+        return _check_rois(rois, len(self._roi_list))
+
+    def _check_frames(self, frames: Optional[Sequence[int]]) ->\
+        Sequence[int]:
+        """Helper that defaults `frames` to all frames and validates range."""
+        return _check_frames(frames, int(self._num_frames))
+        if isinstance(frames, range):
+            low, high = min(frames), max(frames)
+        else:
+            frame_array = np.asarray(frames)
+            if frame_array.ndim != 1 or\
+                not np.issubdtype(frame_array.dtype, np.integer):
+                raise TypeError('Frame input needs to be a sequence of ints')
+            low, high = frame_array.min(), frame_array.max()
+        if low < 0 or high >= self._num_frames:
+            raise ValueError(
+            'Frame value outside of allowed ranged (%d through %d)'
+            %(0, self._num_frames-1))
+        return frames
+
+    def _pixel_dtype(self) -> np.dtype:
+        """numpy dtype of the pixel data in the file."""
+        if self._spe_version >= 3:
+            return np.dtype(self.dataTypes[str(self._pixel_format_key)])
+        return np.dtype(self.dataTypes_old_spe[
+            self._pixel_format_key])# type: ignore
+
+    def _region_offsets(self) -> list[int]:
+        """Byte offset of each ROI from the start of a readout."""
+        offsets = []
+        region_offset = 0
+        for roi in self._roi_list:
+            offsets.append(region_offset)
+            region_offset += int(roi.stride)
+        return offsets
+
+    def _data_memmap(self) -> np.memmap:
+        """Maps the data block (everything between the 4100 byte header and
+        the xml footer) once per `SpeReference` and returns the cached map.
+        """
+        if self._memmap is None:
+            self._memmap = np.memmap(self._filepath, dtype=np.uint8,
+                mode='r', offset=4100,
+                shape=(int(self._num_frames)*int(self._readout_stride),))
+        return self._memmap
+
+    def _read_into(self, buffer: np.ndarray, offset: int) -> None:
+        """Fills `buffer` (a contiguous array) with the bytes of the file
+        starting at `offset`. Uses positioned reads on a persistent binary
+        handle, so concurrent calls from several threads do not share a
+        file position; falls back to seek + read under a lock where
+        `os.pread` is not available.
+        """
+        with self._file_lock:
+            if self._file is None:
+                self._file = open(self._filepath, 'rb', buffering=0)#pylint: disable=consider-using-with
+            handle = self._file
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(view):
+            if hasattr(os, 'preadv'):
+                count = os.preadv(handle.fileno(), [view[filled:]],
+                                  offset + filled)
+            elif hasattr(os, 'pread'):
+                chunk = os.pread(handle.fileno(), len(view) - filled,
+                                 offset + filled)
+                count = len(chunk)
+                view[filled:filled+count] = chunk
             else:
-                raise ValueError('Unrecognized spe file.')
+                with self._file_lock:
+                    handle.seek(offset + filled)
+                    count = handle.readinto(view[filled:])# type: ignore
+            if not count:
+                raise ValueError('Spe file ended before %d bytes could be'
+                    ' read at offset %d.'%(len(view), offset))
+            filled += count
+
+    def close(self) -> None:
+        """Closes the file handle and drops the memory map of the data block
+        (arrays returned by `as_memmap` stay valid). The file is reopened if
+        the `SpeReference` is used again. A running prefetch is cancelled.
+        """
+        with self._prefetch_lock:
+            self._prefetch_generation += 1
+            executor, self._prefetch_executor = self._prefetch_executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        self._last_access = None
+        with self._file_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._memmap = None
+
+    def __enter__(self) -> 'SpeReference':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def as_memmap(self,*,rois:Optional[Sequence[int]] = None) ->\
+        Sequence[SpeNdArray]:
+        """Maps the data block of the spe file into memory and returns
+        per-ROI views of shape `[Frames, Rows, Cols]`. No data is copied or
+        read up front -- pages are pulled in by the OS as the views are
+        accessed, so this is an O(1) operation regardless of file size.
+
+        The views are read-only and stay valid for as long as they are
+        referenced (even after the `SpeReference` goes out of scope).
+
+        ----------------------------------------------------------------------
+        Input:
+        ----------------------------------------------------------------------
+        - `rois`: Optional named argument for a sequence of desired ROIs. If
+        None, then views for all ROIs in the spe file are returned.
+        ----------------------------------------------------------------------
+        Output:
+        ----------------------------------------------------------------------
+        - `Sequence[SpeNdArray]`: a list of strided numpy NDArray views.
+        List elements (outer) correspond to ROIs.
+        ----------------------------------------------------------------------
+        Exceptions:
+        ----------------------------------------------------------------------
+        - `ValueError` raised if desired ROI(s) fall outside of the range
+        contained in the spe file.
+        - `TypeError` raised if input is not iterable.
+        """
+        rois = self._check_rois(rois)
+        dtype = self._pixel_dtype()
+        offsets = self._region_offsets()
+        view_list = list()
+        if self._num_frames == 0:
+            for roi in rois:
+                view_list.append(np.zeros([0, int(self._roi_list[roi].height),
+                    int(self._roi_list[roi].width)], dtype=dtype))
+            return view_list
+        buffer = self._data_memmap()
+        for roi in rois:
+            width = int(self._roi_list[roi].width)
+            height = int(self._roi_list[roi].height)
+            view_list.append(np.ndarray(
+                shape=(int(self._num_frames), height, width), dtype=dtype,
+                buffer=buffer, offset=offsets[roi],
+                strides=(int(self._readout_stride), width*dtype.itemsize,
+                         dtype.itemsize)))
+        return view_list
+
+    def _hyperslab(self, rois: Sequence[int], rows: HyperslabType,
+                   cols: HyperslabType) -> Optional[list[tuple[slice, slice]]]:
+        """Resolves the `rows` / `cols` inputs of `get_data` into one
+        `(row_slice, col_slice)` pair per requested ROI. Returns None if
+        neither is given (whole frames).
+        """
+        if rows is None and cols is None:
+            return None
+        def per_roi(selection: HyperslabType, name: str) -> list[slice]:
+            if selection is None or isinstance(selection, slice):
+                return [selection or slice(None)] * len(rois)
+            selection = list(selection)
+            if len(selection) != len(rois):
+                raise ValueError('%s must be a slice or one slice per'
+                    ' requested ROI (%d expected)'%(name, len(rois)))
+            for item in selection:
+                if item is not None and not isinstance(item, slice):
+                    raise TypeError('%s must contain slices'%(name))
+            return [item or slice(None) for item in selection]
+        hyperslab = list(zip(per_roi(rows, 'rows'), per_roi(cols, 'cols')))
+        for roi, (row_slice, col_slice) in zip(rois, hyperslab):
+            #raises ValueError for a zero step
+            row_slice.indices(int(self._roi_list[roi].height))
+            col_slice.indices(int(self._roi_list[roi].width))
+        return hyperslab
+
+    def _output_shapes(self, rois: Sequence[int],
+                       hyperslab: Optional[list[tuple[slice, slice]]]) ->\
+                       list[tuple[int, int]]:
+        """(Rows, Cols) of each requested ROI after applying the
+        hyperslab.
+        """
+        shapes = []
+        for idx_roi, roi in enumerate(rois):
+            height = int(self._roi_list[roi].height)
+            width = int(self._roi_list[roi].width)
+            if hyperslab is not None:
+                row_slice, col_slice = hyperslab[idx_roi]
+                height = len(range(*row_slice.indices(height)))
+                width = len(range(*col_slice.indices(width)))
+            shapes.append((height, width))
+        return shapes
 
     def get_data(self,*,rois:Optional[Sequence[int]] = None,
-                frames:Optional[Sequence[int]] = None) ->\
-                Sequence[SpeNdArray]:
+                frames:Optional[Sequence[int]] = None,
+                rows: HyperslabType = None, cols: HyperslabType = None,
+                wavelength_range: Optional[tuple[float, float]] = None,
+                wavelengths: Optional[Sequence[float]] = None,
+                xbin: int = 1, ybin: int = 1, full_vertical: bool = False,
+                bin_mode: str = 'sum',
+                mmap: bool = False, read_gap: Optional[int] = None,
+                dtype: Optional[npt.DTypeLike] = None,
+                out: Optional[Sequence[np.ndarray]] = None,
+                workers: int = 1) -> Sequence[SpeNdArray]:
         """Extracts requested data from the referenced spe file. Only grabs
         the frame(s) and ROI(s) requested in the input parameters.
 
@@ -432,6 +1612,50 @@ class SpeReference():
         None, then all ROIs in the spe file are parsed.
         - `frames`: Optional named argument for a sequence of desired frames.
         If None, then all frames in the spe file are parsed.
+        - `rows`, `cols`: Optional named arguments selecting a hyperslab of
+        each frame: a `slice` (steps allowed) applied to every requested
+        ROI, or a sequence with one slice (or None) per requested ROI. Only
+        the selected rows and columns are read, from a memory map of the
+        file, so e.g. a 10-row band of a 2048-row frame costs a fraction of
+        the I/O of the full frame. If None, whole frames are returned.
+        - `wavelength_range`: Optional named argument `(low, high)` in the
+        calibration's units. Only the columns whose wavelength (see
+        `get_wavelengths`) falls in the range are read; replaces `cols`.
+        - `wavelengths`: Optional named argument for a sequence of
+        wavelengths. For each, only the nearest column is returned (e.g.
+        kinetic traces at a few emission lines); replaces `cols` and cannot
+        be combined with `xbin` or `mmap`.
+        - `xbin`, `ybin`: Optional named arguments for software binning of
+        columns / rows, applied batch by batch as the data is read (after
+        `rows` / `cols`). Trailing rows or columns that do not fill a whole
+        bin are dropped.
+        - `full_vertical`: Optional named argument. If True, all rows of each
+        frame are binned into one (e.g. to turn full frames into spectra),
+        and `ybin` is ignored.
+        - `bin_mode`: Optional named argument, `'sum'` or `'mean'`. Sums are
+        accumulated as int64 (integer pixel formats) or float64, so they
+        cannot overflow the pixel format; means are float64. Unless `dtype`
+        is given, binned data is returned in these dtypes.
+        - `mmap`: Optional named argument. If True, the data is served from a
+        memory map of the file (see `as_memmap`) instead of being read. When
+        `frames` is None or a `range`, the returned arrays are zero-copy
+        views into the file; any other frame sequence is gathered into a new
+        array.
+        - `read_gap`: Optional named argument, in bytes. Requested frames
+        that are separated by at most this many bytes of unrequested data are
+        merged into a single read (the gap is read and discarded). If None,
+        `read_gap_bytes` is used. Pass 0 to only merge adjacent frames.
+        - `dtype`: Optional named argument for the dtype of the returned
+        arrays. If None, the pixel format of the spe file is kept (e.g.
+        `uint16`); otherwise the data is converted as it is read.
+        - `out`: Optional named argument for preallocated arrays to read
+        into, one per requested ROI, each of shape [Frames, Rows, Cols]
+        (after applying `rows` / `cols` and binning). The data is converted
+        to the dtype of each array and the same arrays are returned, so
+        buffers can be reused across calls.
+        - `workers`: Optional named argument for the number of threads. The
+        requested frames are split into chunks that are read concurrently
+        with positioned reads (e.g. to saturate NVMe or network storage).
         ----------------------------------------------------------------------
         Output:
         ----------------------------------------------------------------------
@@ -442,85 +1666,392 @@ class SpeReference():
         Exceptions:
         ----------------------------------------------------------------------
         - `ValueError` raised if desired ROI(s) and / or frame(s) fall outside
-        of the range contained in the spe file.
+        of the range contained in the spe file, if `out` does not match the
+        requested ROIs and frames, if `dtype` / `out` / binning are combined
+        with `mmap`, if the binning parameters are invalid, or if a
+        wavelength selection is requested without a wavelength calibration.
         - `TypeError` raised if inputs are not iterable.
         """
-        data_list = list()
         #if no inputs, or empty list, set to all
-        if not rois:
-            rois = range(0,len(self._roi_list))
-        if not frames:
-            frames = range(0,self._num_frames)
         #check for improper values, raise exception if necessary
-        try:
-            for item in rois:
-                if item < 0 or item >= len(self._roi_list):
-                    raise ValueError(
-                    'ROI value outside of allowed ranged (%d through %d)'
-                    %(0, len(self._roi_list)-1))
-        except TypeError as exc:
-            raise TypeError('ROI input needs to be iterable') from exc
-        try:
-            for item in frames:
-                if item < 0 or item >= self._num_frames:
-                    raise ValueError(
-                    'Frame value outside of allowed ranged (%d through %d)'
-                    %(0, self._num_frames-1))
-        except TypeError as exc:
-            raise TypeError('Frame input needs to be iterable') from exc
-        if self._spe_version >= 3:
-            region_offset=0
-            with open(self._filepath, encoding="utf8") as f:
-                bpp = np.dtype(self.dataTypes[
-                    str(self._pixel_format_key)]).itemsize
-                for _, roi in enumerate(rois):
-                    region_data = np.zeros([len(frames),
-                        self._roi_list[roi].height,
-                        self._roi_list[roi].width])
-                    region_offset = 0
-                    if roi>0:
-                        for ii in range(0,roi):
-                            region_offset += np.uint64(
-                                self._roi_list[ii].stride/bpp)
-                    for idx_frame, frame in enumerate(frames):
-                        f.seek(0)
-                        frame_offset = np.uint64(
-                            frame*self._readout_stride/bpp)
-                        read_count =  np.uint64(
-                            self._roi_list[roi].stride/bpp)
-                        tmp = np.fromfile(f,dtype=self.dataTypes[str(
-                            self._pixel_format_key)],count=read_count,
-                            offset=np.uint64(
-                            4100+(region_offset*bpp)+(frame_offset*bpp)))
-                        region_data[idx_frame,:] = np.reshape(tmp,[
-                            self._roi_list[roi].height,
-                            self._roi_list[roi].width])
-                    data_list.append(region_data)
-        elif self._spe_version >=2 and self._spe_version <3:
-            if len(rois) != 1 and rois[0] !=0:
-                raise ValueError('Only one ROI allowed for spe v2 parsing.')
-            with open(self._filepath, encoding="utf8") as f:
-                bpp = np.dtype(self.dataTypes_old_spe[
-                    self._pixel_format_key]).itemsize# type: ignore
-                region_data = np.zeros(
-                    [len(frames), self._roi_list[0].height,
-                     self._roi_list[0].width], dtype=self.dataTypes_old_spe[
-                        self._pixel_format_key])# type: ignore
-                for idx_frame, frame in enumerate(frames):
-                    f.seek(0)
-                    frame_offset = (self._roi_list[0].stride) * frame
-                    tmp = np.fromfile(f,dtype=self.dataTypes_old_spe[
-                        self._pixel_format_key],count=np.uint64(
-                        self._roi_list[0].stride / bpp),
-                        offset=np.uint64(4100+frame_offset))# type: ignore
-                    region_data[idx_frame] = np.reshape(tmp,
-                        [len(frames), self._roi_list[0].height,
-                         self._roi_list[0].width])
-                data_list.append(region_data)
+        rois = self._check_rois(rois)
+        frames = self._check_frames(frames)
+        if wavelength_range is not None or wavelengths is not None:
+            if cols is not None:
+                raise ValueError('cols cannot be combined with a wavelength'
+                    ' selection.')
+            cols, picks = self._wavelength_columns(rois, wavelength_range,
+                                                   wavelengths)
+            if picks is not None:
+                if mmap or xbin != 1:
+                    raise ValueError('wavelengths cannot be combined with'
+                        ' mmap or xbin.')
+                covering_data = self.get_data(rois=rois, frames=frames,
+                    rows=rows, cols=cols, ybin=ybin,
+                    full_vertical=full_vertical, bin_mode=bin_mode,
+                    read_gap=read_gap, dtype=dtype, workers=workers)
+                data_list = [region_data[:, :, pick] for region_data, pick
+                             in zip(covering_data, picks)]
+                if out is None:
+                    return data_list
+                out_list = self._allocate_output(rois, len(frames), dtype,
+                    out, shapes=[region_data.shape[1:]
+                                 for region_data in data_list])
+                for buffer, region_data in zip(out_list, data_list):
+                    buffer[:] = region_data
+                return out_list
+        hyperslab = self._hyperslab(rois, rows, cols)
+        binned = xbin != 1 or ybin != 1 or full_vertical
+        if mmap:
+            if dtype is not None or out is not None or binned:
+                raise ValueError('dtype, out and binning cannot be combined'
+                    ' with mmap, which returns views of the file.')
+            views = self.as_memmap(rois=rois)
+            if hyperslab is not None:
+                views = [view[:, row_slice, col_slice] for view,
+                         (row_slice, col_slice) in zip(views, hyperslab)]
+            if isinstance(frames, range):
+                frame_slice = slice(frames.start,
+                    frames.stop if frames.stop >= 0 else None, frames.step)
+                return [view[frame_slice] for view in views]
+            return [view[np.asarray(frames, dtype=np.int64)]
+                    for view in views]
+        if binned:
+            return self._get_binned_data(rois, frames, rows, cols,
+                (xbin, ybin, full_vertical, bin_mode), read_gap, dtype, out,
+                workers)
+        data_list = self._allocate_output(rois, len(frames), dtype, out,
+            shapes=self._output_shapes(rois, hyperslab))
+        if hyperslab is not None:
+            views = self.as_memmap(rois=rois)
+            if isinstance(frames, range):
+                frame_index: slice | np.ndarray = slice(frames.start,
+                    frames.stop if frames.stop >= 0 else None, frames.step)
+            else:
+                frame_index = np.asarray(frames, dtype=np.int64)
+            for region_data, view, (row_slice, col_slice) in zip(
+                data_list, views, hyperslab):
+                region_data[:] = view[frame_index, row_slice, col_slice]
+            return data_list
+        if workers < 1:
+            raise ValueError('workers must be at least 1.')
+        #output position of each frame that still needs to be read
+        positions = None
+        cache_from = 0
+        if self._frame_cache is not None:
+            cached_frames = self._frame_cache.max_bytes //\
+                max(1, self._frame_bytes(rois))
+            if len(frames) <= cached_frames:
+                positions = self._fill_from_frame_cache(rois, frames,
+                                                        data_list)
+            else:
+                #a request larger than the budget skips the lookup, and only
+                #its last frames (which would survive eviction) are cached
+                cache_from = len(frames) - cached_frames
+        self._read_frames(rois, frames if positions is None else
+            np.asarray(frames, dtype=np.int64)[positions], read_gap,
+            workers, data_list, positions, cache_from=cache_from)
+        if self._prefetch_frames > 0:
+            self._observe_access(rois, frames)
+        return data_list
+
+    def _read_frames(self, rois: Sequence[int], frames: Sequence[int],
+                     read_gap: Optional[int], workers: int,
+                     data_list: Optional[list[np.ndarray]],
+                     positions: Optional[np.ndarray] = None, *,
+                     cache_from: int = 0) -> None:
+        """Reads whole frames of a spe file with coalesced, positioned
+        reads (on `workers` threads) into `data_list`, at `positions` (or in
+        order), and adds the frames from position `cache_from` of `frames`
+        on to the frame cache if there is one. With `data_list` None, the
+        frames are only cached.
+        """
+        pixel_dtype = self._pixel_dtype()
+        region_offsets = self._region_offsets()
+        readout_stride = int(self._readout_stride)
+        if read_gap is None:
+            read_gap = self.read_gap_bytes
+        #with several workers, cap reads so every worker gets a chunk
+        max_bytes = self.max_read_bytes if workers == 1 else min(
+            self.max_read_bytes, -(-len(frames)*readout_stride//workers))
+        read_plan = _plan_reads(frames, readout_stride, read_gap, max_bytes)
+
+        def read_block(planned_read: tuple[int, int, np.ndarray,
+                                           np.ndarray]):
+            first_frame, frame_count, out_idx, block_idx = planned_read
+            block = np.empty((frame_count, readout_stride), dtype=np.uint8)
+            try:
+                self._read_into(block, 4100 + first_frame*readout_stride)
+            except ValueError as exc:
+                raise ValueError(
+                    'Spe file ended before frame %d could be read.'
+                    %(first_frame+frame_count-1)) from exc
+            cache_idx = np.unique(block_idx[out_idx >= cache_from])
+            if positions is not None:
+                out_idx = positions[out_idx]
+            for idx_roi, roi in enumerate(rois):
+                width = int(self._roi_list[roi].width)
+                height = int(self._roi_list[roi].height)
+                start = region_offsets[roi]
+                region_block = block[:, start:
+                    start + width*height*pixel_dtype.itemsize].view(
+                    pixel_dtype).reshape(frame_count, height, width)
+                if data_list is not None:
+                    data_list[idx_roi][out_idx] = region_block[block_idx]
+                if self._frame_cache is not None:
+                    for idx in cache_idx.tolist():
+                        self._frame_cache.put((roi, first_frame + idx),
+                                              region_block[idx])
+
+        if workers == 1 or len(read_plan) < 2:
+            for planned_read in read_plan:
+                read_block(planned_read)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(read_block, read_plan))
+
+    def _observe_access(self, rois: Sequence[int],
+                        frames: Sequence[int]) -> None:
+        """Tracks the frames requested by `get_data`. While requests step
+        through the file in one direction (forward or backward, skipping at
+        most `prefetch_frames` frames), the next `prefetch_frames` frames
+        are read into the frame cache on a background thread; any other
+        access pattern cancels the prefetch.
+        """
+        frame_array = np.asarray(frames, dtype=np.int64)
+        if frame_array.size == 0:
+            return
+        depth = self._prefetch_frames
+        first, last = int(frame_array[0]), int(frame_array[-1])
+        direction = 0
+        if self._last_access is not None and\
+            tuple(rois) == self._last_access[0]:
+            delta = first - self._last_access[1]
+            if 0 < delta <= depth and (frame_array.size == 1 or
+                np.all(np.diff(frame_array) > 0)):
+                direction = 1
+            elif -depth <= delta < 0 and (frame_array.size == 1 or
+                np.all(np.diff(frame_array) < 0)):
+                direction = -1
+        self._last_access = (tuple(rois), last)
+        with self._prefetch_lock:
+            #stops the running prefetch at its next chunk
+            self._prefetch_generation += 1
+            generation = self._prefetch_generation
+            if direction == 0:
+                return
+            targets = [frame for frame in range(last + direction,
+                last + direction*(depth+1), direction)
+                if 0 <= frame < int(self._num_frames) and not all(
+                cast(FrameCache, self._frame_cache).peek((roi, frame))
+                for roi in rois)]
+            if not targets:
+                return
+            if self._prefetch_executor is None:
+                self._prefetch_executor = ThreadPoolExecutor(max_workers=1,
+                    thread_name_prefix='spe-prefetch')
+            self._prefetch_executor.submit(self._prefetch, tuple(rois),
+                                           targets, generation)
+
+    def _prefetch(self, rois: Sequence[int], frames: list[int],
+                  generation: int) -> None:
+        """Background job of `_observe_access`: reads `frames` into the
+        frame cache a few at a time, until done or cancelled.
+        """
+        chunk_size = max(1, len(frames) // 4)
+        for idx in range(0, len(frames), chunk_size):
+            if generation != self._prefetch_generation:
+                return
+            try:
+                self._read_frames(rois, frames[idx:idx+chunk_size], 0, 1,
+                                  None)
+            except (OSError, ValueError):
+                return
+
+    def _frame_bytes(self, rois: Sequence[int]) -> int:
+        """Size in bytes of one frame of the given ROIs."""
+        itemsize = self._pixel_dtype().itemsize
+        return sum(int(self._roi_list[roi].width) *
+                   int(self._roi_list[roi].height) * itemsize
+                   for roi in rois)
+
+    def _fill_from_frame_cache(self, rois: Sequence[int],
+                               frames: Sequence[int],
+                               data_list: list[np.ndarray]) -> np.ndarray:
+        """Copies frames held in the frame cache (for all requested ROIs)
+        into the output and returns the output positions of the frames that
+        still have to be read.
+        """
+        cache = cast(FrameCache, self._frame_cache)
+        missing = []
+        for position, frame in enumerate(np.asarray(frames).tolist()):
+            cached = [cache.get((roi, frame)) for roi in rois]
+            if any(region_frame is None for region_frame in cached):
+                missing.append(position)
+                continue
+            for region_data, region_frame in zip(data_list, cached):
+                region_data[position] = region_frame
+        return np.asarray(missing, dtype=np.int64)
+
+    def _get_binned_data(self, rois: Sequence[int], frames: Sequence[int],
+                         rows: HyperslabType, cols: HyperslabType,
+                         binning: tuple[int, int, bool, str],
+                         read_gap: Optional[int],
+                         dtype: Optional[npt.DTypeLike],
+                         out: Optional[Sequence[np.ndarray]],
+                         workers: int) -> list[np.ndarray]:
+        """Reads the requested frames in batches of at most `max_read_bytes`
+        and bins each batch into the output, so only the binned product and
+        one raw batch are held in memory. `binning` is `(xbin, ybin,
+        full_vertical, bin_mode)` as passed to `get_data`.
+        """
+        xbin, ybin, full_vertical, bin_mode = binning
+        if bin_mode not in ('sum', 'mean'):
+            raise ValueError("bin_mode must be 'sum' or 'mean'.")
+        if xbin < 1 or ybin < 1:
+            raise ValueError('xbin and ybin must be at least 1.')
+        raw_shapes = self._output_shapes(rois,
+                                         self._hyperslab(rois, rows, cols))
+        bins = [(height if full_vertical else ybin, xbin)
+                for height, _ in raw_shapes]
+        shapes = [(height // row_bin, width // col_bin) for
+                  (height, width), (row_bin, col_bin) in zip(raw_shapes, bins)]
+        if any(height == 0 or width == 0 for height, width in shapes):
+            raise ValueError('Bin size is larger than the selected ROI'
+                ' data.')
+        if np.issubdtype(self._pixel_dtype(), np.integer):
+            accumulator = np.dtype(np.int64)
+        else:
+            accumulator = np.dtype(np.float64)
+        if dtype is None:
+            dtype = accumulator if bin_mode == 'sum' else np.float64
+        data_list = self._allocate_output(rois, len(frames), dtype, out,
+                                          shapes=shapes)
+        if len(frames) == 0:
+            return data_list
+        frame_bytes = sum(height * width for height, width in raw_shapes) *\
+            self._pixel_dtype().itemsize
+        batch_size = max(1, self.max_read_bytes // max(1, frame_bytes))
+        for first in range(0, len(frames), batch_size):
+            batch = frames[first:first+batch_size]
+            raw_data = self.get_data(rois=rois, frames=batch, rows=rows,
+                cols=cols, read_gap=read_gap, workers=workers)
+            for region_data, raw, shape, (row_bin, col_bin) in zip(
+                data_list, raw_data, shapes, bins):
+                raw = raw[:, :shape[0]*row_bin, :shape[1]*col_bin]
+                total = raw.reshape(len(batch), shape[0], row_bin, shape[1],
+                    col_bin).sum(axis=(2, 4), dtype=accumulator)
+                if bin_mode == 'mean':
+                    total = total / (row_bin * col_bin)
+                region_data[first:first+len(batch)] = total
         return data_list
 
-    def get_wavelengths(self,*, rois: Optional[Sequence[int]] = None) ->\
-        Sequence[WavelengthNdArray]:
+    def _allocate_output(self, rois: Sequence[int], num_frames: int,
+                         dtype: Optional[npt.DTypeLike],
+                         out: Optional[Sequence[np.ndarray]], *,
+                         shapes: Optional[Sequence[tuple[int, int]]] = None)\
+                         -> list[np.ndarray]:
+        """Validates caller-supplied `out` buffers for `get_data`, or
+        allocates new ones (native pixel dtype unless `dtype` is given).
+        `shapes` holds the (Rows, Cols) per ROI and defaults to whole frames.
+        """
+        if shapes is None:
+            shapes = self._output_shapes(rois, None)
+        if out is None:
+            if dtype is None:
+                dtype = self._pixel_dtype()
+            return [np.empty((num_frames, *shape), dtype=dtype)
+                    for shape in shapes]
+        if len(out) != len(rois):
+            raise ValueError('out must contain one array per requested ROI'
+                ' (%d arrays expected)'%(len(rois)))
+        for roi, shape, buffer in zip(rois, shapes, out):
+            expected = (num_frames, *shape)
+            if buffer.shape != expected:
+                raise ValueError('out array for ROI %d has shape %s, '
+                    'expected %s'%(roi, buffer.shape, expected))
+            if dtype is not None and buffer.dtype != np.dtype(dtype):
+                raise ValueError('out array for ROI %d has dtype %s, '
+                    'expected %s'%(roi, buffer.dtype, np.dtype(dtype)))
+        return list(out)
+
+    def iter_frames(self,*,rois:Optional[Sequence[int]] = None,
+                    batch_size: Optional[int] = None, start: int = 0,
+                    stop: Optional[int] = None, step: int = 1,
+                    read_ahead: bool = False,
+                    dtype: Optional[npt.DTypeLike] = None,
+                    rows: HyperslabType = None,
+                    cols: HyperslabType = None,
+                    wavelength_range: Optional[tuple[float, float]] = None,
+                    wavelengths: Optional[Sequence[float]] = None,
+                    xbin: int = 1, ybin: int = 1, full_vertical: bool = False,
+                    bin_mode: str = 'sum', workers: int = 1) ->\
+                    Iterator[tuple[range, Sequence[SpeNdArray]]]:
+        """Walks through the frames of the spe file in batches, so files
+        much larger than the available memory can be processed. Only one
+        batch (two with `read_ahead`) is held in memory at a time.
+
+        Example usage:
+
+        `for frames, data in img_reference.iter_frames(batch_size=100):`
+        ----- `data[0]` is then a [len(frames), Rows, Cols] array for the
+        first ROI, holding the frames listed in `frames`.
+
+        ----------------------------------------------------------------------
+        Inputs:
+        ----------------------------------------------------------------------
+        - `rois`: Optional named argument for a sequence of desired ROIs. If
+        None, then all ROIs in the spe file are parsed.
+        - `batch_size`: Optional named argument for the number of frames per
+        batch. If None, batches are sized to fit in `max_read_bytes`.
+        - `start`, `stop`, `step`: Optional named arguments selecting the
+        frames to walk through, as for `range`. `stop` defaults to the number
+        of frames in the file.
+        - `read_ahead`: Optional named argument. If True, the next batch is
+        read on a background thread while the current one is processed.
+        - `dtype`: Optional named argument for the dtype of the returned
+        arrays (see `get_data`).
+        - `rows`, `cols`: Optional named arguments selecting a hyperslab of
+        each frame (see `get_data`).
+        - `wavelength_range`, `wavelengths`: Optional named arguments
+        selecting columns by wavelength (see `get_data`).
+        - `xbin`, `ybin`, `full_vertical`, `bin_mode`: Optional named
+        arguments for software binning of each batch (see `get_data`).
+        - `workers`: Optional named argument for the number of threads used
+        to read each batch (see `get_data`).
+        ----------------------------------------------------------------------
+        Output:
+        ----------------------------------------------------------------------
+        - Generator of `(frames, data)` tuples: `frames` is the `range` of
+        frame indices in the batch and `data` is a list of numpy NDArrays
+        (one per ROI) of shape [Frames, Rows, Cols], as from `get_data`.
+        ----------------------------------------------------------------------
+        Exceptions:
+        ----------------------------------------------------------------------
+        - `ValueError` raised if desired ROI(s) and / or frame(s) fall outside
+        of the range contained in the spe file, or if `batch_size` is not
+        positive.
+        """
+        rois = self._check_rois(rois)
+        if stop is None:
+            stop = int(self._num_frames)
+        frames = range(start, stop, step)
+        if len(frames) == 0:
+            return
+        frames = self._check_frames(frames)
+        hyperslab = self._hyperslab(rois, rows, cols)
+        bpp = self._pixel_dtype().itemsize
+        batches = _frame_batches(frames, batch_size, sum(height * width * bpp
+            for height, width in self._output_shapes(rois, hyperslab)),
+            self.max_read_bytes)
+        yield from _iter_batches(functools.partial(self.get_data, rois=rois,
+            rows=rows, cols=cols, wavelength_range=wavelength_range,
+            wavelengths=wavelengths, xbin=xbin, ybin=ybin,
+            full_vertical=full_vertical, bin_mode=bin_mode, dtype=dtype,
+            workers=workers), batches, read_ahead)
+
+    def get_wavelengths(self,*, rois: Optional[Sequence[int]] = None,
+                        xbin: int = 1) -> Sequence[WavelengthNdArray]:
         """Extracts wavelength calibration axis for the ROI(s) specified by
         the `rois` input. Returns empty list if wavelength calibration info
         does not exist.
@@ -530,6 +2061,9 @@ class SpeReference():
         - `rois`: Optional int sequence specifying the ROI(s) to extract
         wavelength calibration for. If empty, all ROI(s) in the spe file will
         be parsed for wavelength calibration information.
+        - `xbin`: Optional named argument matching the `xbin` of software
+        binned data from `get_data`: the wavelengths of each bin of columns
+        are averaged (trailing columns that do not fill a bin are dropped).
         ----------------------------------------------------------------------
         Output:
         ----------------------------------------------------------------------
@@ -544,33 +2078,82 @@ class SpeReference():
         range of ROIs existing in the spe file.
         - `TypeError` raised if the input parameter is not iterable.
         """
-        if self._spe_version < 3:
-            print('Version %0.1f spe files do not have wavelength cal.'%
-                (self._spe_version))
-        if not any(self._full_wavelength_coverage):
+        roi_wavelengths = self._wavelength_axes()
+        if not roi_wavelengths:
             return []
-        if not rois:
-            rois = range(0,len(self._roi_list))
-        try:
-            for item in rois:
-                if item < 0 or item >= len(self._roi_list):
-                    raise ValueError(
-                        'ROI value outside of allowed range (%d through %d)'
-                        %(0, len(self._roi_list)-1))
-        except TypeError as exc:
-            raise TypeError('ROI input needs to be iterable') from exc
-
-        ##if len(self.wavelength) == self.sensorDims.width:
-        wavelength_list = []
-        for item in rois:
-            if self._roi_list[item].width > 0:
-                wl_idx = np.arange(self._roi_list[item].x,
-                    self._roi_list[item].x+self._roi_list[item].width,
-                    self._roi_list[item].xbin,dtype=np.int32)
-                wavelength_list.append(self._full_wavelength_coverage[wl_idx])
-            else:
-                wavelength_list.append(self._full_wavelength_coverage)
+        rois = self._check_rois(rois)
+        wavelength_list = [roi_wavelengths[item] for item in rois]
+        if xbin < 1:
+            raise ValueError('xbin must be at least 1.')
+        if xbin > 1:
+            wavelength_list = [_bin_wavelengths(wavelengths, xbin)
+                               for wavelengths in wavelength_list]
         return wavelength_list
+
+    def _wavelength_axes(self) -> list[WavelengthNdArray]:
+        """Wavelength axis of every ROI (one value per binned column: the
+        mean over the sensor columns of the bin), computed once and cached
+        as read-only arrays. Empty if there is no wavelength calibration.
+        """
+        if self._roi_wavelengths is None:
+            self._load_layout()
+            full_coverage = self._full_wavelength_coverage
+            roi_wavelengths = []
+            if np.any(full_coverage):
+                for roi in self._roi_list:
+                    width, xbin = int(roi.width), int(roi.xbin)
+                    if width > 0:
+                        wavelengths = _bin_wavelengths(full_coverage[
+                            int(roi.x):int(roi.x)+width*xbin], xbin)
+                    else:
+                        wavelengths = full_coverage.copy()
+                    wavelengths.flags.writeable = False
+                    roi_wavelengths.append(wavelengths)
+            self._roi_wavelengths = roi_wavelengths
+        return self._roi_wavelengths
+
+    def _wavelength_columns(self, rois: Sequence[int],
+                            wavelength_range: Optional[tuple[float, float]],
+                            wavelengths: Optional[Sequence[float]]) ->\
+                            tuple[list[slice], Optional[list[np.ndarray]]]:
+        """Translates a wavelength selection into one column slice per
+        requested ROI, using `searchsorted` on the cached wavelength axes.
+        For `wavelengths`, the slice covers the nearest columns and the
+        second output holds the positions of those columns in the slice
+        (None for `wavelength_range`).
+        """
+        if (wavelength_range is None) == (wavelengths is None):
+            raise ValueError('Pass either wavelength_range or wavelengths.')
+        roi_wavelengths = self._wavelength_axes()
+        if not roi_wavelengths:
+            raise ValueError('The spe file has no wavelength calibration.')
+        col_slices, picks = [], []
+        for roi in rois:
+            axis = roi_wavelengths[roi]
+            #searchsorted needs an ascending axis
+            sign = -1 if len(axis) > 1 and axis[0] > axis[-1] else 1
+            search_axis = sign * axis
+            if wavelength_range is not None:
+                low, high = sorted(sign * np.asarray(wavelength_range,
+                                                     dtype=np.float64))
+                col_slices.append(slice(
+                    int(np.searchsorted(search_axis, low, side='left')),
+                    int(np.searchsorted(search_axis, high, side='right'))))
+                continue
+            targets = sign * np.asarray(wavelengths, dtype=np.float64)
+            if targets.ndim != 1 or targets.size == 0:
+                raise ValueError('wavelengths must be a non-empty sequence.')
+            right = np.clip(np.searchsorted(search_axis, targets), 1,
+                            max(1, len(axis)-1))
+            left = right - 1
+            columns = np.where(np.abs(search_axis[right] - targets) <
+                np.abs(targets - search_axis[left]), right, left) if\
+                len(axis) > 1 else np.zeros(len(targets), dtype=np.int64)
+            first = int(columns.min())
+            col_slices.append(slice(first, int(columns.max())+1))
+            picks.append(columns - first)
+        return col_slices, (picks if wavelengths is not None else None)
+
     def _get_camera_settings_do_not_use(self) -> dict:
         """
         WILL NOT BE MAINTAINED -- SEE GenerateSettingsLists
@@ -588,7 +2171,7 @@ class SpeReference():
             'sensor_info': None
         }
         #pylint: disable=line-too-long
-        xml_root = ET.fromstring(self._xml_footer)
+        xml_root = ET.fromstring(self.xml_footer)
         for child in xml_root:
             if 'DataHistories'.casefold() in child.tag.casefold():
                 for child1 in child:
@@ -633,88 +2216,65 @@ class SpeReference():
                                                             if 'Camera'.casefold() in child3.tag.casefold():
                                                                 settings_dictionary['camera_info'] = '%s, SN: %s'%(child3.get('model'),child3.get('serialNumber'))# type: ignore
         return settings_dictionary
+    def _build_settings(self):
+        """Parses the xml footer once and caches both the settings index
+        (see `get_setting`) and the list of key `ExperimentSetting` objects
+        (see `retrieve_all_experiment_settings`).
+        """
+        if self.xml_footer:
+            self._settings_index, self._experiment_settings =\
+                _parse_settings(ET.fromstring(self.xml_footer))
+        else:
+            self._settings_index, self._experiment_settings = {}, ()
+        self._experiment_settings_lookup = {}
+        for exp_setting in self._experiment_settings:
+            self._experiment_settings_lookup.setdefault(
+                exp_setting.setting_name.casefold(), []).append(exp_setting)
+        self._settings_lookup = _settings_lookup_table(
+            self._settings_index, self._experiment_settings)
+
     def retrieve_all_experiment_settings(self) -> Sequence[ExperimentSetting]:
         """Parses xml for key settings and output as a list of
         `ExperimentSetting`. Settings to include are a work in progress.
+        The xml is only parsed on the first call; the result is cached.
         
         Check docstring for `retrieve_experiment_settings`
         for a list of settings that are currently included.
         """
-        experiment_settings_list = []
-
-        #xml parsing
-        #pylint: disable=line-too-long
-        xml_root = ET.fromstring(self._xml_footer)
-        for child in xml_root:
-            if 'DataHistories'.casefold() in child.tag.casefold():
-                for child1 in child:
-                    if 'DataHistory'.casefold() in child1.tag.casefold():
-                        for child2 in child1:
-                            if 'Origin'.casefold() in child2.tag.casefold():
-                                for child3 in child2:
-                                    if 'Experiment'.casefold() in child3.tag.casefold():
-                                        for child4 in child3:
-                                            if 'Devices'.casefold() in child4.tag.casefold():
-                                                for child2 in child4:
-                                                    if 'Cameras'.casefold() in child2.tag.casefold():
-                                                        for child3 in child2:
-                                                            if 'Camera'.casefold() in child3.tag.casefold():
-                                                                for child4 in child3:
-                                                                    if 'ShutterTiming'.casefold() in child4.tag.casefold():
-                                                                        for child5 in child4:
-                                                                            if 'ExposureTime'.casefold() in child5.tag.casefold():
-                                                                                experiment_settings_list.append(ExperimentSetting('EXPOSURE_TIME',  np.float64(child5.text), np.float64, _Unit.MS))
-                                                                    if 'Adc'.casefold() in child4.tag.casefold():
-                                                                        for child5 in child4:
-                                                                            if 'Speed'.casefold() in child5.tag.casefold():
-                                                                                if child5.get('relevance') != 'False':
-                                                                                    experiment_settings_list.append(ExperimentSetting('ADC_SPEED',  np.float64(child5.text), np.float64, _Unit.MHZ))
-                                                                            if 'AnalogGain'.casefold() in child5.tag.casefold():
-                                                                                if child5.get('relevance') != 'False':
-                                                                                    experiment_settings_list.append(ExperimentSetting('ADC_ANALOG_GAIN', str(child5.text), str, _Unit.NONE))
-                                                                            if 'BitDepth'.casefold() in child5.tag.casefold():
-                                                                                experiment_settings_list.append(ExperimentSetting('BIT_DEPTH',  np.int64(child5.text), np.int64, _Unit.BITS))# type: ignore
-                                                                    if 'ReadoutControl'.casefold() in child4.tag.casefold():
-                                                                        for child5 in child4:
-                                                                            if 'Time'.casefold() in child5.tag.casefold():
-                                                                                experiment_settings_list.append(ExperimentSetting('READOUT_TIME',  np.float64(child5.text), np.float64, _Unit.MS))
-                                                                            if 'VerticalShiftRate'.casefold() in child5.tag.casefold():
-                                                                                if child5.get('relevance') != 'False':
-                                                                                    experiment_settings_list.append(ExperimentSetting('VERTICAL_SHIFT_RATE',  np.float64(child5.text), np.float64, _Unit.US))
-                                                                            if 'PortsUsed'.casefold() in child5.tag.casefold():
-                                                                                experiment_settings_list.append(ExperimentSetting('PORTS_USED',  np.int64(child5.text), np.int64, _Unit.NONE))# type: ignore
-                                                                    if 'Sensor'.casefold() in child4.tag.casefold():
-                                                                        for child5 in child4:
-                                                                            if 'Temperature'.casefold() in child5.tag.casefold():
-                                                                                for child6 in child5:
-                                                                                    if 'Reading'.casefold() in child6.tag.casefold():
-                                                                                        experiment_settings_list.append(ExperimentSetting('SENSOR_TEMPERATURE',  np.float64(child6.text), np.float64, _Unit.DEGREES_CELSIUS))
-                                                                            if 'Information'.casefold() in child5.tag.casefold():
-                                                                                for child6 in child5:
-                                                                                    if 'SensorName'.casefold() in child6.tag.casefold():
-                                                                                        experiment_settings_list.append(ExperimentSetting('SENSOR_INFORMATION', str(child6.text), str, _Unit.NONE))
-                                                                                    if 'Pixel'.casefold() in child6.tag.casefold():
-                                                                                        for child7 in child6:
-                                                                                            if 'Width' in child7.tag and not 'Gap' in child7.tag:
-                                                                                                experiment_settings_list.append(ExperimentSetting('PIXEL_PITCH',
-                                                                                                    np.float64(child7.text), np.float64, _Unit.UM))
+        if self._experiment_settings is None:
+            self._build_settings()
+        return self._experiment_settings # type: ignore
 
-                                            if 'System'.casefold() in child4.tag.casefold():
-                                                for child2 in child4:
-                                                    if 'Cameras'.casefold() in child2.tag.casefold():
-                                                        for child3 in child2:
-                                                            if 'Camera'.casefold() in child3.tag.casefold():
-                                                                experiment_settings_list.append(ExperimentSetting('CAMERA_MODEL', str(child3.get('model')), str, _Unit.NONE))
-                                                                experiment_settings_list.append(ExperimentSetting('SERIAL_NUMBER', str(child3.get('serialNumber')), str, _Unit.NONE))
-        #
-        return tuple(experiment_settings_list)
+    def get_setting(self, path: str) -> Optional[str]:
+        """Looks up any device setting from the spe file's xml footer by its
+        element path below `Devices` in the experiment's data history, e.g.
+        `Cameras/Camera/ShutterTiming/ExposureTime`, or by the name of a key
+        setting (see `retrieve_experiment_settings`), e.g. `EXPOSURE_TIME`.
+        Lookups are case-insensitive and constant time (the footer is
+        indexed once).
+        ----------------------------------------------------------------------
+        Input:
+        ----------------------------------------------------------------------
+        - `path`: '/'-separated element path or key setting name of the
+        desired setting.
+        ----------------------------------------------------------------------
+        Output:
+        ----------------------------------------------------------------------
+        - `str` text of the setting, or None if the path does not exist.
+        ----------------------------------------------------------------------
+        See Also:
+        ----------------------------------------------------------------------
+        - `read_spe.SpeReference.settings_index`
+        """
+        if self._settings_index is None:
+            self._build_settings()
+        return self._settings_lookup.get(path.strip('/').casefold())
 
     def retrieve_experiment_settings(self, setting_names: Sequence[str]) ->\
         Sequence[ExperimentSetting]:
-        """Generates an experiment settings list via parsing of the spe's xml
-        footer and iterates through parsed settings until the user input
-        setting_names are found. Any found settings are appended to the output
-        sequence.
+        """Looks up the user input setting_names in the experiment settings
+        parsed from the spe's xml footer. Any found settings are appended to
+        the output sequence.
 
         WORK IN PROGRESS -- more valid settings may be added.
 
@@ -743,22 +2303,49 @@ class SpeReference():
         - `VERTICAL_SHIFT_RATE`
         ----------------------------------------------------------------------
         """
-        experiment_settings_list = self.retrieve_all_experiment_settings()
+        if self._experiment_settings is None:
+            self._build_settings()
         output_list: list[ExperimentSetting] = []
         for requested_name in setting_names:
-            for exp_setting in experiment_settings_list:
-                if exp_setting.setting_name.casefold() ==\
-                    requested_name.casefold():
-                    output_list.append(exp_setting)
+            output_list.extend(self._experiment_settings_lookup.get(
+                requested_name.casefold(), []))
         return output_list
 
+    def _read_frame_metadata(self, frames: Optional[Sequence[int]] = None)\
+        -> np.ndarray:
+        """Reads the metadata of the requested frames (all frames if None)
+        in one strided pass over the mapped data block and returns it as a
+        columnar structured array.
+        """
+        self._load_layout()
+        raw_dtype, out_dtype = _metadata_dtypes(self._meta_list)
+        if frames is None:
+            frames = range(0, int(self._num_frames))
+        if len(self._meta_list) == 0 or len(frames) == 0:
+            return np.zeros(len(frames), dtype=out_dtype)
+        raw = np.ndarray(shape=(int(self._num_frames),), dtype=raw_dtype,
+            buffer=self._data_memmap(), offset=int(self._frame_stride),
+            strides=(int(self._readout_stride),))
+        if isinstance(frames, range):
+            raw = raw[frames.start:frames.stop if frames.stop >= 0 else None:
+                      frames.step]
+        else:
+            raw = raw[np.asarray(frames, dtype=np.int64)]
+        output_metadata = np.empty(len(raw), dtype=out_dtype)
+        for name, meta in zip(out_dtype.names, self._meta_list):# type: ignore
+            if isinstance(meta, TimeStamp):
+                output_metadata[name] = (raw[name] / meta.resolution) * 1000
+            else:
+                output_metadata[name] = raw[name]
+        return output_metadata
+
     def get_frame_metadata_value(self, frames: Sequence[int]) ->\
         Sequence[Sequence[MetaType]]:
         """Retrieves per-frame metadata values for the frames specified in
-        the input. The values for any given frame are returned as a `Sequence`
+        the input. The values for any given frame are returned as a record
         of `MetaType` values (either `int64` or `float64`). The `SpeReference`
         member `meta_list` should be consulted to understand the type of
-        metadata the value is referencing.
+        metadata the value is referencing. TimeStamp values are in ms.
         ----------------------------------------------------------------------
         Input:
         ----------------------------------------------------------------------
@@ -767,33 +2354,15 @@ class SpeReference():
         ----------------------------------------------------------------------
         Output:
         ----------------------------------------------------------------------
-        - `Sequence[Sequence[MetaType]]`: The outer sequence is indexed per
-        frame (as specified in the input). The inner sequence contains values
-        for each metadata type present in the spe file. These types can be
-        found in the `meta_list` member of `SpeReference`.
+        - `Sequence[Sequence[MetaType]]`: a numpy structured array indexed
+        per frame (as specified in the input). Each record contains values
+        for each metadata type present in the spe file, in the order of the
+        `meta_list` member of `SpeReference`, and can be indexed by position
+        (`values[frame][idx_meta]`). The array is also columnar: a field
+        (named for the metadata event, e.g. `values['ExposureStarted']`)
+        holds that value for all requested frames.
         """
-        output_metadata: list = [0] * len(frames)
-        with open(self._filepath, encoding="utf8") as f:
-            for idx_frame, frame in enumerate(frames):
-                output_metadata[idx_frame] = [0] * len(self._meta_list)
-                readout_offset = frame * self._readout_stride
-                metadata_offset = int(readout_offset + self._frame_stride)
-                for idx_meta, meta in enumerate(self._meta_list):
-                    f.seek(0)
-                    if idx_meta > 0:
-                        metadata_offset += int(
-                            (self._meta_list[idx_meta-1].bit_depth) / 8)
-                    meta_length = np.dtype(meta.datatype).itemsize // int((
-                        self._meta_list[idx_meta-1].bit_depth) / 8)
-                    output_metadata[idx_frame][idx_meta] = np.fromfile(
-                        f, dtype=meta.datatype, count=meta_length,
-                        offset=int(4100+metadata_offset))[0]
-                    tmp = meta
-                    if isinstance(tmp, TimeStamp):
-                        output_metadata[idx_frame][idx_meta] = (
-                            output_metadata[idx_frame][idx_meta] /
-                            tmp.resolution) * 1000
-        return output_metadata
+        return self._read_frame_metadata(frames)
     @property
     def filepath(self) -> str:
         """Full file path"""
@@ -816,7 +2385,10 @@ class SpeReference():
         return self._spe_version
     @property
     def roi_list(self) -> Sequence[_ROI]:
-        """tuple of ROIs in the data block"""
+        """tuple of ROIs in the data block. Width, height and stride come
+        from the DataFormat block; for a lazy reference, positions and
+        binning are parsed from the footer on first access.
+        """
         return tuple(self._roi_list)
     @property
     def readout_stride(self) -> NumpyInteger:
@@ -839,24 +2411,62 @@ class SpeReference():
         """ROI object that has height and width corresponding to original
         sensor dimensions.
         """
+        self._load_layout()
         return self._sensor_dims
     @property
     def meta_list(self) -> Sequence[Metadata]:
         """Tuple of metadata types contained in each frame's data block."""
+        self._load_layout()
         return tuple(self._meta_list)
     @property
     def frame_metadata_values(self) -> Sequence[Sequence[MetaType]]:
-        """Nested tuple containing all frame metadata values in the full
-        data block. Outer loop indexes frame, and inner loop indexes metadata
-        element.
+        """Read-only structured array containing all frame metadata values in
+        the full data block. Indexed by frame, then by metadata element (see
+        `get_frame_metadata_value`); fields hold the columns per metadata
+        event. Empty if the file does not contain metadata.
         """
-        return tuple(map(tuple,self._frame_metadata_values))
+        if self._frame_metadata_values is None:
+            self._load_layout()
+            if len(self._meta_list) > 0:
+                self._frame_metadata_values = self._read_frame_metadata()
+            else:
+                self._frame_metadata_values = np.zeros(0, dtype=np.dtype([]))
+            self._frame_metadata_values.flags.writeable = False
+        return self._frame_metadata_values
+    @property
+    def old_spe_header(self) -> Optional[np.void]:
+        """Decoded binary header of a spe 2.x file, as a record of
+        `old_spe_header_dtype` (exposure, dates and times, ROI blocks,
+        calibration structs, ...). None for spe v3 files.
+        """
+        return self._old_spe_header
+    @property
+    def frame_cache(self) -> Optional[FrameCache]:
+        """Frame cache used by `get_data` (None unless the reference was
+        constructed with `frame_cache_bytes`)
+        """
+        return self._frame_cache
+    @property
+    def settings_index(self) -> Mapping[str, str]:
+        """Read-only mapping of every device setting in the xml footer,
+        keyed by element path below `Devices` (e.g.
+        `Cameras/Camera/ShutterTiming/ExposureTime`), to its text value.
+        """
+        if self._settings_index is None:
+            self._build_settings()
+        return MappingProxyType(self._settings_index) # type: ignore
     @property
     def xml_footer(self) -> str:
         """xml footer of spe file as string, to be used for external
         parsing.
         """
-        return self._xml_footer
+        if self._xml_footer is None:
+            if self._footer_parsed:
+                #opened from the index cache, which does not hold the text
+                self._xml_footer = self._read_footer_text()
+            else:
+                self._load_footer()
+        return self._xml_footer # type: ignore
     @property
     def xml_footer_pretty_print(self) -> str:
         """xml footer in pretty print form for easier visualization"""
@@ -0,0 +1,246 @@
+"""Module for computing per-pixel and per-frame statistics (sum, mean,
+min, max, variance) over the frames of a `SpeReference` without loading
+the whole file into memory.
+
+The frames are streamed in batches with `SpeReference.iter_frames`, so the
+memory used is set by the batch size rather than the file size. Variances
+are accumulated with Chan's parallel form of Welford's algorithm, so the
+results are numerically stable and partial results from different frame
+chunks (e.g. from different threads) can be merged.
+
+Example usage to get a dark average and noise map of 'dark.spe':
+>>> from read_spe import SpeReference, reduce_frames
+>>> result = reduce_frames(SpeReference('dark.spe'), workers=4)
+>>> dark_mean = result[0].pixel.mean
+>>> noise_map = result[0].pixel.std
+>>> mean_vs_time = result[0].per_frame['mean']
+-----
+"""
+
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+import numpy as np
+from .read_spe import SpeReference, SpeNdArray
+
+#per-frame statistics of `reduce_frames`, one record per frame
+frame_statistics_dtype = np.dtype([('frame', np.int64), ('sum', np.float64),
+    ('mean', np.float64), ('min', np.float64), ('max', np.float64),
+    ('variance', np.float64)])
+
+class PixelStatistics():
+    """Running per-pixel statistics over a stack of frames.
+
+    Frames are added in batches with `update`, and statistics accumulated
+    over separate sets of frames can be combined with `merge`.
+
+    --------------------------------------------------------------------------
+    Inputs (for constructor):
+    --------------------------------------------------------------------------
+    - `shape`: (Rows, Cols) shape of the frames.
+    - `dtype`: dtype of the frame data (sets the dtype of `min` and `max`).
+    """
+    def __init__(self, shape: tuple[int, int], dtype: np.dtype) -> None:
+        self._count = 0
+        self._dtype = np.dtype(dtype)
+        if np.issubdtype(self._dtype, np.integer):
+            self._sum = np.zeros(shape, dtype=np.int64)
+        else:
+            self._sum = np.zeros(shape, dtype=np.float64)
+        self._mean = np.zeros(shape, dtype=np.float64)
+        self._m2 = np.zeros(shape, dtype=np.float64)
+        self._min = np.zeros(shape, dtype=self._dtype)
+        self._max = np.zeros(shape, dtype=self._dtype)
+
+    def update(self, frames: SpeNdArray) -> None:
+        """Adds a [Frames, Rows, Cols] batch of frames to the statistics."""
+        batch_count = frames.shape[0]
+        if batch_count == 0:
+            return
+        batch_mean = frames.mean(axis=0, dtype=np.float64)
+        batch_m2 = np.square(frames - batch_mean).sum(axis=0)
+        self._merge(batch_count, frames.sum(axis=0, dtype=self._sum.dtype),
+                    batch_mean, batch_m2, frames.min(axis=0),
+                    frames.max(axis=0))
+
+    def merge(self, other: 'PixelStatistics') -> None:
+        """Combines the statistics of `other` (accumulated over a different
+        set of frames of the same shape) into this object.
+        """
+        if other.count == 0:
+            return
+        self._merge(other.count, other.sum, other.mean, other._m2,
+                    other.min, other.max)
+
+    def _merge(self, count: int, total: np.ndarray, mean: np.ndarray,
+               m2: np.ndarray, minimum: np.ndarray,
+               maximum: np.ndarray) -> None:
+        """Chan et al. pairwise update of the running statistics."""
+        if self._count == 0:
+            self._count = count
+            self._sum[:] = total
+            self._mean[:] = mean
+            self._m2[:] = m2
+            self._min[:] = minimum
+            self._max[:] = maximum
+            return
+        new_count = self._count + count
+        delta = mean - self._mean
+        self._m2 += m2 + np.square(delta) * (self._count * count / new_count)
+        self._mean += delta * (count / new_count)
+        self._sum += total
+        np.minimum(self._min, minimum, out=self._min)
+        np.maximum(self._max, maximum, out=self._max)
+        self._count = new_count
+
+    @property
+    def count(self) -> int:
+        """Number of frames accumulated"""
+        return self._count
+    @property
+    def sum(self) -> np.ndarray:
+        """Per-pixel sum (int64 for integer data, float64 otherwise)"""
+        return self._sum
+    @property
+    def mean(self) -> np.ndarray:
+        """Per-pixel mean (float64)"""
+        if self._count == 0:
+            return np.full(self._mean.shape, np.nan)
+        return self._mean
+    @property
+    def variance(self) -> np.ndarray:
+        """Per-pixel population variance (float64)"""
+        if self._count == 0:
+            return np.full(self._m2.shape, np.nan)
+        return self._m2 / self._count
+    @property
+    def std(self) -> np.ndarray:
+        """Per-pixel population standard deviation (float64)"""
+        return np.sqrt(self.variance)
+    @property
+    def min(self) -> np.ndarray:
+        """Per-pixel minimum (dtype of the frame data)"""
+        return self._min
+    @property
+    def max(self) -> np.ndarray:
+        """Per-pixel maximum (dtype of the frame data)"""
+        return self._max
+
+class FrameReduction():
+    """Result of `reduce_frames` for one ROI.
+
+    - `pixel`: `PixelStatistics` over all reduced frames.
+    - `per_frame`: structured array with one record per reduced frame and
+    fields `frame`, `sum`, `mean`, `min`, `max` and `variance` (population).
+    """
+    def __init__(self, roi: int, frames: range, pixel: PixelStatistics,
+                 per_frame: np.ndarray) -> None:
+        self._roi = roi
+        self._frames = frames
+        self._pixel = pixel
+        self._per_frame = per_frame
+    @property
+    def roi(self) -> int:
+        """Index of the ROI in the spe file"""
+        return self._roi
+    @property
+    def frames(self) -> range:
+        """Frames that were reduced"""
+        return self._frames
+    @property
+    def pixel(self) -> PixelStatistics:
+        """Per-pixel statistics over the reduced frames"""
+        return self._pixel
+    @property
+    def per_frame(self) -> np.ndarray:
+        """Per-frame statistics (structured array, one record per frame)"""
+        return self._per_frame
+
+def reduce_frames(spe_ref: SpeReference, *,
+                  rois: Optional[Sequence[int]] = None, start: int = 0,
+                  stop: Optional[int] = None, step: int = 1,
+                  batch_size: Optional[int] = None,
+                  workers: int = 1) -> Sequence[FrameReduction]:
+    """Computes per-pixel and per-frame sum, mean, min, max and variance in
+    a single streamed pass over the requested frames.
+
+    ----------------------------------------------------------------------
+    Inputs:
+    ----------------------------------------------------------------------
+    - `spe_ref`: `SpeReference` of the spe file to reduce.
+    - `rois`: Optional named argument for a sequence of desired ROIs. If
+    None, then all ROIs in the spe file are reduced.
+    - `start`, `stop`, `step`: Optional named arguments selecting the frames
+    to reduce, as for `range`. `stop` defaults to the number of frames.
+    - `batch_size`: Optional named argument for the number of frames read
+    at a time (see `SpeReference.iter_frames`).
+    - `workers`: Optional named argument for the number of threads. The
+    frames are split into that many contiguous chunks, reduced
+    concurrently, and the partial results merged.
+    ----------------------------------------------------------------------
+    Output:
+    ----------------------------------------------------------------------
+    - `Sequence[FrameReduction]`, one element per requested ROI.
+    ----------------------------------------------------------------------
+    Exceptions:
+    ----------------------------------------------------------------------
+    - `ValueError` raised if desired ROI(s) and / or frame(s) fall outside
+    of the range contained in the spe file, or if `workers` is not positive.
+    """
+    if workers < 1:
+        raise ValueError('workers must be at least 1.')
+    rois = list(spe_ref._check_rois(rois))# pylint: disable=protected-access
+    if stop is None:
+        stop = int(spe_ref.num_frames)
+    frames = range(start, stop, step)
+    if len(frames) > 0:
+        spe_ref._check_frames(frames)# pylint: disable=protected-access
+    dtype = spe_ref._pixel_dtype()# pylint: disable=protected-access
+    shapes = [(int(spe_ref.roi_list[roi].height),
+               int(spe_ref.roi_list[roi].width)) for roi in rois]
+    per_frame = [np.zeros(len(frames), dtype=frame_statistics_dtype)
+                 for _ in rois]
+    for stats in per_frame:
+        stats['frame'] = frames
+
+    def reduce_chunk(first: int, last: int) -> list[PixelStatistics]:
+        """Reduces `frames[first:last]`; per-frame results are written to
+        the (disjoint) matching slice of the shared output arrays.
+        """
+        pixel = [PixelStatistics(shape, dtype) for shape in shapes]
+        chunk = frames[first:last]
+        if len(chunk) == 0:
+            return pixel
+        position = first
+        for batch, data in spe_ref.iter_frames(rois=rois,
+            batch_size=batch_size, start=chunk.start, stop=chunk.stop,
+            step=chunk.step):
+            for idx_roi, region_data in enumerate(data):
+                pixel[idx_roi].update(region_data)
+                stats = per_frame[idx_roi][position:position+len(batch)]
+                stats['sum'] = region_data.sum(axis=(1, 2),
+                                               dtype=np.float64)
+                stats['mean'] = stats['sum'] / (shapes[idx_roi][0] *
+                                                 shapes[idx_roi][1])
+                stats['min'] = region_data.min(axis=(1, 2))
+                stats['max'] = region_data.max(axis=(1, 2))
+                stats['variance'] = region_data.var(axis=(1, 2),
+                                                    dtype=np.float64)
+            position += len(batch)
+        return pixel
+
+    bounds = np.linspace(0, len(frames), min(workers, max(1, len(frames)))+1,
+                         dtype=np.int64)
+    if len(bounds) == 2:
+        partials = [reduce_chunk(0, len(frames))]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(reduce_chunk, bounds[:-1].tolist(),
+                                         bounds[1:].tolist()))
+    results = []
+    for idx_roi, roi in enumerate(rois):
+        pixel = PixelStatistics(shapes[idx_roi], dtype)
+        for partial in partials:
+            pixel.merge(partial[idx_roi])
+        results.append(FrameReduction(roi, frames, pixel, per_frame[idx_roi]))
+    return results
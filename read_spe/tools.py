@@ -0,0 +1,365 @@
+"""Module for concatenating, subsetting and splitting spe v3 files.
+
+Readouts (ROI data plus per-frame metadata) are copied byte for byte from
+the source data blocks with large kernel-side copies
+(`os.copy_file_range`, falling back to `os.sendfile` and then to buffered
+reads), so only the 4100 byte header (xml location, frame count) and the
+frame count in the xml footer are rewritten. Calibration, metadata layout
+and experiment settings are taken from the (first) source file.
+
+Strided frame selections (every Nth frame), and readouts whose metadata
+has to be rewritten when concatenating, are copied through a buffer
+instead, a chunk of readouts per read and write. When concatenating, time
+stamps are rebased to the first file's origin (`absoluteTime`) and frame
+tracking numbers continue from the previous file.
+
+Example usage:
+>>> from read_spe import tools
+>>> tools.concatenate_files(['run-1.spe', 'run-2.spe'], 'run.spe')
+>>> tools.extract_frames('run.spe', 'every_10th.spe', step=10)
+>>> tools.split_file('run.spe', frames_per_file=1000)
+
+The same operations are available from the command line, e.g.
+`python -m read_spe.tools split run.spe --frames-per-file 1000`.
+-----
+"""
+
+#pylint: disable=consider-using-f-string
+
+import argparse
+import os
+import re
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from fractions import Fraction
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from .collection import SpeCollection
+from .read_spe import (FrameTrackingNumber, SpeReference, TimeStamp,
+    _metadata_dtypes)
+
+#size of the chunks used when no kernel-side copy is available
+_COPY_CHUNK_BYTES = 64 << 20
+_READOUT_COUNT = re.compile(rb'(<DataBlock\b[^>]*?\btype="Readout"[^>]*?>)')
+#ISO 8601 time stamp origin, split off its (up to 100 ns) fraction
+_ISO_TIME = re.compile(r'^(?P<base>[^.Z+]+(?:[+-]\d\d:\d\d)?)'
+    r'(?:\.(?P<fraction>\d+))?(?P<zone>Z|[+-]\d\d:\d\d)?$')
+
+def _copy_range(src_fd: int, dst_fd: int, offset: int, count: int) -> None:
+    """Appends `count` bytes from `offset` of `src_fd` at the current
+    position of `dst_fd`, without passing the data through Python where the
+    platform allows.
+    """
+    copiers = []
+    if hasattr(os, 'copy_file_range'):
+        copiers.append(lambda count, offset: os.copy_file_range(
+            src_fd, dst_fd, count, offset))
+    if hasattr(os, 'sendfile'):
+        copiers.append(lambda count, offset: os.sendfile(
+            dst_fd, src_fd, offset, count))
+    while count > 0:
+        copied = 0
+        while copiers and copied <= 0:
+            try:
+                copied = copiers[0](count, offset)
+            except OSError:
+                copied = 0
+            if copied <= 0:
+                #not supported for these files: not retried for the rest
+                copiers.pop(0)
+        if copied <= 0:
+            chunk = os.pread(src_fd, min(count, _COPY_CHUNK_BYTES), offset)\
+                if hasattr(os, 'pread') else _seek_read(src_fd, offset,
+                min(count, _COPY_CHUNK_BYTES))
+            if not chunk:
+                raise ValueError('Unexpected end of spe data block.')
+            copied = os.write(dst_fd, chunk)
+        offset += copied
+        count -= copied
+
+def _seek_read(fd: int, offset: int, count: int) -> bytes:
+    """`os.pread` fallback for platforms without it."""
+    os.lseek(fd, offset, os.SEEK_SET)
+    return os.read(fd, count)
+
+def _raw_footer(spe_ref: SpeReference) -> bytes:
+    """Xml footer of a spe v3 file, as stored in the file."""
+    with open(spe_ref.filepath, 'rb') as f:
+        f.seek(int(spe_ref.xml_loc))
+        return f.read()
+
+def _retarget_footer(footer: bytes, num_frames: int) -> bytes:
+    """Sets the readout count of the footer's DataFormat to `num_frames`."""
+    def set_count(match: re.Match) -> bytes:
+        return re.sub(rb'\bcount="\d+"', b'count="%d"'%(num_frames),
+                      match.group(1), count=1)
+    return _READOUT_COUNT.sub(set_count, footer, count=1)
+
+def _check_source(spe_ref: SpeReference) -> None:
+    """Raises ValueError for files that cannot be copied readout by
+    readout.
+    """
+    if spe_ref.spe_version < 3:
+        raise ValueError('%s is not a spe v3 file.'%(spe_ref.filepath))
+    if int(spe_ref.xml_loc) == 0:
+        raise ValueError('%s has no xml footer (still being written?).'
+                         %(spe_ref.filepath))
+
+def _origin_seconds(absolute_time: str, reference: str) -> Fraction:
+    """Seconds from the time stamp origin `reference` to `absolute_time`
+    (both ISO 8601, as in the `absoluteTime` of the xml footer), keeping
+    fractions below a microsecond.
+    """
+    parsed = []
+    for text in (absolute_time, reference):
+        match = _ISO_TIME.match(text.strip())
+        if match is None:
+            raise ValueError('Unrecognized time stamp origin %s.'%(text))
+        zone = match.group('zone') or ''
+        parsed.append((datetime.fromisoformat(match.group('base') +
+            ('+00:00' if zone == 'Z' else zone)),
+            Fraction(int(match.group('fraction') or 0),
+                     10**len(match.group('fraction') or ''))))
+    (moment, fraction), (reference_moment, reference_fraction) = parsed
+    delta = moment - reference_moment
+    return Fraction(delta.days*86400 + delta.seconds) +\
+        Fraction(delta.microseconds, 1000000) + fraction - reference_fraction
+
+def _metadata_offsets(template: SpeReference,
+                      sources: Sequence[SpeReference]) ->\
+    list[dict[str, int]]:
+    """Per source, the values to add to the raw metadata fields (as
+    stored in the file) so that time stamps count from the origin of the
+    first source and frame tracking numbers continue from the last frame
+    of the previous source. Sources without such metadata get no offsets.
+    """
+    raw_names = _metadata_dtypes(template.meta_list)[0].names or ()
+    offsets: list[dict[str, int]] = []
+    next_tracking_number = None
+    for idx_source, source in enumerate(sources):
+        source_offsets = {}
+        num_frames = int(source.num_frames)
+        for name, meta, first_meta in zip(raw_names, source.meta_list,
+                                          template.meta_list):
+            if isinstance(meta, TimeStamp) and idx_source > 0:
+                ticks = round(_origin_seconds(meta.absolute_time,
+                    first_meta.absolute_time) * int(meta.resolution))
+                if ticks != 0:
+                    source_offsets[name] = ticks
+            elif isinstance(meta, FrameTrackingNumber) and num_frames > 0:
+                tracking_numbers = source.get_frame_metadata_value(
+                    [0, num_frames-1])[name]# type: ignore
+                shift = 0 if next_tracking_number is None else\
+                    next_tracking_number - int(tracking_numbers[0])
+                if shift != 0:
+                    source_offsets[name] = shift
+                next_tracking_number = int(tracking_numbers[1]) + shift + 1
+        offsets.append(source_offsets)
+    return offsets
+
+def _read_exact(fd: int, buffer: np.ndarray, offset: int) -> None:
+    """Fills the contiguous uint8 `buffer` from `offset` of `fd`."""
+    flat = buffer.reshape(-1)
+    size = 0
+    while size < flat.size:
+        chunk = os.pread(fd, flat.size - size, offset + size)\
+            if hasattr(os, 'pread') else _seek_read(fd, offset + size,
+            flat.size - size)
+        if not chunk:
+            raise ValueError('Unexpected end of spe data block.')
+        flat[size:size+len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+        size += len(chunk)
+
+def _copy_readouts(src_fd: int, dst_fd: int, template: SpeReference,
+                   first_frame: int, count: int, step: int = 1,
+                   offsets: Optional[Mapping[str, int]] = None) -> None:
+    """Appends the `count` readouts `first_frame`, `first_frame + step`, ...
+    of `src_fd` at the current position of `dst_fd` through a buffer,
+    adding `offsets` to the named raw metadata fields of every readout.
+    Readouts closer together than `SpeReference.read_gap_bytes` are read
+    with one read per chunk (the readouts in between are discarded), others
+    with one read per readout; each chunk is written at once.
+    """
+    stride = int(template.readout_stride)
+    meta_start = int(template.frame_stride)
+    raw_dtype = _metadata_dtypes(template.meta_list)[0]
+    spanned = 0 < step and step * stride <= SpeReference.read_gap_bytes
+    chunk_frames = max(1, _COPY_CHUNK_BYTES //
+                       (step * stride if spanned else stride))
+    for idx in range(0, count, chunk_frames):
+        frames = min(chunk_frames, count - idx)
+        first = first_frame + idx * step
+        if spanned:
+            span = np.empty(((frames - 1) * step + 1, stride), dtype=np.uint8)
+            _read_exact(src_fd, span, 4100 + first * stride)
+            readouts = np.ascontiguousarray(span[::step])
+        else:
+            readouts = np.empty((frames, stride), dtype=np.uint8)
+            for row, frame in enumerate(range(first, first + frames * step,
+                                              step)):
+                _read_exact(src_fd, readouts[row], 4100 + frame * stride)
+        if offsets:
+            metadata = readouts[:, meta_start:meta_start+raw_dtype.itemsize]\
+                .view(raw_dtype)[:, 0]
+            for name, offset in offsets.items():
+                metadata[name] += offset
+        view = memoryview(readouts.reshape(-1))
+        while len(view) > 0:
+            view = view[os.write(dst_fd, view):]
+
+def _write_file(destination: str | os.PathLike, template: SpeReference,
+                runs: Sequence[tuple[SpeReference, int, int, int]],
+                metadata_offsets: Optional[Sequence[Mapping[str, int]]]
+                = None) -> int:
+    """Writes a new spe file with the header and footer of `template` and
+    the readout runs `(source, first_frame, frame_count, step)`, in order,
+    adding the raw metadata offsets (see `_metadata_offsets`) of each run,
+    if given. Returns the number of frames written.
+    """
+    stride = int(template.readout_stride)
+    num_frames = sum(count for _, _, count, _ in runs)
+    with open(template.filepath, 'rb') as f:
+        header = bytearray(f.read(4100))
+    footer = _retarget_footer(_raw_footer(template), num_frames)
+    xml_loc = 4100 + num_frames * stride
+    header[678:686] = np.array(xml_loc, dtype='<u8').tobytes()
+    header[1446:1450] = np.array(min(num_frames, 0x7FFFFFFF),
+                                 dtype='<i4').tobytes()
+    with open(destination, 'wb', buffering=0) as dst:
+        dst.write(header)
+        for idx_run, (source, first_frame, count, step) in enumerate(runs):
+            offsets = metadata_offsets[idx_run] if metadata_offsets\
+                else None
+            with open(source.filepath, 'rb', buffering=0) as src:
+                if offsets or step != 1:
+                    _copy_readouts(src.fileno(), dst.fileno(), template,
+                                   first_frame, count, step, offsets)
+                else:
+                    _copy_range(src.fileno(), dst.fileno(),
+                                4100 + first_frame * stride, count * stride)
+        dst.write(footer)
+    return num_frames
+
+def concatenate_files(sources: str | Sequence[str], destination: str) -> int:
+    """Concatenates spe v3 files with the same data layout into one file.
+
+    Time stamps of later files are rebased to the time stamp origin of the
+    first file, and frame tracking numbers are renumbered to continue from
+    the last frame of the previous file (gaps within a file are kept).
+    ----------------------------------------------------------------------
+    Inputs:
+    ----------------------------------------------------------------------
+    - `sources`: glob pattern or sequence of spe files (see
+    `read_spe.SpeCollection`).
+    - `destination`: path of the new spe file.
+    ----------------------------------------------------------------------
+    Output:
+    ----------------------------------------------------------------------
+    - number of frames written.
+    ----------------------------------------------------------------------
+    Exceptions:
+    ----------------------------------------------------------------------
+    - `ValueError` raised if the files differ in ROI geometry, pixel format
+    or metadata layout (including time stamp resolutions), or if a time
+    stamp origin cannot be parsed.
+    """
+    collection = SpeCollection(sources)
+    template = collection.references[0]
+    for ref in collection.references:
+        _check_source(ref)
+        if ref.readout_stride != template.readout_stride or\
+            len(ref.meta_list) != len(template.meta_list) or any(
+            type(meta) is not type(first_meta) or
+            meta.bit_depth != first_meta.bit_depth or
+            isinstance(meta, TimeStamp) and
+            meta.resolution != first_meta.resolution# type: ignore
+            for meta, first_meta in zip(ref.meta_list, template.meta_list)):
+            raise ValueError('%s does not have the same readout layout as'
+                ' %s.'%(ref.filepath, template.filepath))
+    return _write_file(destination, template,
+                       [(ref, 0, int(ref.num_frames), 1)
+                        for ref in collection.references],
+                       _metadata_offsets(template, collection.references))
+
+def extract_frames(source: str, destination: str, *, start: int = 0,
+                   stop: Optional[int] = None, step: int = 1) -> int:
+    """Writes the frames `range(start, stop, step)` of a spe v3 file to a
+    new file (e.g. a frame range, or every Nth frame). `stop` defaults to
+    the number of frames. Returns the number of frames written.
+    """
+    spe_ref = SpeReference(source, lazy=True)
+    _check_source(spe_ref)
+    if stop is None:
+        stop = int(spe_ref.num_frames)
+    frames = range(start, stop, step)
+    if len(frames) > 0:
+        spe_ref._check_frames(frames)# pylint: disable=protected-access
+    runs = [(spe_ref, frames.start, len(frames), frames.step)]\
+        if len(frames) > 0 else []
+    return _write_file(destination, spe_ref, runs)
+
+def split_file(source: str, frames_per_file: int, *,
+               destination_pattern: Optional[str] = None) -> list[str]:
+    """Splits a spe v3 file into files of at most `frames_per_file` frames.
+
+    `destination_pattern` is formatted with the (0-based) chunk index and
+    defaults to `<source stem>-{:04d}.spe` next to the source file. Returns
+    the paths of the files written.
+    """
+    if frames_per_file < 1:
+        raise ValueError('frames_per_file must be at least 1.')
+    spe_ref = SpeReference(source, lazy=True)
+    _check_source(spe_ref)
+    if destination_pattern is None:
+        source_path = Path(source)
+        destination_pattern = str(source_path.with_name(
+            source_path.stem + '-{:04d}' + source_path.suffix))
+    destinations = []
+    num_frames = int(spe_ref.num_frames)
+    for idx, first_frame in enumerate(range(0, num_frames, frames_per_file)):
+        destination = destination_pattern.format(idx)
+        _write_file(destination, spe_ref, [(spe_ref, first_frame,
+            min(frames_per_file, num_frames - first_frame), 1)])
+        destinations.append(destination)
+    return destinations
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """Command line interface of the module."""
+    parser = argparse.ArgumentParser(prog='python -m read_spe.tools',
+        description='Concatenate, subset or split spe v3 files.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    concat = commands.add_parser('concat', help='concatenate files')
+    concat.add_argument('destination')
+    concat.add_argument('sources', nargs='+',
+                        help='spe files, or one glob pattern')
+    extract = commands.add_parser('extract', help='extract frames')
+    extract.add_argument('source')
+    extract.add_argument('destination')
+    extract.add_argument('--start', type=int, default=0)
+    extract.add_argument('--stop', type=int, default=None)
+    extract.add_argument('--step', type=int, default=1)
+    split = commands.add_parser('split', help='split into chunks')
+    split.add_argument('source')
+    split.add_argument('--frames-per-file', type=int, required=True)
+    split.add_argument('--pattern', default=None,
+                       help='destination pattern, e.g. "out-{:04d}.spe"')
+    args = parser.parse_args(argv)
+    match args.command:
+        case 'concat':
+            sources = args.sources[0] if len(args.sources) == 1\
+                else args.sources
+            print('%d frames written to %s'%(
+                concatenate_files(sources, args.destination),
+                args.destination))
+        case 'extract':
+            print('%d frames written to %s'%(extract_frames(args.source,
+                args.destination, start=args.start, stop=args.stop,
+                step=args.step), args.destination))
+        case 'split':
+            for destination in split_file(args.source, args.frames_per_file,
+                destination_pattern=args.pattern):
+                print(destination)
+
+if __name__ == '__main__':
+    main()
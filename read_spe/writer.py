@@ -0,0 +1,325 @@
+"""Module for writing spe v3 files without LightField.
+
+`SpeWriter` writes the 4100 byte binary header, appends frames (all ROIs
+plus the per-frame metadata block of each readout) with large sequential
+writes, and emits the xml footer (DataFormat, MetaFormat, Calibrations
+and optionally a copied DataHistories block) on `close`. The resulting
+files can be read back with `SpeReference` (and LightField).
+
+Example usage to write processed frames with the layout of 'raw.spe':
+>>> from read_spe import SpeReference, SpeWriter
+>>> raw = SpeReference('raw.spe')
+>>> with SpeWriter.from_reference('processed.spe', raw) as writer:
+...     for frames, data in raw.iter_frames():
+...         writer.write_frames(data,
+...             metadata=raw.get_frame_metadata_value(frames))
+-----
+"""
+
+#pylint: disable=consider-using-f-string
+
+import xml.etree.ElementTree as ET
+from collections.abc import Sequence
+from typing import Optional
+import numpy as np
+from .read_spe import (FrameTrackingNumber, GateTracking, Metadata,
+    SpeReference, TimeStamp, _ROI, _metadata_dtypes, meta_type_dict)
+
+SPE_NAMESPACE = 'http://www.princetoninstruments.com/spe/2009'
+#legacy (spe 2.x) header datatype codes, written for compatibility
+_legacy_datatypes = {'MonochromeUnsigned16': 3, 'MonochromeUnsigned32': 8,
+                     'MonochromeFloating32': 0}
+
+class SpeWriter():
+    """Writes frames to a new spe v3 file.
+
+    Frames are appended with `write_frames`; the header frame count and the
+    xml footer are written by `close` (or on leaving a `with` block). Until
+    then the file has the layout of a file LightField is still acquiring, so
+    it can be followed with `read_spe.SpeFollower`.
+
+    --------------------------------------------------------------------------
+    Inputs (for constructor):
+    --------------------------------------------------------------------------
+    - `filepath`: path of the spe file to create (overwritten if it exists).
+    - `rois`: sequence with one element per ROI: either `(width, height)`
+    or an `_ROI` (e.g. from `SpeReference.roi_list`), which also carries the
+    sensor position and binning of the region.
+    - `pixel_format`: Optional named argument: key of
+    `SpeReference.dataTypes` (defaults to `MonochromeUnsigned16`).
+    - `meta_list`: Optional named argument: metadata stored with every
+    frame (e.g. `SpeReference.meta_list`).
+    - `wavelengths`: Optional named argument: wavelength calibration of the
+    full sensor width.
+    - `sensor_dims`: Optional named argument: (width, height) of the
+    sensor. Defaults to the extent of the ROIs.
+    - `data_histories`: Optional named argument: DataHistories xml element
+    (as text) to copy into the footer, so experiment settings carry over.
+    - `buffer_size`: Optional named argument: size of the write buffer, in
+    bytes.
+    --------------------------------------------------------------------------
+    Exceptions:
+    --------------------------------------------------------------------------
+    - `ValueError` raised if no ROIs are given or `pixel_format` is unknown.
+    """
+    def __init__(self, filepath: str, rois: Sequence[tuple[int, int] | _ROI],
+                 *, pixel_format: str = 'MonochromeUnsigned16',
+                 meta_list: Sequence[Metadata] = (),
+                 wavelengths: Optional[np.ndarray] = None,
+                 sensor_dims: Optional[tuple[int, int]] = None,
+                 data_histories: Optional[str] = None,
+                 buffer_size: int = 64 << 20):
+        if len(rois) == 0:
+            raise ValueError('At least one ROI is needed.')
+        if pixel_format not in SpeReference.dataTypes:
+            raise ValueError('Unknown pixel format %s.'%(pixel_format))
+        self._filepath = filepath
+        self._pixel_format = pixel_format
+        self._pixel_dtype = np.dtype(
+            SpeReference.dataTypes[pixel_format]).newbyteorder('<')
+        self._roi_list: list[_ROI] = []
+        for roi in rois:
+            if isinstance(roi, _ROI):
+                roi_copy = _ROI(int(roi.width), int(roi.height), 0)
+                roi_copy.x, roi_copy.y = int(roi.x), int(roi.y)
+                roi_copy.xbin, roi_copy.ybin = int(roi.xbin), int(roi.ybin)
+            else:
+                roi_copy = _ROI(int(roi[0]), int(roi[1]), 0)
+            roi_copy.stride = roi_copy.width * roi_copy.height *\
+                self._pixel_dtype.itemsize
+            self._roi_list.append(roi_copy)
+        self._meta_list = list(meta_list)
+        self._raw_meta_dtype, self._meta_dtype =\
+            _metadata_dtypes(self._meta_list)
+        self._frame_stride = sum(roi.stride for roi in self._roi_list)
+        self._readout_stride = self._frame_stride +\
+            self._raw_meta_dtype.itemsize
+        self._wavelengths = wavelengths
+        if sensor_dims is None:
+            sensor_dims = (max((roi.x + roi.width*roi.xbin)
+                               for roi in self._roi_list),
+                           max((roi.y + roi.height*roi.ybin)
+                               for roi in self._roi_list))
+        self._sensor_dims = sensor_dims
+        self._data_histories = data_histories
+        self._num_frames = 0
+        self._file = open(filepath, 'wb', buffering=buffer_size)#pylint: disable=consider-using-with
+        self._file.write(self._header(0, 0))
+
+    @classmethod
+    def from_reference(cls, filepath: str, spe_ref: SpeReference, *,
+                       copy_histories: bool = True,
+                       buffer_size: int = 64 << 20) -> 'SpeWriter':
+        """Creates a writer with the same layout (ROIs, pixel format,
+        metadata, calibration) as an existing spe v3 file. With
+        `copy_histories`, its DataHistories (experiment settings) are copied
+        to the new footer as well.
+        """
+        if spe_ref.spe_version < 3:
+            raise ValueError('Reference must be a spe v3 file.')
+        data_histories = None
+        if copy_histories:
+            footer = spe_ref.xml_footer
+            start = footer.find('<DataHistories')
+            end = footer.find('</DataHistories>')
+            if start >= 0 and end >= 0:
+                data_histories = footer[start:end+len('</DataHistories>')]
+        sensor_dims = None
+        if hasattr(spe_ref, '_sensor_dims'):
+            sensor_dims = (int(spe_ref.sensor_dims.width),
+                           int(spe_ref.sensor_dims.height))
+        wavelengths = spe_ref._full_wavelength_coverage#pylint: disable=protected-access
+        return cls(filepath, spe_ref.roi_list,
+                   pixel_format=str(spe_ref.pixel_format_key),
+                   meta_list=spe_ref.meta_list,
+                   wavelengths=wavelengths if len(wavelengths) else None,
+                   sensor_dims=sensor_dims, data_histories=data_histories,
+                   buffer_size=buffer_size)
+
+    def _header(self, num_frames: int, xml_loc: int) -> bytes:
+        """Builds the 4100 byte binary header. Besides the spe v3 fields,
+        the legacy fields (dimensions, datatype, frame count) are filled in
+        from the first ROI for older readers.
+        """
+        header = bytearray(4100)
+        def put(offset: int, dtype: str, value):
+            header[offset:offset+np.dtype(dtype).itemsize] =\
+                np.array(value, dtype=dtype).tobytes()
+        put(6, '<u2', min(self._sensor_dims[0], 0xFFFF))
+        put(18, '<u2', min(self._sensor_dims[1], 0xFFFF))
+        put(42, '<u2', min(self._roi_list[0].width, 0xFFFF))
+        put(108, '<i2', _legacy_datatypes[self._pixel_format])
+        put(656, '<u2', min(self._roi_list[0].height, 0xFFFF))
+        put(678, '<u8', xml_loc)
+        put(1446, '<i4', min(num_frames, 0x7FFFFFFF))
+        put(1992, '<f4', 3.0)
+        put(2996, '<i4', 0x01234567)
+        put(4098, '<i2', 0x5555)
+        return bytes(header)
+
+    def write_frames(self, data: Sequence[np.ndarray],
+                     metadata: Optional[np.ndarray] = None) -> None:
+        """Appends frames to the file.
+
+        ----------------------------------------------------------------------
+        Inputs:
+        ----------------------------------------------------------------------
+        - `data`: one array per ROI, of shape [Frames, Rows, Cols] (as from
+        `SpeReference.get_data`) or [Rows, Cols] for a single frame. Data is
+        converted to the writer's pixel format.
+        - `metadata`: Optional structured array with one record per frame,
+        as from `SpeReference.get_frame_metadata_value` (timestamps in ms).
+        If None, metadata is zero except for frame tracking numbers, which
+        count up from 1.
+        ----------------------------------------------------------------------
+        Exceptions:
+        ----------------------------------------------------------------------
+        - `ValueError` raised if the data does not match the ROIs or the
+        metadata does not match the frame count, or if the writer is closed.
+        """
+        if self._file.closed:
+            raise ValueError('SpeWriter is closed.')
+        if len(data) != len(self._roi_list):
+            raise ValueError('Expected data for %d ROI(s), got %d.'%(
+                len(self._roi_list), len(data)))
+        regions = []
+        for roi, region_data in zip(self._roi_list, data):
+            region_data = np.asarray(region_data)
+            if region_data.ndim == 2:
+                region_data = region_data[np.newaxis]
+            if region_data.shape[1:] != (roi.height, roi.width):
+                raise ValueError('ROI data of shape %s does not match the'
+                    ' ROI (%d rows, %d cols).'%(region_data.shape[1:],
+                    roi.height, roi.width))
+            regions.append(region_data)
+        num_frames = regions[0].shape[0]
+        if any(region.shape[0] != num_frames for region in regions):
+            raise ValueError('All ROIs need the same number of frames.')
+        if metadata is not None and len(metadata) != num_frames:
+            raise ValueError('Expected metadata for %d frame(s), got %d.'%(
+                num_frames, len(metadata)))
+        if num_frames == 0:
+            return
+        readouts = np.empty((num_frames, self._readout_stride),
+                            dtype=np.uint8)
+        offset = 0
+        for roi, region_data in zip(self._roi_list, regions):
+            readouts[:, offset:offset+roi.stride].view(
+                self._pixel_dtype).reshape(region_data.shape)[:] =\
+                region_data
+            offset += roi.stride
+        if self._meta_list:
+            readouts[:, offset:].view(self._raw_meta_dtype)[:, 0] =\
+                self._raw_metadata(metadata, num_frames)
+        self._file.write(readouts.data)
+        self._num_frames += num_frames
+
+    def _raw_metadata(self, metadata: Optional[np.ndarray],
+                      num_frames: int) -> np.ndarray:
+        """Converts columnar metadata (timestamps in ms) to the layout stored
+        in the file.
+        """
+        raw = np.zeros(num_frames, dtype=self._raw_meta_dtype)
+        for idx_meta, (name, meta) in enumerate(zip(
+            self._raw_meta_dtype.names, self._meta_list)):# type: ignore
+            if metadata is None:
+                if isinstance(meta, FrameTrackingNumber):
+                    raw[name] = np.arange(self._num_frames + 1,
+                        self._num_frames + num_frames + 1)
+                continue
+            values = metadata[metadata.dtype.names[idx_meta]]
+            if isinstance(meta, TimeStamp):
+                raw[name] = np.rint(np.asarray(values, dtype=np.float64) *
+                                    meta.resolution / 1000)
+            else:
+                raw[name] = values
+        return raw
+
+    def _footer(self) -> str:
+        """Builds the xml footer for the frames written so far."""
+        root = ET.Element('SpeFormat', {'xmlns': SPE_NAMESPACE,
+                                          'version': '3.0'})
+        data_format = ET.SubElement(root, 'DataFormat')
+        readout = ET.SubElement(data_format, 'DataBlock', {
+            'type': 'Readout', 'count': str(self._num_frames),
+            'pixelFormat': self._pixel_format,
+            'size': str(self._frame_stride),
+            'stride': str(self._readout_stride)})
+        for idx_roi, roi in enumerate(self._roi_list):
+            ET.SubElement(readout, 'DataBlock', {'type': 'Region',
+                'count': '1', 'pixelFormat': self._pixel_format,
+                'calibrations': '1,2,%d'%(idx_roi+3),
+                'size': str(roi.stride), 'stride': str(roi.stride),
+                'width': str(roi.width), 'height': str(roi.height)})
+        if self._meta_list:
+            meta_format = ET.SubElement(root, 'MetaFormat')
+            meta_block = ET.SubElement(meta_format, 'MetaBlock')
+            meta_types = {value: key for key, value in meta_type_dict.items()}
+            for meta in self._meta_list:
+                attributes = {'type': meta_types[meta.datatype],
+                              'bitDepth': str(int(meta.bit_depth))}
+                if isinstance(meta, TimeStamp):
+                    attributes['event'] = meta.meta_event
+                    attributes['resolution'] = str(int(meta.resolution))
+                    attributes['absoluteTime'] = meta.absolute_time
+                elif isinstance(meta, GateTracking):
+                    attributes['component'] = meta.meta_event
+                    attributes['monotonic'] = str(meta.monotonic).lower()
+                ET.SubElement(meta_block, type(meta).__name__,
+                              attributes)
+        calibrations = ET.SubElement(root, 'Calibrations')
+        if self._wavelengths is not None:
+            mapping = ET.SubElement(calibrations, 'WavelengthMapping',
+                                    {'id': '1'})
+            wavelength = ET.SubElement(mapping, 'Wavelength', {
+                '{http://www.w3.org/XML/1998/namespace}space': 'preserve'})
+            wavelength.text = ','.join(repr(float(value))
+                                       for value in self._wavelengths)
+        ET.SubElement(calibrations, 'SensorInformation', {'id': '2',
+            'width': str(self._sensor_dims[0]),
+            'height': str(self._sensor_dims[1])})
+        for idx_roi, roi in enumerate(self._roi_list):
+            ET.SubElement(calibrations, 'SensorMapping', {
+                'id': str(idx_roi+3), 'channelsIncluded': '1',
+                'x': str(roi.x), 'y': str(roi.y),
+                'width': str(roi.width*roi.xbin),
+                'height': str(roi.height*roi.ybin),
+                'xBinning': str(roi.xbin), 'yBinning': str(roi.ybin)})
+        footer = ET.tostring(root, encoding='unicode')
+        if self._data_histories:
+            footer = footer.replace('</SpeFormat>',
+                                    self._data_histories + '</SpeFormat>')
+        return '<?xml version="1.0" encoding="utf-8"?>' + footer
+
+    def close(self) -> None:
+        """Writes the xml footer, updates the header and closes the file.
+        Calling `close` more than once has no further effect.
+        """
+        if self._file.closed:
+            return
+        try:
+            xml_loc = self._file.tell()
+            self._file.write(self._footer().encode('utf8'))
+            self._file.seek(0)
+            self._file.write(self._header(self._num_frames, xml_loc))
+        finally:
+            self._file.close()
+
+    def __enter__(self) -> 'SpeWriter':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    @property
+    def filepath(self) -> str:
+        """Full file path"""
+        return self._filepath
+    @property
+    def num_frames(self) -> int:
+        """Number of frames written so far"""
+        return self._num_frames
+    @property
+    def readout_stride(self) -> int:
+        """Readout stride (ROI data and metadata), in bytes"""
+        return self._readout_stride
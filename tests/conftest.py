@@ -0,0 +1,178 @@
+"""Shared fixtures: synthetic spe v3 files (binary header, readouts and xml
+footer laid out as LightField writes them).
+"""
+
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytest
+from read_spe import FrameTrackingNumber, GateTracking, TimeStamp
+from read_spe.read_spe import meta_type_dict
+
+ORIGIN = '2020-01-01T00:00:00.0000000-05:00'
+WAVELENGTHS = np.linspace(500.0, 600.0, 100)
+DATA_HISTORIES = ('<DataHistories><DataHistory><Origin software="LightField">'
+    '<Experiment><Devices><Cameras><Camera><ShutterTiming><ExposureTime>50'
+    '</ExposureTime></ShutterTiming><Adc><Speed>2</Speed><AnalogGain>Medium'
+    '</AnalogGain><BitDepth>16</BitDepth></Adc><Sensor><Temperature>'
+    '<Reading>-70</Reading></Temperature></Sensor></Camera></Cameras>'
+    '</Devices><System><Cameras><Camera model="PIXIS: 100B"'
+    ' serialNumber="123456"/></Cameras></System></Experiment></Origin>'
+    '</DataHistory></DataHistories>')
+PIXEL_DTYPES = {'MonochromeUnsigned16': np.uint16,
+                'MonochromeUnsigned32': np.uint32,
+                'MonochromeFloating32': np.float32}
+#raw metadata stored after each readout, and its columnar form (ms)
+RAW_METADATA_DTYPE = np.dtype([('ExposureStarted', '<i8'),
+    ('ExposureEnded', '<i8'), ('Frame Tracking Number', '<i8'),
+    ('Delay', '<f8')])
+METADATA_DTYPE = np.dtype([('ExposureStarted', '<f8'),
+    ('ExposureEnded', '<f8'), ('Frame Tracking Number', '<i8'),
+    ('Delay', '<f8')])
+
+def make_meta_list(origin: str = ORIGIN) -> tuple:
+    """Time stamps, frame tracking number and gate delay metadata."""
+    return (TimeStamp('ExposureStarted', 'Int64', np.uint64(64),
+                      np.uint64(1000000), origin),
+            TimeStamp('ExposureEnded', 'Int64', np.uint64(64),
+                      np.uint64(1000000), origin),
+            FrameTrackingNumber('Int64', np.uint64(64)),
+            GateTracking('Delay', 'Double', np.uint64(64), True))
+
+def make_metadata(num_frames: int, first_frame: int = 0) -> np.ndarray:
+    """Columnar metadata (time stamps in ms) for `make_meta_list`."""
+    metadata = np.zeros(num_frames, dtype=METADATA_DTYPE)
+    frames = np.arange(first_frame, first_frame + num_frames)
+    metadata['ExposureStarted'] = frames * 100.0 + 0.5
+    metadata['ExposureEnded'] = frames * 100.0 + 50.0
+    metadata['Frame Tracking Number'] = frames + 1
+    metadata['Delay'] = frames * 0.25 + 10.0
+    return metadata
+
+def spe_header(num_frames: int, xml_loc: int) -> bytes:
+    """4100 byte spe v3 header with the frame count and footer offset."""
+    header = bytearray(4100)
+    header[678:686] = np.array(xml_loc, dtype='<u8').tobytes()
+    header[1446:1450] = np.array(num_frames, dtype='<i4').tobytes()
+    header[1992:1996] = np.array(3.0, dtype='<f4').tobytes()
+    return bytes(header)
+
+def raw_metadata(metadata: np.ndarray) -> np.ndarray:
+    """Columnar metadata of `make_meta_list` as stored after each readout
+    (time stamps in ticks).
+    """
+    raw = np.zeros(len(metadata), dtype=RAW_METADATA_DTYPE)
+    for name in ('ExposureStarted', 'ExposureEnded'):
+        raw[name] = np.rint(metadata[name] * 1000)
+    for name in ('Frame Tracking Number', 'Delay'):
+        raw[name] = metadata[name]
+    return raw
+
+def spe_readouts(data, raw=None) -> bytes:
+    """Readouts of all ROIs (`[frames, rows, cols]` each), followed by the
+    raw metadata record of each frame if given.
+    """
+    blocks = [region.reshape(len(region), np.prod(region.shape[1:],
+                             dtype=int)).view(np.uint8) for region in data]
+    if raw is not None:
+        blocks.append(raw.view(np.uint8).reshape(len(raw), -1))
+    return np.concatenate(blocks, axis=1).tobytes()
+
+def spe_footer(rois, num_frames: int, pixel_format: str, *,
+               meta_list=(), wavelengths=None, sensor_dims=(100, 50),
+               data_histories=None) -> bytes:
+    """Xml footer (DataFormat, MetaFormat, Calibrations and optionally
+    DataHistories) for ROIs given as `(width, height)`, optionally followed
+    by `(x, y, xbin, ybin)`. Metadata is 64 bits per entry.
+    """
+    rois = [(tuple(roi) + (0, 0, 1, 1))[:6] for roi in rois]
+    itemsize = np.dtype(PIXEL_DTYPES[pixel_format]).itemsize
+    strides = [roi[0] * roi[1] * itemsize for roi in rois]
+    frame_stride = sum(strides)
+    readout_stride = frame_stride + 8 * len(meta_list)
+    root = ET.Element('SpeFormat', {
+        'xmlns': 'http://www.princetoninstruments.com/spe/2009',
+        'version': '3.0'})
+    data_format = ET.SubElement(root, 'DataFormat')
+    readout = ET.SubElement(data_format, 'DataBlock', {'type': 'Readout',
+        'count': str(num_frames), 'pixelFormat': pixel_format,
+        'size': str(frame_stride), 'stride': str(readout_stride)})
+    for (width, height, *_), stride in zip(rois, strides):
+        ET.SubElement(readout, 'DataBlock', {'type': 'Region',
+            'count': '1', 'pixelFormat': pixel_format, 'size': str(stride),
+            'stride': str(stride), 'width': str(width),
+            'height': str(height)})
+    if meta_list:
+        meta_block = ET.SubElement(ET.SubElement(root, 'MetaFormat'),
+                                   'MetaBlock')
+        meta_types = {value: key for key, value in meta_type_dict.items()}
+        for meta in meta_list:
+            attributes = {'type': meta_types[meta.datatype],
+                          'bitDepth': '64'}
+            if isinstance(meta, TimeStamp):
+                attributes.update(event=meta.meta_event,
+                    resolution=str(int(meta.resolution)),
+                    absoluteTime=meta.absolute_time)
+            elif isinstance(meta, GateTracking):
+                attributes.update(component=meta.meta_event,
+                                  monotonic=str(meta.monotonic).lower())
+            ET.SubElement(meta_block, type(meta).__name__, attributes)
+    calibrations = ET.SubElement(root, 'Calibrations')
+    if wavelengths is not None:
+        mapping = ET.SubElement(calibrations, 'WavelengthMapping',
+                                {'id': '1'})
+        ET.SubElement(mapping, 'Wavelength').text = ','.join(
+            repr(float(value)) for value in wavelengths)
+    ET.SubElement(calibrations, 'SensorInformation', {'id': '2',
+        'width': str(sensor_dims[0]), 'height': str(sensor_dims[1])})
+    for idx_roi, (width, height, x, y, xbin, ybin) in enumerate(rois):
+        ET.SubElement(calibrations, 'SensorMapping', {
+            'id': str(idx_roi+3), 'x': str(x), 'y': str(y),
+            'width': str(width*xbin), 'height': str(height*ybin),
+            'xBinning': str(xbin), 'yBinning': str(ybin)})
+    footer = ET.tostring(root, encoding='unicode')
+    if data_histories:
+        footer = footer.replace('</SpeFormat>',
+                                data_histories + '</SpeFormat>')
+    return ('<?xml version="1.0" encoding="utf-8"?>' + footer).encode()
+
+def write_spe(path, data, *, rois, pixel_format: str = 'MonochromeUnsigned16',
+              meta_list=(), metadata=None, wavelengths=WAVELENGTHS,
+              data_histories=DATA_HISTORIES) -> None:
+    """Writes a complete spe v3 file with the given ROI data. `metadata`
+    (columnar, see `make_metadata`) is for the metadata of
+    `make_meta_list`; any other `meta_list` is stored as zeros.
+    """
+    num_frames = len(data[0])
+    raw = None
+    if metadata is not None:
+        raw = raw_metadata(metadata)
+    elif meta_list:
+        raw = np.zeros((num_frames, len(meta_list)), dtype='<i8')
+    readouts = spe_readouts(data, raw)
+    with open(path, 'wb') as f:
+        f.write(spe_header(num_frames, 4100 + len(readouts)))
+        f.write(readouts)
+        f.write(spe_footer(rois, num_frames, pixel_format,
+            meta_list=meta_list, wavelengths=wavelengths,
+            data_histories=data_histories))
+
+@pytest.fixture
+def make_spe(tmp_path):
+    """Factory writing a spe v3 file; returns `(path, data, metadata)` with
+    the per-ROI `[frames, rows, cols]` data and the columnar metadata.
+    """
+    def make(name: str = 'test.spe', *, num_frames: int = 12,
+             rois=((40, 8), (16, 1)),
+             pixel_format: str = 'MonochromeUnsigned16', meta: bool = True,
+             origin: str = ORIGIN, first_frame: int = 0, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        dtype = PIXEL_DTYPES[pixel_format]
+        data = [rng.integers(0, 60000, (num_frames, height, width))
+                .astype(dtype) for width, height in rois]
+        metadata = make_metadata(num_frames, first_frame)
+        path = tmp_path / name
+        write_spe(path, data, rois=rois, pixel_format=pixel_format,
+                  meta_list=make_meta_list(origin) if meta else (),
+                  metadata=metadata if meta else None)
+        return path, data, metadata
+    return make
@@ -0,0 +1,75 @@
+"""Reading several spe files as one data set with `SpeCollection`."""
+
+import numpy as np
+import pytest
+from read_spe import FrameTrackingNumber, GateTracking, SpeCollection
+from conftest import write_spe
+
+def test_collection(make_spe, tmp_path):
+    members = [make_spe('run-%d.spe'%(idx), num_frames=num_frames,
+                        first_frame=first_frame, seed=idx)
+               for idx, (num_frames, first_frame)
+               in enumerate(((5, 0), (3, 5), (4, 8)), start=1)]
+    with SpeCollection(str(tmp_path / 'run-*.spe'), workers=2) as collection:
+        assert collection.num_frames == 12
+        np.testing.assert_array_equal(collection.frame_offsets,
+                                      [0, 5, 8, 12])
+        file_index, local_frames = collection.locate_frames([0, 5, 11])
+        np.testing.assert_array_equal(file_index, [0, 1, 2])
+        np.testing.assert_array_equal(local_frames, [0, 0, 3])
+        frames = [11, 0, 6, 4, 6]
+        data = collection.get_data(frames=frames)
+        for idx_roi, region_data in enumerate(data):
+            expected = np.concatenate([member[1][idx_roi]
+                                       for member in members])
+            np.testing.assert_array_equal(region_data, expected[frames])
+        np.testing.assert_array_equal(
+            collection.get_frame_metadata_value(frames)
+            ['Frame Tracking Number'], np.asarray(frames) + 1)
+        with pytest.raises(ValueError):
+            collection.get_data(frames=[12])
+
+@pytest.mark.parametrize('read_ahead', [False, True])
+def test_collection_iter_frames(make_spe, tmp_path, read_ahead):
+    members = [make_spe('run-%d.spe'%(idx), num_frames=num_frames, seed=idx)
+               for idx, num_frames in enumerate((5, 4), start=1)]
+    expected = np.concatenate([member[1][1] for member in members])
+    with SpeCollection(str(tmp_path / 'run-*.spe')) as collection:
+        batches = list(collection.iter_frames(rois=[1], batch_size=2,
+            start=1, step=2, read_ahead=read_ahead))
+        assert [batch for batch, _ in batches] ==\
+            [range(1, 5, 2), range(5, 9, 2)]
+        for batch, data in batches:
+            np.testing.assert_array_equal(data[0], expected[batch])
+        with pytest.raises(ValueError):
+            next(collection.iter_frames(stop=10))
+        with pytest.raises(ValueError):
+            next(collection.iter_frames(batch_size=0))
+
+def test_collection_rejects_different_layouts(make_spe, tmp_path):
+    make_spe('a.spe')
+    make_spe('b.spe', rois=((40, 8),))
+    with pytest.raises(ValueError):
+        SpeCollection(str(tmp_path / '*.spe'))
+    with pytest.raises(ValueError):
+        SpeCollection(str(tmp_path / 'missing-*.spe'))
+
+def _write_member(path, roi, meta_list=()):
+    write_spe(path, [np.zeros((2, 1, 8), dtype=np.uint16)], rois=[roi],
+              meta_list=meta_list)
+
+@pytest.mark.parametrize('roi', [(8, 1, 8, 0, 1, 1), (8, 1, 0, 1, 1, 1),
+                                 (8, 1, 0, 0, 2, 1), (8, 1, 0, 0, 1, 4)])
+def test_collection_rejects_different_rois(tmp_path, roi):
+    _write_member(tmp_path / 'a.spe', (8, 1))
+    _write_member(tmp_path / 'b.spe', roi)
+    with pytest.raises(ValueError, match='ROI geometry'):
+        SpeCollection(str(tmp_path / '*.spe'))
+
+def test_collection_rejects_different_metadata(tmp_path):
+    _write_member(tmp_path / 'a.spe', (8, 1),
+                  (FrameTrackingNumber('Int64', np.uint64(64)),))
+    _write_member(tmp_path / 'b.spe', (8, 1),
+                  (GateTracking('Delay', 'Int64', np.uint64(64), True),))
+    with pytest.raises(ValueError, match='metadata layout'):
+        SpeCollection(str(tmp_path / '*.spe'))
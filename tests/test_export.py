@@ -0,0 +1,98 @@
+"""Exporting spe files to HDF5 and Parquet."""
+
+import numpy as np
+import pytest
+from read_spe import SpeReference
+from conftest import WAVELENGTHS, write_spe
+
+@pytest.mark.parametrize('compression', [None, 'gzip'])
+def test_hdf5_round_trip(make_spe, tmp_path, compression):
+    pytest.importorskip('h5py')
+    from read_spe.hdf5 import Hdf5Reference, export_hdf5
+    path, data, metadata = make_spe()
+    destination = export_hdf5(SpeReference(str(path)),
+                              tmp_path / 'archive.h5', compression=compression,
+                              frames_per_chunk=4)
+    with Hdf5Reference(destination) as archive:
+        assert archive.num_frames == 12
+        frames = [9, 1, 2, 3, 1]
+        for region_data, expected in zip(archive.get_data(frames=frames),
+                                         data):
+            np.testing.assert_array_equal(region_data, expected[frames])
+        np.testing.assert_allclose(archive.get_wavelengths()[0],
+                                   WAVELENGTHS[:40])
+        np.testing.assert_allclose(
+            archive.get_frame_metadata_value(frames)['ExposureStarted'],
+            metadata['ExposureStarted'][frames])
+        assert [type(meta) for meta in archive.meta_list] ==\
+            [type(meta) for meta in SpeReference(str(path)).meta_list]
+        for batch, region_data in archive.iter_frames(rois=[1],
+                                                      batch_size=5, start=1):
+            np.testing.assert_array_equal(region_data[0], data[1][batch])
+        np.testing.assert_allclose(archive.get_wavelengths(rois=[1],
+            xbin=4)[0], WAVELENGTHS[:16].reshape(4, 4).mean(axis=1))
+
+def test_hdf5_settings(make_spe):
+    pytest.importorskip('h5py')
+    from read_spe.hdf5 import Hdf5Reference, export_hdf5
+    spe_ref = SpeReference(str(make_spe()[0]))
+    with Hdf5Reference(export_hdf5(spe_ref)) as archive:
+        assert dict(archive.settings_index) == dict(spe_ref.settings_index)
+        assert archive.get_setting('EXPOSURE_TIME') == '50'
+        assert archive.get_setting('Cameras/Camera/Adc/Speed') == '2'
+
+def test_hdf5_unsupported_options(make_spe, tmp_path):
+    pytest.importorskip('h5py')
+    from read_spe.hdf5 import Hdf5Reference, export_hdf5
+    destination = export_hdf5(SpeReference(str(make_spe()[0])),
+                              tmp_path / 'archive.h5')
+    with Hdf5Reference(destination) as archive:
+        with pytest.raises(ValueError, match='xbin'):
+            archive.get_data(xbin=2)
+        with pytest.raises(ValueError, match='wavelength_range'):
+            next(archive.iter_frames(wavelength_range=(500.0, 510.0)))
+
+@pytest.mark.parametrize('layout', ['wide', 'long'])
+def test_export_parquet(make_spe, tmp_path, layout):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from read_spe.columnar import export_parquet
+    path, data, metadata = make_spe()
+    destination = export_parquet(SpeReference(str(path)),
+                                 tmp_path / 'spectra.parquet', roi=1,
+                                 layout=layout, batch_size=5)
+    table = pq.read_table(destination)
+    assert table.schema.metadata[b'roi'] == b'1'
+    spectra = data[1][:, 0, :]
+    if layout == 'wide':
+        assert table.num_rows == 12
+        np.testing.assert_array_equal(table['%.4f'%(WAVELENGTHS[3])],
+                                      spectra[:, 3])
+        np.testing.assert_allclose(table['Delay'], metadata['Delay'])
+    else:
+        assert table.num_rows == 12 * 16
+        np.testing.assert_array_equal(table['intensity'],
+                                      spectra.reshape(-1))
+        np.testing.assert_array_equal(table['frame'],
+                                      np.repeat(np.arange(12), 16))
+        np.testing.assert_allclose(table['wavelength'],
+                                   np.tile(WAVELENGTHS[:16], 12))
+
+def test_export_parquet_needs_spectra(make_spe):
+    pytest.importorskip('pyarrow')
+    from read_spe.columnar import export_parquet
+    spe_ref = SpeReference(str(make_spe()[0]))
+    with pytest.raises(ValueError):
+        export_parquet(spe_ref, roi=0)
+
+def test_export_parquet_needs_unique_wavelengths(tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    from read_spe import export_parquet
+    path = tmp_path / 'flat.spe'
+    write_spe(path, [np.ones((2, 1, 16), dtype=np.uint16)], rois=[(16, 1)],
+              wavelengths=np.full(16, 500.0))
+    spe_ref = SpeReference(str(path))
+    with pytest.raises(ValueError):
+        export_parquet(spe_ref, tmp_path / 'wide.parquet')
+    table = pq.read_table(export_parquet(spe_ref, tmp_path / 'long.parquet',
+                                         layout='long'))
+    np.testing.assert_array_equal(table['wavelength'], 500.0)
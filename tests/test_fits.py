@@ -0,0 +1,69 @@
+"""Fits export round trips."""
+
+import numpy as np
+import pytest
+from read_spe import Fits, SpeReference
+
+fits = pytest.importorskip('astropy.io.fits')
+
+@pytest.mark.parametrize('pixel_format', ['MonochromeUnsigned16',
+                                          'MonochromeFloating32'])
+def test_generate_fits_file(make_spe, pixel_format):
+    path, data, _ = make_spe(pixel_format=pixel_format)
+    paths = Fits.generate_fits_file(SpeReference(str(path)), batch_size=5)
+    assert len(paths) == len(data)
+    for output_path, region_data in zip(paths, data):
+        with fits.open(output_path) as hdul:
+            np.testing.assert_array_equal(hdul[0].data, region_data)
+            assert hdul[0].header['EXPOSURE_TIME'] == 50
+
+def test_generate_fits_file_overwrites(make_spe, tmp_path, monkeypatch):
+    path, data, _ = make_spe()
+    monkeypatch.chdir(tmp_path.parent)
+    for _ in range(2):
+        paths = Fits.generate_fits_file(SpeReference(str(path)))
+    with fits.open(paths[0]) as hdul:
+        assert len(hdul) == 1
+        np.testing.assert_array_equal(hdul[0].data, data[0])
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_generate_fits_files(make_spe, workers):
+    path, data, metadata = make_spe(num_frames=5)
+    progress = []
+    paths = Fits.generate_fits_files(SpeReference(str(path)),
+        workers=workers, frames_per_task=2, progress=lambda done, total:
+        progress.append((done, total)))
+    assert len(paths) == 10 and all(path.is_file() for path in paths)
+    #one callback per task (frames (0, 1), (2, 3), (4,) of each ROI), in
+    #completion order
+    assert len(progress) == 6 and progress[-1] == (10, 10)
+    assert all(total == 10 for _, total in progress)
+    assert np.all(np.diff([done for done, _ in progress]) > 0)
+    assert paths[6].name == 'test-ROI002-Frame0002.fits'
+    for idx_path, output_path in enumerate(paths):
+        with fits.open(output_path) as hdul:
+            np.testing.assert_array_equal(hdul[0].data,
+                                          data[idx_path // 5][idx_path % 5])
+    with fits.open(paths[6]) as hdul:
+        assert hdul[0].header['FRAME_EXPOSURE_STARTED_OFFSET_MS'] ==\
+            metadata['ExposureStarted'][1]
+
+@pytest.mark.parametrize('compression', [None, 'RICE_1'])
+def test_generate_mef_file(make_spe, compression):
+    path, data, metadata = make_spe()
+    spe_ref = SpeReference(str(path))
+    output_path = Fits.generate_mef_file(spe_ref, compression=compression,
+                                         batch_size=5)
+    with fits.open(output_path) as hdul:
+        for idx_roi, region_data in enumerate(data):
+            hdu = hdul['ROI%03d'%(idx_roi+1)]
+            assert isinstance(hdu, fits.CompImageHDU) ==\
+                (compression is not None)
+            np.testing.assert_array_equal(hdu.data, region_data)
+        table = hdul['FRAMES'].data
+        np.testing.assert_allclose(table['ExposureStarted'],
+                                   metadata['ExposureStarted'])
+        np.testing.assert_array_equal(table['Frame_Tracking_Number'],
+                                      metadata['Frame Tracking Number'])
+        np.testing.assert_allclose(hdul['WAVELENGTHS'].data['ROI001'][0],
+                                   spe_ref.get_wavelengths()[0])
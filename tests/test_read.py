@@ -0,0 +1,341 @@
+"""Reading synthetic spe v3 files back through `SpeReference`."""
+
+import time
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytest
+from read_spe import GateTracking, SpeFollower, SpeReference
+from read_spe.read_spe import _plan_reads
+from conftest import (PIXEL_DTYPES, WAVELENGTHS, spe_header, spe_readouts,
+    write_spe)
+
+@pytest.mark.parametrize('pixel_format', sorted(PIXEL_DTYPES))
+def test_round_trip(make_spe, pixel_format):
+    path, data, metadata = make_spe(pixel_format=pixel_format)
+    spe_ref = SpeReference(str(path))
+    assert spe_ref.num_frames == 12
+    assert [(int(roi.width), int(roi.height)) for roi in spe_ref.roi_list]\
+        == [(40, 8), (16, 1)]
+    for region_data, expected in zip(spe_ref.get_data(), data):
+        assert region_data.dtype == PIXEL_DTYPES[pixel_format]
+        np.testing.assert_array_equal(region_data, expected)
+    np.testing.assert_allclose(spe_ref.get_wavelengths()[0],
+                               WAVELENGTHS[:40])
+    values = spe_ref.get_frame_metadata_value(range(12))
+    assert values.dtype == metadata.dtype
+    for name in metadata.dtype.names:
+        np.testing.assert_allclose(values[name], metadata[name])
+
+@pytest.mark.parametrize('kwargs', [{}, {'workers': 3}, {'read_gap': 0},
+                                    {'mmap': True}])
+def test_frame_selection(make_spe, kwargs):
+    path, data = make_spe()[:2]
+    spe_ref = SpeReference(str(path))
+    frames = [7, 2, 3, 11, 2, 0]
+    for region_data, expected in zip(spe_ref.get_data(frames=frames,
+                                                      **kwargs), data):
+        np.testing.assert_array_equal(region_data, expected[frames])
+    with pytest.raises(ValueError):
+        spe_ref.get_data(frames=[12], **kwargs)
+
+def test_frame_metadata_values(make_spe):
+    path, _, metadata = make_spe()
+    spe_ref = SpeReference(str(path))
+    values = spe_ref.get_frame_metadata_value([5, 1])
+    np.testing.assert_allclose(values['ExposureEnded'],
+                               metadata['ExposureEnded'][[5, 1]])
+    assert values[0][2] == metadata['Frame Tracking Number'][5]
+    np.testing.assert_allclose(spe_ref.frame_metadata_values['Delay'],
+                               metadata['Delay'])
+    assert not SpeReference(str(make_spe('plain.spe', meta=False)[0]))\
+        .meta_list
+
+@pytest.mark.parametrize('monotonic', [True, False])
+def test_gate_tracking_monotonic(tmp_path, monotonic):
+    path = tmp_path / 'gated.spe'
+    write_spe(path, [np.zeros((2, 1, 4), dtype=np.uint16)], rois=[(4, 1)],
+              meta_list=[GateTracking('Delay', 'Double', np.uint64(64),
+                                      monotonic)])
+    assert b'monotonic="%s"'%(str(monotonic).lower().encode())\
+        in path.read_bytes()
+    for kwargs in ({}, {'lazy': True}):
+        spe_ref = SpeReference(str(path), **kwargs)
+        assert spe_ref.meta_list[0].monotonic is monotonic
+
+def test_dtype_and_out(make_spe):
+    path, data = make_spe()[:2]
+    spe_ref = SpeReference(str(path))
+    converted = spe_ref.get_data(rois=[1], dtype=np.float64)[0]
+    assert converted.dtype == np.float64
+    np.testing.assert_array_equal(converted, data[1])
+    out = [np.zeros((3, 8, 40), dtype=np.int32)]
+    assert spe_ref.get_data(rois=[0], frames=[4, 0, 9], out=out)[0]\
+        is out[0]
+    np.testing.assert_array_equal(out[0], data[0][[4, 0, 9]])
+    with pytest.raises(ValueError):
+        spe_ref.get_data(rois=[0], frames=[4, 0], out=out)
+    with pytest.raises(ValueError):
+        spe_ref.get_data(mmap=True, dtype=np.float64)
+
+def test_plan_reads():
+    #frames 0-2 are adjacent, 5 is within the gap, 40 is not
+    plan = _plan_reads([40, 2, 0, 5, 1], 100, 200, 1 << 20)
+    assert [(first, count) for first, count, _, _ in plan] ==\
+        [(0, 6), (40, 1)]
+    np.testing.assert_array_equal(plan[0][2], [2, 4, 1, 3])
+    np.testing.assert_array_equal(plan[0][3], [0, 1, 2, 5])
+    #no read spans more than max_bytes
+    plan = _plan_reads(range(10), 100, 0, 300)
+    assert [(first, count) for first, count, _, _ in plan] ==\
+        [(0, 3), (3, 3), (6, 3), (9, 1)]
+    assert _plan_reads([], 100, 0, 300) == []
+
+def test_as_memmap(make_spe):
+    path, data = make_spe()[:2]
+    spe_ref = SpeReference(str(path))
+    views = spe_ref.as_memmap(rois=[1])
+    assert not views[0].flags.writeable
+    np.testing.assert_array_equal(views[0], data[1])
+    region = spe_ref.get_data(mmap=True, frames=range(2, 6))[0]
+    assert not region.flags.owndata
+    np.testing.assert_array_equal(region, data[0][2:6])
+
+def test_hyperslab_and_binning(make_spe):
+    path, data = make_spe()[:2]
+    spe_ref = SpeReference(str(path))
+    region = spe_ref.get_data(rois=[0], frames=[1, 4], rows=slice(2, 7),
+                              cols=slice(None, None, 3))[0]
+    np.testing.assert_array_equal(region, data[0][[1, 4], 2:7, ::3])
+    binned = spe_ref.get_data(rois=[0], xbin=4, ybin=3)[0]
+    expected = data[0][:, :6, :].astype(np.int64).reshape(
+        12, 2, 3, 10, 4).sum(axis=(2, 4))
+    np.testing.assert_array_equal(binned, expected)
+    spectra = spe_ref.get_data(full_vertical=True, bin_mode='mean')
+    np.testing.assert_allclose(spectra[0][:, 0], data[0].mean(axis=1))
+    np.testing.assert_allclose(spectra[1], data[1])
+    with pytest.raises(ValueError):
+        spe_ref.get_data(rows=[slice(1, 2)])
+
+def test_wavelength_selection(make_spe):
+    path, data = make_spe()[:2]
+    spe_ref = SpeReference(str(path))
+    columns = np.flatnonzero((WAVELENGTHS[:40] >= 505.0) &
+                             (WAVELENGTHS[:40] <= 510.0))
+    region = spe_ref.get_data(rois=[0], wavelength_range=(505.0, 510.0))[0]
+    np.testing.assert_array_equal(region, data[0][:, :, columns])
+    traces = spe_ref.get_data(rois=[1], wavelengths=[501.0, 510.0])[0]
+    np.testing.assert_array_equal(traces, data[1][:, :, [1, 10]])
+
+@pytest.mark.parametrize('read_ahead', [False, True])
+def test_iter_frames(make_spe, read_ahead):
+    path, data = make_spe()[:2]
+    spe_ref = SpeReference(str(path))
+    batches = list(spe_ref.iter_frames(batch_size=5, start=1, step=2,
+                                       read_ahead=read_ahead))
+    assert [batch for batch, _ in batches] == [range(1, 11, 2),
+                                               range(11, 13, 2)]
+    for idx_roi, expected in enumerate(data):
+        np.testing.assert_array_equal(np.concatenate(
+            [region[idx_roi] for _, region in batches]), expected[1::2])
+
+def test_prefetch(make_spe):
+    path, data = make_spe()[:2]
+    spe_ref = SpeReference(str(path), frame_cache_bytes=1 << 20,
+                           prefetch_frames=4)
+    spe_ref.get_data(rois=[0], frames=[0])
+    spe_ref.get_data(rois=[0], frames=[1])
+    deadline = time.monotonic() + 5
+    while not spe_ref.frame_cache.peek((0, 5)) and\
+        time.monotonic() < deadline:
+        time.sleep(0.01)
+    misses = spe_ref.frame_cache.misses
+    np.testing.assert_array_equal(
+        spe_ref.get_data(rois=[0], frames=[2, 3, 4, 5])[0], data[0][2:6])
+    assert spe_ref.frame_cache.misses == misses
+    spe_ref.close()
+    with pytest.raises(ValueError):
+        SpeReference(str(path), prefetch_frames=4)
+
+def test_index_cache(make_spe, tmp_path):
+    path, data, metadata = make_spe()
+    cache_dir = tmp_path / 'index'
+    cache_dir.mkdir()
+    first = SpeReference(str(path), cache=True, cache_dir=str(cache_dir))
+    assert list(cache_dir.iterdir())
+    cached = SpeReference(str(path), cache=True, cache_dir=str(cache_dir))
+    assert cached.get_setting('EXPOSURE_TIME') == '50'
+    assert list(cached.roi_list) == list(first.roi_list)
+    np.testing.assert_array_equal(cached.get_data()[1], data[1])
+    np.testing.assert_allclose(cached.frame_metadata_values['Delay'],
+                               metadata['Delay'])
+    #the footer text is not part of the index; it is read on demand
+    with np.load(next(cache_dir.iterdir())) as index:
+        assert 'xml_footer' not in index.files
+    assert cached.xml_footer == first.xml_footer
+
+def test_zero_frame_file(tmp_path):
+    path = tmp_path / 'empty.spe'
+    write_spe(path, [np.zeros((0, 3, 4), dtype=np.uint16),
+                     np.zeros((0, 1, 2), dtype=np.uint16)],
+              rois=[(4, 3), (2, 1)])
+    for kwargs in ({}, {'lazy': True}, {'frame_cache_bytes': 1 << 20}):
+        spe_ref = SpeReference(str(path), **kwargs)
+        assert spe_ref.num_frames == 0
+        for read_kwargs in ({}, {'mmap': True}, {'frames': []},
+                            {'workers': 4}, {'full_vertical': True}):
+            shapes = [region.shape
+                      for region in spe_ref.get_data(**read_kwargs)]
+            assert shapes[1] == (0, 1, 2)
+        assert [region.shape for region in spe_ref.as_memmap()] ==\
+            [(0, 3, 4), (0, 1, 2)]
+        assert not list(spe_ref.iter_frames())
+
+def test_follower_before_first_frame(tmp_path):
+    path = tmp_path / 'acquiring.spe'
+    path.write_bytes(spe_header(0, 0))
+    follower = SpeFollower(str(path), roi_shapes=[(4, 3)])
+    assert follower.refresh() == 0
+    assert follower.reference.get_data()[0].shape == (0, 3, 4)
+    data = [np.ones((2, 3, 4), dtype=np.uint16)]
+    with open(path, 'ab') as f:
+        f.write(spe_readouts(data))
+    assert follower.refresh() == 2
+    np.testing.assert_array_equal(follower.reference.get_data()[0], 1)
+    write_spe(path, data, rois=[(4, 3)])
+    assert follower.refresh() == 2 and follower.complete
+    follower.close()
+
+def test_follower_waits_for_whole_footer(make_spe):
+    template = SpeReference(str(make_spe('complete.spe')[0]))
+    path = make_spe()[0]
+    #layout blocks complete, DataHistories still being written
+    with open(path, 'r+b') as f:
+        f.truncate(path.stat().st_size - 30)
+    follower = SpeFollower(str(path), template)
+    follower.refresh()
+    assert not follower.complete
+
+def test_frame_cache(make_spe):
+    path, data, _ = make_spe()
+    frame_bytes = sum(region[0].nbytes for region in data)
+    spe_ref = SpeReference(str(path), frame_cache_bytes=4*frame_bytes)
+    cache = spe_ref.frame_cache
+    #larger than the budget: no lookup, only the last 4 frames are cached
+    for region_data, expected in zip(spe_ref.get_data(), data):
+        np.testing.assert_array_equal(region_data, expected)
+    assert cache.hits == 0 and cache.misses == 0
+    assert len(cache) == 8 and cache.current_bytes == 4*frame_bytes
+    assert all(cache.peek((roi, frame)) for roi in (0, 1)
+               for frame in range(8, 12))
+    #exactly the budget: looked up and cached
+    for _ in range(2):
+        frames = [3, 1, 10, 11]
+        for region_data, expected in zip(spe_ref.get_data(frames=frames),
+                                         data):
+            np.testing.assert_array_equal(region_data, expected[frames])
+    assert cache.hits == 12 and cache.misses == 4
+    assert cache.current_bytes <= cache.max_bytes
+
+def test_lazy_reference(make_spe):
+    path, data, metadata = make_spe()
+    spe_ref = SpeReference(str(path), lazy=True)
+    #pylint: disable=protected-access
+    assert [(int(roi.width), int(roi.height)) for roi in spe_ref.roi_list]\
+        == [(40, 8), (16, 1)]
+    for region_data, expected in zip(spe_ref.get_data(frames=[4, 2]), data):
+        np.testing.assert_array_equal(region_data, expected[[4, 2]])
+    assert not spe_ref._layout_parsed and not spe_ref._footer_parsed
+    #positions, binning and sensor size only need the layout blocks
+    assert int(spe_ref.roi_list[0].xbin) == 1
+    assert (int(spe_ref.sensor_dims.width),
+            int(spe_ref.sensor_dims.height)) == (100, 50)
+    assert spe_ref._layout_parsed and not spe_ref._footer_parsed
+    assert len(spe_ref.meta_list) == 4
+    np.testing.assert_allclose(spe_ref.frame_metadata_values['Delay'],
+                               metadata['Delay'])
+    assert spe_ref.retrieve_experiment_settings(['ADC_ANALOG_GAIN'])[0]\
+        .setting_value == 'Medium'
+    assert spe_ref.get_setting('Cameras/Camera/Adc/AnalogGain') == 'Medium'
+    assert len(spe_ref.meta_list) == 4
+    eager = SpeReference(str(path))
+    assert list(spe_ref.roi_list) == list(eager.roi_list)
+
+@pytest.mark.parametrize('calibrations', [True, False])
+def test_lazy_reference_skips_data_histories(make_spe, calibrations):
+    path, data, metadata = make_spe()
+    spe_ref = SpeReference(str(path))
+    footer = spe_ref.xml_footer.encode()
+    #a malformed DataHistories block only fails once it is parsed
+    footer = footer.replace(b'</AnalogGain>', b'</AnalogGaim>')
+    if not calibrations:
+        start = footer.index(b'<Calibrations')
+        end = footer.index(b'</Calibrations>') + len(b'</Calibrations>')
+        footer = footer[:start] + footer[end:]
+    with open(path, 'r+b') as f:
+        f.truncate(int(spe_ref.xml_loc))
+        f.seek(int(spe_ref.xml_loc))
+        f.write(footer)
+    lazy = SpeReference(str(path), lazy=True)
+    assert int(lazy.roi_list[1].xbin) == 1
+    assert len(lazy.meta_list) == 4
+    np.testing.assert_allclose(lazy.frame_metadata_values['Delay'],
+                               metadata['Delay'])
+    assert bool(lazy.get_wavelengths()) == calibrations
+    np.testing.assert_array_equal(lazy.get_data(frames=[5])[1],
+                                  data[1][[5]])
+    with pytest.raises(ET.ParseError):
+        lazy.retrieve_all_experiment_settings()
+    with pytest.raises(ET.ParseError):
+        lazy.get_setting('EXPOSURE_TIME')
+
+def test_settings(make_spe):
+    path = make_spe()[0]
+    spe_ref = SpeReference(str(path))
+    settings = {setting.setting_name: setting.setting_value
+                for setting in spe_ref.retrieve_all_experiment_settings()}
+    assert settings == {'EXPOSURE_TIME': 50.0, 'ADC_SPEED': 2.0,
+        'ADC_ANALOG_GAIN': 'Medium', 'BIT_DEPTH': 16,
+        'SENSOR_TEMPERATURE': -70.0, 'CAMERA_MODEL': 'PIXIS: 100B',
+        'SERIAL_NUMBER': '123456'}
+    assert spe_ref.get_setting('/cameras/camera/shuttertiming/exposuretime')\
+        == '50'
+    assert spe_ref.get_setting('EXPOSURE_TIME') == '50'
+    assert spe_ref.get_setting('camera_model') == 'PIXIS: 100B'
+    assert spe_ref.get_setting('READOUT_TIME') is None
+
+def test_settings_of_every_camera(tmp_path):
+    camera = ('<Camera><ShutterTiming><ExposureTime>%s</ExposureTime>'
+              '</ShutterTiming><Adc><Speed relevance="%s">%s</Speed></Adc>'
+              '</Camera>')
+    history = ('<DataHistory><Origin><Experiment><Devices><Cameras>%s'
+               '</Cameras></Devices><System><Cameras>%s</Cameras></System>'
+               '</Experiment></Origin></DataHistory>')
+    histories = '<DataHistories>%s%s</DataHistories>'%(
+        history%(camera%('50', 'False', '3') + camera%('20', 'True', '2'),
+                 '<Camera model="A" serialNumber="1"/>'
+                 '<Camera model="B" serialNumber="2"/>'),
+        history%(camera%('10', 'True', '1'), '<Camera model="C"'
+                 ' serialNumber="3"/>'))
+    path = tmp_path / 'cameras.spe'
+    write_spe(path, [np.zeros((1, 1, 4), dtype=np.uint16)], rois=[(4, 1)],
+              data_histories=histories)
+    spe_ref = SpeReference(str(path))
+    settings = spe_ref.retrieve_all_experiment_settings()
+    assert [(setting.setting_name, setting.setting_value)
+            for setting in settings] == [('EXPOSURE_TIME', 50.0),
+        ('EXPOSURE_TIME', 20.0), ('ADC_SPEED', 2.0), ('CAMERA_MODEL', 'A'),
+        ('SERIAL_NUMBER', '1'), ('CAMERA_MODEL', 'B'), ('SERIAL_NUMBER', '2'),
+        ('EXPOSURE_TIME', 10.0), ('ADC_SPEED', 1.0), ('CAMERA_MODEL', 'C'),
+        ('SERIAL_NUMBER', '3')]
+    assert [setting.setting_value for setting in
+            spe_ref.retrieve_experiment_settings(['CAMERA_MODEL'])] ==\
+        ['A', 'B', 'C']
+    assert spe_ref.get_setting('EXPOSURE_TIME') == '50'
+    assert spe_ref.get_setting('Cameras/Camera/ShutterTiming/ExposureTime')\
+        == '50'
+    #key setting names skip the speed flagged relevance="False", element
+    #paths do not
+    assert spe_ref.retrieve_experiment_settings(['ADC_SPEED'])[0]\
+        .setting_value == 2.0
+    assert spe_ref.get_setting('ADC_SPEED') == '2'
+    assert spe_ref.get_setting('Cameras/Camera/Adc/Speed') == '3'
@@ -0,0 +1,79 @@
+"""Per-pixel and per-frame frame reductions with `reduce_frames`."""
+
+import numpy as np
+import pytest
+from read_spe import SpeReference, reduce_frames
+
+def _assert_reduction(reduction, expected, frames):
+    """Checks a `FrameReduction` against numpy over the `frames` of the
+    ROI data `expected` ([Frames, Rows, Cols]).
+    """
+    expected = expected[list(frames)]
+    as_float = expected.astype(np.float64)
+    pixel = reduction.pixel
+    assert reduction.frames == frames
+    assert pixel.count == len(frames)
+    np.testing.assert_array_equal(pixel.sum, expected.sum(axis=0,
+                                                          dtype=np.int64))
+    np.testing.assert_allclose(pixel.mean, as_float.mean(axis=0))
+    np.testing.assert_allclose(pixel.variance, as_float.var(axis=0))
+    np.testing.assert_allclose(pixel.std, as_float.std(axis=0))
+    assert pixel.min.dtype == expected.dtype
+    np.testing.assert_array_equal(pixel.min, expected.min(axis=0))
+    np.testing.assert_array_equal(pixel.max, expected.max(axis=0))
+    per_frame = reduction.per_frame
+    assert len(per_frame) == len(frames)
+    np.testing.assert_array_equal(per_frame['frame'], list(frames))
+    np.testing.assert_allclose(per_frame['sum'], as_float.sum(axis=(1, 2)))
+    np.testing.assert_allclose(per_frame['mean'],
+                               as_float.mean(axis=(1, 2)))
+    np.testing.assert_array_equal(per_frame['min'],
+                                  as_float.min(axis=(1, 2)))
+    np.testing.assert_array_equal(per_frame['max'],
+                                  as_float.max(axis=(1, 2)))
+    np.testing.assert_allclose(per_frame['variance'],
+                               as_float.var(axis=(1, 2)))
+
+#(workers, batch_size): single chunk, chunks of 2-3 frames read in uneven
+#batches, and more workers than frames
+@pytest.mark.parametrize('workers, batch_size', [(1, None), (1, 5), (2, 5),
+                                                 (5, 2), (3, 7), (20, 1)])
+def test_reduce_frames(make_spe, workers, batch_size):
+    path, data = make_spe()[:2]
+    reductions = reduce_frames(SpeReference(str(path)), workers=workers,
+                               batch_size=batch_size)
+    assert [reduction.roi for reduction in reductions] == [0, 1]
+    for reduction, expected in zip(reductions, data):
+        _assert_reduction(reduction, expected, range(12))
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_reduce_frames_selection(make_spe, workers):
+    path, data = make_spe()[:2]
+    spe_ref = SpeReference(str(path))
+    reductions = reduce_frames(spe_ref, rois=[1], start=1, stop=11, step=3,
+                               batch_size=2, workers=workers)
+    assert [reduction.roi for reduction in reductions] == [1]
+    _assert_reduction(reductions[0], data[1], range(1, 11, 3))
+    empty = reduce_frames(spe_ref, rois=[0], start=5, stop=5,
+                          workers=workers)[0]
+    assert empty.pixel.count == 0 and len(empty.per_frame) == 0
+    assert np.isnan(empty.pixel.mean).all()
+
+def test_reduce_float_frames(make_spe):
+    path, data = make_spe(pixel_format='MonochromeFloating32')[:2]
+    reduction = reduce_frames(SpeReference(str(path)), rois=[0],
+                              batch_size=4, workers=3)[0]
+    assert reduction.pixel.sum.dtype == np.float64
+    np.testing.assert_allclose(reduction.pixel.sum,
+                               data[0].sum(axis=0, dtype=np.float64))
+    np.testing.assert_allclose(reduction.pixel.variance,
+                               data[0].astype(np.float64).var(axis=0))
+
+def test_reduce_frames_checks_arguments(make_spe):
+    spe_ref = SpeReference(str(make_spe()[0]))
+    with pytest.raises(ValueError):
+        reduce_frames(spe_ref, workers=0)
+    with pytest.raises(ValueError):
+        reduce_frames(spe_ref, rois=[2])
+    with pytest.raises(ValueError):
+        reduce_frames(spe_ref, stop=13)
@@ -0,0 +1,70 @@
+"""Reading synthetic spe 2.x (WinSpec/32) files."""
+
+import numpy as np
+import pytest
+from read_spe import SpeReference
+from read_spe.read_spe import old_spe_header_dtype
+
+COEFFICIENTS = (400.0, 0.5, 1e-3)
+
+@pytest.fixture
+def make_spe2(tmp_path):
+    """Factory writing a 3-frame uint16 spe 2.x file with two ROIs (20x4,
+    and 40 columns binned by 2 on one row) and a 2nd order x calibration;
+    returns `(path, data)` with the per-ROI `[frames, rows, cols]` data.
+    """
+    def make(name: str = 'winspec.spe', *, num_frames: int = 3):
+        rng = np.random.default_rng(2)
+        data = [rng.integers(0, 60000, (num_frames, 4, 20), dtype=np.uint16),
+                rng.integers(0, 60000, (num_frames, 1, 20), dtype=np.uint16)]
+        header = np.zeros(1, dtype=old_spe_header_dtype)[0]
+        header['file_header_ver'] = 2.5
+        header['datatype'] = 3
+        header['xdim'], header['ydim'] = 100, 1
+        header['xDimDet'], header['yDimDet'] = 50, 20
+        header['NumFrames'] = num_frames
+        header['NumROI'] = 2
+        header['ROIinfblk'][0] = (1, 20, 1, 1, 4, 1)
+        header['ROIinfblk'][1] = (11, 50, 2, 10, 10, 1)
+        calibration = header['xcalibration']
+        calibration['calib_valid'] = 1
+        calibration['polynom_order'] = len(COEFFICIENTS) - 1
+        calibration['polynom_coeff'][:len(COEFFICIENTS)] = COEFFICIENTS
+        path = tmp_path / name
+        with open(path, 'wb') as f:
+            f.write(header.tobytes())
+            f.write(np.concatenate([region.reshape(num_frames, -1)
+                                    for region in data], axis=1).tobytes())
+        return path, data
+    return make
+
+def test_header(make_spe2):
+    spe_ref = SpeReference(str(make_spe2()[0]))
+    assert spe_ref.spe_version == pytest.approx(2.5)
+    assert spe_ref.num_frames == 3
+    assert spe_ref.old_spe_header['xDimDet'] == 50
+    assert not spe_ref.meta_list
+    assert [(int(roi.width), int(roi.height), int(roi.x), int(roi.y),
+             int(roi.xbin), int(roi.ybin)) for roi in spe_ref.roi_list] ==\
+        [(20, 4, 0, 0, 1, 1), (20, 1, 10, 9, 2, 1)]
+    assert (int(spe_ref.sensor_dims.width),
+            int(spe_ref.sensor_dims.height)) == (50, 20)
+
+@pytest.mark.parametrize('kwargs', [{}, {'lazy': True}, {'mmap': True}])
+def test_get_data(make_spe2, kwargs):
+    path, data = make_spe2()
+    spe_ref = SpeReference(str(path), lazy=kwargs.pop('lazy', False))
+    for region_data, expected in zip(spe_ref.get_data(**kwargs), data):
+        np.testing.assert_array_equal(region_data, expected)
+    for region_data, expected in zip(spe_ref.get_data(frames=[2, 0],
+                                                      **kwargs), data):
+        np.testing.assert_array_equal(region_data, expected[[2, 0]])
+
+def test_get_wavelengths(make_spe2):
+    spe_ref = SpeReference(str(make_spe2()[0]))
+    coverage = np.polynomial.polynomial.polyval(np.arange(1, 51),
+                                                COEFFICIENTS)
+    wavelengths = spe_ref.get_wavelengths()
+    np.testing.assert_allclose(wavelengths[0], coverage[:20])
+    np.testing.assert_allclose(wavelengths[1],
+                               coverage[10:50].reshape(20, 2).mean(axis=1))
@@ -0,0 +1,103 @@
+"""Tests for concatenating, extracting and splitting spe files."""
+
+import os
+import numpy as np
+import pytest
+from read_spe import SpeReference
+from read_spe import tools
+from read_spe.tools import concatenate_files, extract_frames, split_file
+
+def test_concatenate_rebases_metadata(make_spe, tmp_path):
+    first, first_data, first_meta = make_spe('a.spe', num_frames=7)
+    second, second_data, second_meta = make_spe('b.spe', num_frames=5,
+        origin='2020-01-01T00:00:01.5000000-05:00', seed=1)
+    destination = tmp_path / 'joined.spe'
+    assert concatenate_files([str(first), str(second)],
+                             str(destination)) == 12
+    joined = SpeReference(str(destination))
+    data = joined.get_data()
+    for roi, (roi_first, roi_second) in enumerate(zip(first_data,
+                                                      second_data)):
+        np.testing.assert_array_equal(data[roi],
+            np.concatenate((roi_first, roi_second)))
+    metadata = joined.get_frame_metadata_value(range(12))
+    np.testing.assert_array_equal(metadata['Frame Tracking Number'],
+                                  np.arange(1, 13))
+    np.testing.assert_allclose(metadata['ExposureStarted'],
+        np.concatenate((first_meta['ExposureStarted'],
+                        second_meta['ExposureStarted'] + 1500.0)))
+    np.testing.assert_allclose(metadata['Delay'], np.concatenate(
+        (first_meta['Delay'], second_meta['Delay'])))
+
+def test_split_and_concatenate_round_trip(make_spe, tmp_path):
+    source, data, metadata = make_spe(num_frames=10)
+    parts = split_file(str(source), 4, destination_pattern=str(
+        tmp_path / 'part-{:02d}.spe'))
+    assert [SpeReference(part).num_frames for part in parts] == [4, 4, 2]
+    destination = tmp_path / 'joined.spe'
+    assert concatenate_files(parts, str(destination)) == 10
+    joined = SpeReference(str(destination))
+    for roi, roi_data in enumerate(joined.get_data()):
+        np.testing.assert_array_equal(roi_data, data[roi])
+    joined_metadata = joined.get_frame_metadata_value(range(10))
+    for name in metadata.dtype.names:
+        np.testing.assert_allclose(joined_metadata[name], metadata[name])
+
+def test_extract_frames(make_spe, tmp_path):
+    source, data, metadata = make_spe(num_frames=10)
+    destination = tmp_path / 'every_third.spe'
+    assert extract_frames(str(source), str(destination), start=1,
+                          step=3) == 3
+    extracted = SpeReference(str(destination))
+    for roi, roi_data in enumerate(extracted.get_data()):
+        np.testing.assert_array_equal(roi_data, data[roi][1::3])
+    np.testing.assert_array_equal(
+        extracted.get_frame_metadata_value(range(3))['Frame Tracking Number'],
+        metadata['Frame Tracking Number'][1::3])
+
+@pytest.mark.parametrize('read_gap', [1 << 20, 0])
+def test_extract_strided_frames(make_spe, tmp_path, monkeypatch, read_gap):
+    #read_gap 0 reads every readout on its own instead of spanning the gap
+    monkeypatch.setattr(SpeReference, 'read_gap_bytes', read_gap)
+    source, data, metadata = make_spe(num_frames=12)
+    #a few readouts per chunk, so that runs span several chunks
+    monkeypatch.setattr(tools, '_COPY_CHUNK_BYTES',
+                        3 * int(SpeReference(str(source)).readout_stride))
+    for start, stop, step in ((0, None, 2), (11, None, -3), (2, 11, 4)):
+        destination = tmp_path / 'strided.spe'
+        frames = range(start, 12 if stop is None else stop, step)\
+            if step > 0 else range(start, -1, step)
+        assert tools.extract_frames(str(source), str(destination),
+            start=start, stop=frames.stop, step=step) == len(frames)
+        extracted = SpeReference(str(destination))
+        for roi, roi_data in enumerate(extracted.get_data()):
+            np.testing.assert_array_equal(roi_data, data[roi][list(frames)])
+        extracted_metadata = extracted.get_frame_metadata_value(
+            range(len(frames)))
+        for name in metadata.dtype.names:
+            np.testing.assert_allclose(extracted_metadata[name],
+                                       metadata[name][list(frames)])
+
+def test_copy_range_fallback(tmp_path, monkeypatch):
+    source = tmp_path / 'source.bin'
+    source.write_bytes(bytes(range(256)) * 64)
+    calls = []
+    def failing_copy(*args):
+        calls.append(args)
+        raise OSError('not supported')
+    monkeypatch.setattr(os, 'copy_file_range', failing_copy, raising=False)
+    monkeypatch.setattr(os, 'sendfile', failing_copy, raising=False)
+    monkeypatch.setattr(tools, '_COPY_CHUNK_BYTES', 1000)
+    with open(source, 'rb') as src, open(tmp_path / 'copy.bin', 'wb') as dst:
+        #pylint: disable-next=protected-access
+        tools._copy_range(src.fileno(), dst.fileno(), 100, 5000)
+    assert (tmp_path / 'copy.bin').read_bytes() ==\
+        source.read_bytes()[100:5100]
+    assert len(calls) == 2
+
+def test_concatenate_rejects_different_layouts(make_spe, tmp_path):
+    first = make_spe('a.spe')[0]
+    second = make_spe('b.spe', rois=((40, 8),))[0]
+    with pytest.raises(ValueError):
+        concatenate_files([str(first), str(second)],
+                          str(tmp_path / 'joined.spe'))
@@ -0,0 +1,92 @@
+"""Writing spe v3 files with `SpeWriter`."""
+
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytest
+from read_spe import GateTracking, SpeReference, SpeWriter
+from conftest import (DATA_HISTORIES, PIXEL_DTYPES, WAVELENGTHS,
+    make_meta_list, make_metadata, write_spe)
+
+def _assert_same_elements(written, expected):
+    """Every element and attribute of the hand-built footer block is also in
+    the written one (which may carry extra attributes, e.g. `calibrations`).
+    """
+    assert written.tag == expected.tag
+    assert expected.attrib.items() <= written.attrib.items()
+    assert (written.text or '') == (expected.text or '')
+    assert len(written) == len(expected)
+    for written_child, expected_child in zip(written, expected):
+        _assert_same_elements(written_child, expected_child)
+
+@pytest.mark.parametrize('pixel_format', sorted(PIXEL_DTYPES))
+def test_matches_hand_built_file(tmp_path, pixel_format):
+    rng = np.random.default_rng(0)
+    rois = [(40, 8), (16, 1)]
+    data = [rng.integers(0, 60000, (5, height, width))
+            .astype(PIXEL_DTYPES[pixel_format]) for width, height in rois]
+    metadata = make_metadata(5)
+    expected_path = tmp_path / 'expected.spe'
+    write_spe(expected_path, data, rois=rois, pixel_format=pixel_format,
+              meta_list=make_meta_list(), metadata=metadata)
+    path = tmp_path / 'written.spe'
+    with SpeWriter(str(path), rois, pixel_format=pixel_format,
+                   meta_list=make_meta_list(), wavelengths=WAVELENGTHS,
+                   sensor_dims=(100, 50),
+                   data_histories=DATA_HISTORIES) as writer:
+        writer.write_frames([region[:2] for region in data],
+                            metadata=metadata[:2])
+        writer.write_frames([region[2:] for region in data],
+                            metadata=metadata[2:])
+    written, expected = path.read_bytes(), expected_path.read_bytes()
+    #xml_loc, frame count and file version
+    for start, end in ((678, 686), (1446, 1450), (1992, 1996)):
+        assert written[start:end] == expected[start:end]
+    xml_loc = int(np.frombuffer(expected[678:686], dtype='<u8')[0])
+    assert written[4100:xml_loc] == expected[4100:xml_loc]
+    written_root = ET.fromstring(written[xml_loc:])
+    expected_root = ET.fromstring(expected[xml_loc:])
+    assert len(written_root) == len(expected_root)
+    for written_block, expected_block in zip(written_root, expected_root):
+        _assert_same_elements(written_block, expected_block)
+
+def test_from_reference(make_spe, tmp_path):
+    path, data, metadata = make_spe()
+    spe_ref = SpeReference(str(path))
+    destination = tmp_path / 'processed.spe'
+    with SpeWriter.from_reference(str(destination), spe_ref) as writer:
+        for frames, region_data in spe_ref.iter_frames(batch_size=5):
+            writer.write_frames(region_data, metadata=
+                spe_ref.get_frame_metadata_value(frames))
+    copy = SpeReference(str(destination))
+    for region_data, expected in zip(copy.get_data(), data):
+        np.testing.assert_array_equal(region_data, expected)
+    np.testing.assert_allclose(copy.get_frame_metadata_value(range(12))
+                               ['ExposureEnded'], metadata['ExposureEnded'])
+    np.testing.assert_array_equal(copy.get_wavelengths()[1],
+                                  spe_ref.get_wavelengths()[1])
+    assert copy.get_setting('EXPOSURE_TIME') == '50'
+
+def test_write_frames_checks_shapes(tmp_path):
+    with SpeWriter(str(tmp_path / 'test.spe'), [(4, 3)]) as writer:
+        with pytest.raises(ValueError):
+            writer.write_frames([np.zeros((2, 4, 3))])
+        with pytest.raises(ValueError):
+            writer.write_frames([np.zeros((3, 4))], metadata=np.zeros(2))
+        writer.write_frames([np.arange(12).reshape(3, 4)])
+    spe_ref = SpeReference(str(tmp_path / 'test.spe'))
+    np.testing.assert_array_equal(spe_ref.get_data()[0][0],
+                                  np.arange(12).reshape(3, 4))
+    with pytest.raises(ValueError):
+        writer.write_frames([np.zeros((3, 4))])
+
+@pytest.mark.parametrize('monotonic', [True, False])
+def test_gate_tracking_round_trip(tmp_path, monotonic):
+    meta_list = (GateTracking('Delay', 'Double', np.uint64(64), monotonic),)
+    path = tmp_path / 'test.spe'
+    with SpeWriter(str(path), [(4, 3)], meta_list=meta_list) as writer:
+        writer.write_frames([np.zeros((2, 3, 4))], metadata=np.array(
+            [(1.5,), (2.5,)], dtype=[('Delay', '<f8')]))
+    spe_ref = SpeReference(str(path))
+    assert spe_ref.meta_list[0].monotonic is monotonic
+    np.testing.assert_array_equal(
+        spe_ref.get_frame_metadata_value(range(2))['Delay'], [1.5, 2.5])